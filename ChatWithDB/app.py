@@ -1,9 +1,26 @@
 import streamlit as st
+import atexit
 import os
 from dotenv import load_dotenv
-from main import Database, SQLTranslator
-import pandas as pd
-import io
+from main import TIER_LABELS, Database, SQLTranslator, returns_rows
+from cost_guard import CostGuard
+from bulk_load import quote_identifier
+from datagen import generate_table_data
+from export import EXPORT_FORMATS, TYPED_FORMATS, ExportWriter, export_query, result_columns
+from fanout import FanOut, ShardTarget, parse_targets
+import instrumentation
+from jobs import FAILED, JobExecutor
+from pagination import Paginator, is_pageable
+from pool import ConnectionPool
+from result_cache import ResultCache
+from results import QueryResult
+from sql_classifier import parameterize, split_statements
+from translation_cache import TranslationCache
+import contextvars
+import tempfile
+import threading
+import time
+import uuid
 
 # Load environment variables
 load_dotenv()
@@ -49,29 +66,325 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# Initialize session state
+# Process-wide resources: every browser session shares one connection pool, one LLM
+# client and the result, schema and translation caches
+@st.cache_resource
+def shared_pool():
+    return ConnectionPool()
+
+@st.cache_resource
+def shared_caches():
+    """(result cache or None, schema cache, translation cache)"""
+    result_cache = ResultCache() if os.getenv("QUERY_CACHE_MB") else None
+    return result_cache, {}, TranslationCache()
+
+@st.cache_resource
+def shared_llm_client():
+    # groq is imported here, on the first translation, rather than on every cold start
+    from groq import Groq
+
+    return Groq(api_key=os.environ.get("GROQ_API_KEY"))
+
+@st.cache_resource
+def shared_cost_guard():
+    cost_guard = CostGuard()
+    # cache_resource has no release hook here, so the EXPLAIN threads are stopped with the process
+    atexit.register(cost_guard.close)
+    return cost_guard
+
+@st.cache_resource
+def shared_jobs():
+    """Background queries and translations, on their own pooled connections"""
+    return JobExecutor()
+
+@st.cache_resource
+def shared_fan_out():
+    """Fan-out queries of every session; shards on the default server use the shared pool"""
+    return FanOut(Database.on_pool(shared_pool()))
+
+@st.cache_resource
+def shared_translators():
+    """database name -> (schema version, SQLTranslator), and the lock guarding it"""
+    return {}, threading.Lock()
+
+def translator_for(db):
+    """The translator every session on db's current database uses, rebuilt when its schema changes"""
+    translators, lock = shared_translators()
+    snapshot = db.get_schema_snapshot()
+    version = snapshot.version if snapshot is not None else None
+    with lock:
+        loaded_version, translator = translators.get(db.database, (None, None))
+        if translator is None or loaded_version != version:
+            translator = SQLTranslator(cache=shared_caches()[2], client_factory=shared_llm_client)
+            if snapshot is not None:
+                translator.load_snapshot(snapshot)
+            translators[db.database] = (version, translator)
+    return translator
+
+# Main content header, drawn before anything waits on MySQL
+st.title("MySQL Automation Tool")
+st.markdown("---")
+
+# Initialize session state: only the current database, limits and results are per session
 if 'db' not in st.session_state:
-    st.session_state.db = Database()
-if 'translator' not in st.session_state:
-    st.session_state.translator = SQLTranslator()
+    result_cache, schema_cache, _ = shared_caches()
+    with st.spinner("Connecting to MySQL..."):
+        st.session_state.db = Database(pool=shared_pool(), result_cache=result_cache, schema_cache=schema_cache)
 if 'current_db' not in st.session_state:
     st.session_state.current_db = st.session_state.db.get_current_database()
 if 'last_result' not in st.session_state:
     st.session_state.last_result = None
+if 'export_format' not in st.session_state:
+    st.session_state.export_format = "csv"
+if 'cost_guard' not in st.session_state:
+    st.session_state.cost_guard = shared_cost_guard()
+if 'generated_sql' not in st.session_state:
+    st.session_state.generated_sql = None
+    st.session_state.cost_estimate = None
+    st.session_state.generated_params = None
+    st.session_state.generated_tier = None
+if 'paginator' not in st.session_state:
+    st.session_state.paginator = None
+if 'query_timeout' not in st.session_state:
+    st.session_state.query_timeout = st.session_state.db.query_timeout
+if 'max_rows' not in st.session_state:
+    st.session_state.max_rows = st.session_state.db.max_rows
+if 'job_owner' not in st.session_state:
+    # Background jobs are listed and limited, and fan-out queries cancelled, per browser session
+    st.session_state.job_owner = uuid.uuid4().hex
+    st.session_state.translation_job = None
+# Looked up on every run, so a schema change made from any session reaches all of them
+st.session_state.translator = translator_for(st.session_state.db)
 
-# Helper function to create download button
-def create_download_button(df, filename):
-    if df is not None and not df.empty:
-        csv = df.to_csv(index=False)
-        st.download_button(
-            label="📥 Download CSV",
-            data=csv,
-            file_name=filename,
-            mime="text/csv",
-            key=f"download_{filename}",
-            help="Click to download the results as a CSV file"
+# Exports larger than this spill from memory to a temporary file
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", 16 * 1024 * 1024))
+# Rows fetched and rendered per page in the SQL Query tab
+PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", 100))
+# How often the page refreshes while background jobs are running
+JOB_REFRESH_SECONDS = float(os.getenv("JOB_REFRESH_SECONDS", 1.0))
+
+# Helper function for the time limit and row cap chosen in the sidebar
+def query_limits():
+    return {"timeout": float(st.session_state.query_timeout), "max_rows": int(st.session_state.max_rows)}
+
+# Helper functions for background jobs
+def queue_queries(text, params=None, prepared=None, use_cache=True):
+    """Queue every statement in `text` as its own background job"""
+    statements = split_statements(text)
+    for statement in statements:
+        shared_jobs().submit_query(
+            st.session_state.job_owner, st.session_state.db, statement, params,
+            use_cache=use_cache, prepared=prepared, **query_limits()
+        )
+    st.success(f"Queued {len(statements)} quer{'y' if len(statements) == 1 else 'ies'}; see the Jobs tab")
+
+def collect_translation():
+    """Move a finished background translation into the Natural Language tab's state"""
+    job = st.session_state.translation_job
+    if job is None or not job.finished:
+        return
+    st.session_state.translation_job = None
+    if job.value is None:
+        if job.status == FAILED:
+            st.session_state.generated_sql = f"Error: Failed to generate SQL query: {job.error}"
+            st.session_state.cost_estimate = st.session_state.generated_tier = None
+        return
+    sql_query, st.session_state.cost_estimate, st.session_state.generated_tier = job.value
+    st.session_state.generated_params = None
+    if st.session_state.translator.parameterize and not sql_query.startswith("Error:"):
+        sql_query, st.session_state.generated_params = parameterize(sql_query)
+    st.session_state.generated_sql = sql_query
+
+# Helper function to run a database call that the Cancel button can stop
+def run_cancellable(label, function, *args, **kwargs):
+    """Run `function` in a worker thread while this script keeps polling
+
+    Clicking Cancel (or anything else) makes Streamlit stop the script at
+    its next st call; the finally block then kills the running statement
+    so the pooled connection is not left busy. `function` must not use st.
+    """
+    outcome = {}
+    # Carries the active performance trace into the worker
+    context = contextvars.copy_context()
+
+    def work():
+        try:
+            outcome["value"] = context.run(function, *args, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+    status = st.empty()
+    cancel_button = st.empty()
+    cancel_button.button("⏹ Cancel query", key=f"cancel_{label}")
+    started = time.monotonic()
+    try:
+        while worker.is_alive():
+            status.caption(f"{label}... {time.monotonic() - started:.1f}s")
+            worker.join(0.2)
+    finally:
+        if worker.is_alive():
+            st.session_state.db.cancel()
+            shared_fan_out().cancel(st.session_state.job_owner)
+            st.session_state.query_cancelled = True
+    status.empty()
+    cancel_button.empty()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("value")
+
+# Helper function to stream a query into an export file and a preview DataFrame
+def run_streaming_query(db, query, use_cache=True, export_format="csv", limits=None, params=None, prepared=None):
+    """Stream a query's rows into the export file in one pass, keeping only the first page for display"""
+    export_file = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    schema_columns = result_columns(db, query) if export_format in TYPED_FORMATS else None
+    writer = ExportWriter(export_file, export_format, schema_columns)
+    preview = None
+    truncated = False
+    for batch in db.iter_query(query, params, use_cache=use_cache, prepared=prepared, **(limits or {})):
+        if preview is None:
+            preview = QueryResult(batch.columns, description=batch.description)
+        writer.write(batch)
+        if len(preview) < PAGE_SIZE:
+            preview.extend(batch[:PAGE_SIZE - len(preview)])
+        truncated = batch.truncated
+    report = writer.close()
+
+    if not preview:
+        export_file.close()
+        return None, None, None, False
+
+    export_file.seek(0)
+    with instrumentation.stage("dataframe"):
+        df = preview.to_dataframe()
+    return df, export_file, report, truncated
+
+# Helper function to run a query and render its result
+def show_query_result(query, filename_prefix, use_cache=True, params=None, prepared=None):
+    with instrumentation.trace("query", query=query, database=st.session_state.db.database):
+        _show_query_result(query, filename_prefix, use_cache, params, prepared)
+
+def _show_query_result(query, filename_prefix, use_cache, params, prepared):
+    db = st.session_state.db
+    if not returns_rows(query):
+        st.write(run_cancellable(
+            "Running query", db.execute_query, query, params, use_cache=use_cache, prepared=prepared, **query_limits()
+        ))
+        return
+
+    export_format = st.session_state.export_format
+    try:
+        df, export_file, report, truncated = run_cancellable(
+            "Running query", run_streaming_query, db, query, use_cache, export_format, query_limits(), params, prepared
+        )
+    except Exception as e:
+        st.write(f"Error executing query: {e}")
+        return
+
+    if df is None:
+        st.write("No results found")
+        return
+
+    st.session_state.last_result = df
+    with instrumentation.stage("render"):
+        st.dataframe(df, use_container_width=True)
+    if report.rows > len(df):
+        st.caption(f"Showing the first {len(df):,} of {report.rows:,} rows; the download has all of them")
+    st.caption(str(report))
+    if truncated:
+        st.warning(f"Stopped at the {int(st.session_state.max_rows):,} row limit")
+    extension = EXPORT_FORMATS[export_format][0]
+    create_download_button(
+        export_file, f"{filename_prefix}_{time.strftime('%Y%m%d_%H%M%S')}{extension}", export_format
+    )
+
+# Helper functions for browsing a result one page at a time
+def start_paged_query(query, use_cache=True):
+    """Fetch the first page of a row-returning query and remember where we are"""
+    paginator = Paginator(
+        st.session_state.db, query, page_size=PAGE_SIZE, use_cache=use_cache, timeout=query_limits()["timeout"]
+    )
+    st.session_state.paginator = paginator
+    show_page(0)
+
+def show_page(page):
+    try:
+        result = run_cancellable("Fetching page", st.session_state.paginator.page, page)
+    except Exception as e:
+        st.session_state.paginator = None
+        st.write(f"Error executing query: {e}")
+        return
+    st.session_state.page = page
+    st.session_state.page_result = result
+
+def render_paged_result(filename_prefix):
+    paginator = st.session_state.paginator
+    result = st.session_state.page_result
+    page = st.session_state.page
+    if not result and page == 0:
+        st.write("No results found")
+        return
+
+    df = result.to_dataframe()
+    st.session_state.last_result = df
+    with instrumentation.stage("render"):
+        st.dataframe(df, use_container_width=True)
+
+    first_row = page * paginator.page_size + 1
+    position = f"Page {page + 1}"
+    if paginator.total is not None:
+        position += f" of {paginator.page_count()} ({paginator.total:,} rows)"
+    st.caption(f"{position}, rows {first_row:,}-{first_row + len(result) - 1:,} ({paginator.mode} pagination)")
+
+    previous_col, next_col, count_col, export_col = st.columns(4)
+    if previous_col.button("◀ Previous", disabled=page == 0):
+        show_page(page - 1)
+        st.rerun()
+    if next_col.button("Next ▶", disabled=not paginator.has_next(page)):
+        show_page(page + 1)
+        st.rerun()
+    if count_col.button("Count rows", disabled=paginator.total is not None or not paginator.countable):
+        try:
+            run_cancellable("Counting rows", paginator.total_count)
+        except Exception as e:
+            st.write(f"Error counting rows: {e}")
+        st.rerun()
+    if export_col.button("Export full result"):
+        # The only place the whole result is read, and it streams straight to the file
+        export_format = st.session_state.export_format
+        export_file = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+        try:
+            report = run_cancellable(
+                "Exporting", export_query, st.session_state.db, paginator.query, export_file, export_format,
+                **query_limits()
+            )
+        except Exception as e:
+            export_file.close()
+            st.write(f"Error exporting query: {e}")
+            return
+        export_file.seek(0)
+        st.caption(str(report))
+        extension = EXPORT_FORMATS[export_format][0]
+        create_download_button(
+            export_file, f"{filename_prefix}_{time.strftime('%Y%m%d_%H%M%S')}{extension}", export_format
         )
 
+# Helper function to create download button
+def create_download_button(export_file, filename, export_format="csv"):
+    if export_file is not None:
+        # Hand Streamlit a reader on the export file itself rather than a copy of its bytes
+        # (fileno() moves a spooled export that is still in memory to its temporary file)
+        with export_file, open(export_file.fileno(), "rb", closefd=False) as reader:
+            st.download_button(
+                label=f"📥 Download {export_format.upper()}",
+                data=reader,
+                file_name=filename,
+                mime=EXPORT_FORMATS[export_format][1],
+                key=f"download_{filename}",
+                help="Click to download the results"
+            )
+
 # Sidebar
 with st.sidebar:
     st.title("🗄️ MySQL Automation")
@@ -93,9 +406,8 @@ with st.sidebar:
                 # Update schema for the new database
                 schema = st.session_state.db.get_schema()
                 if schema:
-                    st.session_state.translator = SQLTranslator()  # Reset translator
-                    for table, columns in schema.items():
-                        st.session_state.translator.update_schema(table, columns)
+                    # Sessions on the same database share its translator
+                    st.session_state.translator = translator_for(st.session_state.db)
                     st.success(f"Switched to database: {selected_db}")
                     st.rerun()  # Use st.rerun() instead of st.experimental_rerun()
                 else:
@@ -111,76 +423,341 @@ with st.sidebar:
     st.subheader("Current Schema")
     schema = st.session_state.db.get_schema()
     if schema:
+        # Served from the cached snapshot that get_schema just refreshed
+        snapshot = st.session_state.db.get_schema_snapshot()
         for table, columns in schema.items():
+            table_info = snapshot.get_table(table)
             with st.expander(f"📊 {table}"):
                 for column in columns:
-                    st.write(f"• {column}")
+                    info = table_info.columns[column]
+                    key = f", {info.key}" if info.key else ""
+                    st.write(f"• {column} ({info.column_type}{key})")
     else:
         st.info("No tables in the current database")
 
+    st.markdown("---")
+
+    # Format used by the download buttons
+    st.selectbox("Export format", list(EXPORT_FORMATS), key="export_format",
+                 help="Parquet and Arrow exports need pyarrow")
+
+    st.markdown("---")
+
+    # Per-query limits (defaults from QUERY_TIMEOUT / QUERY_MAX_ROWS)
+    with st.expander("⏱️ Execution Limits"):
+        st.number_input("Time limit (seconds, 0 = none)", min_value=0.0, step=5.0, key="query_timeout")
+        st.number_input("Row limit (0 = none)", min_value=0, step=1000, key="max_rows")
+
+    st.markdown("---")
+
+    # Connection pool usage, for sizing DB_POOL_SIZE
+    with st.expander("🔌 Connection Pool"):
+        st.json(st.session_state.db.get_pool_stats())
+
+    cache_stats = st.session_state.db.get_cache_stats()
+    if cache_stats is not None:
+        with st.expander("⚡ Query Result Cache"):
+            st.json(cache_stats)
+
+    with st.expander("🧠 Translation Cache"):
+        st.json(st.session_state.translator.get_cache_stats())
+
+    with st.expander("🧵 Background Jobs"):
+        st.json(shared_jobs().stats())
+
+    # Per-stage timings of recent queries and translations (PERF_TRACE / PERF_LOG_PATH)
+    with st.expander("⏲️ Performance"):
+        recorder = instrumentation.recorder
+        recorder.enabled = st.checkbox("Record timings", value=recorder.enabled)
+        slowest = recorder.slowest(10)
+        if slowest:
+            st.caption(f"Slowest of the last {len(recorder.buffer)} operation(s)")
+            st.dataframe([{
+                "operation": entry["operation"],
+                "ms": entry["total_ms"],
+                "rows": entry.get("rows"),
+                "statement": entry.get("query") or entry.get("question"),
+                "stages": ", ".join(f"{name} {ms:.1f}" for name, ms in entry["stages_ms"].items()),
+            } for entry in slowest], use_container_width=True, hide_index=True)
+            if st.button("Clear timings"):
+                recorder.clear()
+                st.rerun()
+        elif recorder.enabled:
+            st.caption("Nothing recorded yet")
+
 # Main content
-st.title("MySQL Automation Tool")
-st.markdown("---")
+if st.session_state.pop("query_cancelled", False):
+    st.warning("Query cancelled")
 
 # Create tabs
-tab1, tab2, tab3 = st.tabs(["SQL Query", "Natural Language", "Test Data"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["SQL Query", "Natural Language", "Test Data", "Fan-out", "Jobs"])
 
 # SQL Query Tab
 with tab1:
     st.subheader("Execute SQL Query")
     query = st.text_area("Enter your SQL query:", height=100)
-    if st.button("Execute Query"):
+    bypass_cache = st.checkbox(
+        "Bypass result cache", disabled=st.session_state.db.result_cache is None,
+        help="Always send the query to MySQL (caching is enabled with QUERY_CACHE_MB)"
+    )
+    execute_col, background_col = st.columns(2)
+    if background_col.button("Run in Background", help="Queue each statement as a job and keep working"):
         if query:
-            result = st.session_state.db.execute_query(query)
-            if isinstance(result, list):
-                df = pd.DataFrame(result)
-                st.session_state.last_result = df
-                st.dataframe(df, use_container_width=True)
-                create_download_button(df, f"query_results_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv")
-            else:
-                st.write(result)
+            queue_queries(query, use_cache=not bypass_cache)
+        else:
+            st.warning("Please enter a SQL query")
+    if execute_col.button("Execute Query"):
+        if query and is_pageable(query):
+            start_paged_query(query, use_cache=not bypass_cache)
+        elif query:
+            st.session_state.paginator = None
+            show_query_result(query, "query_results", use_cache=not bypass_cache)
         else:
             st.warning("Please enter a SQL query")
 
+    # Rendered outside the button so page navigation survives reruns
+    if st.session_state.paginator is not None:
+        render_paged_result("query_results")
+
 # Natural Language Tab
 with tab2:
     st.subheader("Convert Natural Language to SQL")
     nl_query = st.text_area("Enter your request in natural language:", height=100)
     if st.button("Convert to SQL"):
         if nl_query:
-            sql_query = st.session_state.translator.translate(nl_query)
-            st.code(sql_query, language="sql")
-            
-            if not sql_query.startswith("Error:"):
-                if st.button("Execute Generated SQL"):
-                    result = st.session_state.db.execute_query(sql_query)
-                    if isinstance(result, list):
-                        df = pd.DataFrame(result)
-                        st.session_state.last_result = df
-                        st.dataframe(df, use_container_width=True)
-                        create_download_button(df, f"nl_query_results_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv")
-                    else:
-                        st.write(result)
+            # Translated in the background; over-budget plans are sent back to the model
+            # once with the EXPLAIN findings
+            st.session_state.generated_sql = None
+            st.session_state.translation_job = shared_jobs().submit_translation(
+                st.session_state.job_owner, st.session_state.db, st.session_state.translator, nl_query,
+                cost_guard=st.session_state.cost_guard,
+            )
         else:
             st.warning("Please enter a natural language query")
 
+    collect_translation()
+    translation_job = st.session_state.translation_job
+    if translation_job is not None:
+        st.info(f"Translating ({translation_job.status}, {translation_job.elapsed:.1f}s)...")
+        if st.button("Cancel translation"):
+            shared_jobs().cancel(translation_job.id)
+            st.session_state.translation_job = None
+            st.rerun()
+
+    # Kept in session state so the Execute button below survives the rerun its click causes
+    sql_query = st.session_state.generated_sql
+    if sql_query:
+        st.code(sql_query, language="sql")
+        if st.session_state.generated_tier:
+            st.caption(f"Answered by: {TIER_LABELS.get(st.session_state.generated_tier, st.session_state.generated_tier)}")
+        params = st.session_state.generated_params
+        if params:
+            st.caption(f"Prepared statement parameters: {params}")
+        estimate = st.session_state.cost_estimate
+        if estimate is not None:
+            message = estimate.summary() + "".join(f"\n- {reason}" for reason in estimate.reasons)
+            {"ok": st.info, "warn": st.warning, "block": st.error}[estimate.verdict](message)
+
+        if not sql_query.startswith("Error:"):
+            blocked = estimate is not None and estimate.verdict == "block"
+            help_text = "Blocked by the cost guard (COST_GUARD_BLOCK_ROWS)" if blocked else None
+            execute_col, background_col = st.columns(2)
+            if background_col.button("Run in Background", key="run_generated_in_background",
+                                     disabled=blocked, help=help_text):
+                queue_queries(sql_query, params=params or None, prepared=True if params else None)
+            if execute_col.button("Execute Generated SQL", disabled=blocked, help=help_text):
+                show_query_result(
+                    sql_query, "nl_query_results", params=params or None, prepared=True if params else None
+                )
+
 # Test Data Tab
 with tab3:
     st.subheader("Add Test Data")
-    if st.button("Add Sample Users"):
-        st.session_state.db.execute_query("INSERT INTO USERS (name) VALUES ('Vansh')")
-        st.session_state.db.execute_query("INSERT INTO USERS (name) VALUES ('Anuj')")
-        st.session_state.db.execute_query("INSERT INTO USERS (name) VALUES ('Arihant')")
-        st.success("Test data added successfully!")
-        
-        # Show current users
-        result = st.session_state.db.execute_query("SELECT * FROM USERS")
-        if isinstance(result, list):
-            df = pd.DataFrame(result)
-            st.session_state.last_result = df
-            st.dataframe(df, use_container_width=True)
-            create_download_button(df, "users_data.csv")
+    tables = list(st.session_state.db.get_schema())
+    generate_table = st.selectbox(
+        "Table to fill", tables, index=tables.index("users") if "users" in tables else 0
+    ) if tables else None
+    generate_rows = st.number_input("Number of rows", min_value=1, value=1000, step=1000)
+    generate_seed = st.number_input("Random seed", min_value=0, value=0, step=1)
+    if st.button("Generate Test Data"):
+        if generate_table is None:
+            st.warning("No tables in the current database")
+        else:
+            progress_text = st.empty()
+            try:
+                report = generate_table_data(
+                    st.session_state.db,
+                    generate_table,
+                    int(generate_rows),
+                    seed=int(generate_seed),
+                    progress=lambda report: progress_text.text(
+                        f"{report.rows:,} rows generated ({report.rows_per_second:,.0f} rows/s)"
+                    ),
+                )
+                st.success(f"Test data added successfully! {report}")
+            except Exception as e:
+                st.error(f"Error adding test data: {e}")
+
+            # Show a sample of the table
+            show_query_result(f"SELECT * FROM {quote_identifier(generate_table)} LIMIT 100", f"{generate_table}_data")
+
+    st.markdown("---")
+    st.subheader("Bulk Load CSV")
+    uploaded_csv = st.file_uploader("CSV file (first row must name the columns)", type=["csv"])
+    load_table = st.selectbox("Target table", tables) if tables else None
+    load_batch_size = st.number_input(
+        "Rows per batch", min_value=1, value=st.session_state.db.load_batch_size, step=500
+    )
+    if st.button("Load CSV"):
+        if uploaded_csv is None or load_table is None:
+            st.warning("Please choose a CSV file and a target table")
+        else:
+            progress_text = st.empty()
+            try:
+                report = st.session_state.db.load_csv(
+                    load_table,
+                    uploaded_csv,
+                    batch_size=int(load_batch_size),
+                    progress=lambda report: progress_text.text(
+                        f"{report.rows:,} rows loaded ({report.rows_per_second:,.0f} rows/s)"
+                    ),
+                )
+                st.success(str(report))
+            except Exception as e:
+                st.error(f"Error loading CSV: {e}")
+
+    st.markdown("---")
+    st.subheader("Run SQL Script")
+    uploaded_script = st.file_uploader("SQL script (seed data, schema dump, ...)", type=["sql", "txt"])
+    script_transaction_size = st.number_input(
+        "Writes per transaction (0 for one transaction)", min_value=0,
+        value=int(os.getenv("SCRIPT_TRANSACTION_SIZE", 1000)), step=500
+    )
+    script_batch_size = st.number_input(
+        "Statements per round trip", min_value=1, value=int(os.getenv("SCRIPT_BATCH_SIZE", 100)), step=50
+    )
+    if st.button("Run Script"):
+        if uploaded_script is None:
+            st.warning("Please choose a SQL script")
+        else:
+            progress_text = st.empty()
+            try:
+                report = st.session_state.db.execute_script(
+                    uploaded_script.getvalue().decode("utf-8"),
+                    transaction_size=int(script_transaction_size),
+                    batch_size=int(script_batch_size),
+                    progress=lambda report: progress_text.text(
+                        f"{report.round_trips:,} round trip(s) ({report.statements_per_second:,.0f} statements/s)"
+                    ),
+                )
+                if report.failed is None:
+                    st.success(str(report))
+                else:
+                    st.error(str(report))
+                st.dataframe([statement.as_dict() for statement in report.statements])
+            except Exception as e:
+                st.error(f"Error running script: {e}")
+
+# Fan-out Tab
+with tab4:
+    st.subheader("Run a Query Across Databases")
+    fanout_databases = st.multiselect("Databases on this server", st.session_state.db.list_databases())
+    fanout_extra = st.text_input(
+        "More databases", value=os.getenv("FANOUT_TARGETS", ""),
+        help="Comma separated; host[:port]/name for other servers, patterns like shard_* are expanded"
+    )
+    fanout_mode = st.radio("Query type", ["SQL", "Natural language"], horizontal=True)
+    fanout_query = st.text_area("Query to run on every database:", height=100)
+    order_col, direction_col = st.columns([3, 1])
+    fanout_order = order_col.text_input(
+        "Merge on sorted column(s)", help="Only if every database returns its rows sorted on these columns"
+    )
+    fanout_descending = direction_col.checkbox("Descending")
+    if st.button("Run on All"):
+        targets = [ShardTarget(name) for name in fanout_databases] + parse_targets(fanout_extra)
+        if not targets or not fanout_query:
+            st.warning("Please choose databases and enter a query")
+        else:
+            sql_query = fanout_query
+            estimate = None
+            if fanout_mode == "Natural language":
+                # The databases share one schema, so the current one drives the translation
+                sql_query, estimate = st.session_state.cost_guard.translate(
+                    st.session_state.db, st.session_state.translator, fanout_query
+                )
+                st.code(sql_query, language="sql")
+            if sql_query.startswith("Error:"):
+                st.error(sql_query)
+            elif estimate is not None and estimate.verdict == "block":
+                st.error(estimate.summary())
+            else:
+                if estimate is not None and estimate.verdict == "warn":
+                    st.warning(estimate.summary())
+                order_by = [column.strip() for column in fanout_order.split(",") if column.strip()]
+                try:
+                    outcome = run_cancellable(
+                        "Running on all databases", shared_fan_out().run, sql_query, targets,
+                        order_by=order_by or None, descending=fanout_descending, owner=st.session_state.job_owner,
+                        **query_limits()
+                    )
+                except Exception as e:
+                    st.write(f"Error running query: {e}")
+                else:
+                    st.caption(outcome.summary())
+                    if outcome.result:
+                        st.dataframe(outcome.result.to_dataframe(), use_container_width=True)
+                        if outcome.result.truncated:
+                            st.warning(f"Some databases stopped at the {int(st.session_state.max_rows):,} row limit")
+                    else:
+                        st.write("No results found")
+                    for shard in outcome.failed:
+                        st.error(f"{shard.target.name}: {shard.error}")
+                    with st.expander("Per-database timings"):
+                        st.dataframe([shard.as_dict() for shard in outcome.shards], use_container_width=True)
+
+# Jobs Tab
+with tab5:
+    st.subheader("Background Jobs")
+    jobs = shared_jobs().jobs(st.session_state.job_owner)
+    if not jobs:
+        st.info("No jobs yet. Use Run in Background in the SQL Query or Natural Language tab.")
+    else:
+        st.caption(f"At most {shared_jobs().per_user} of your jobs run at a time; the rest wait their turn")
+        st.dataframe([job.as_dict() for job in jobs], use_container_width=True, hide_index=True)
+        queries = {job.id: job for job in jobs if job.kind == "query"}
+        selected_id = st.selectbox(
+            "Show job", list(queries),
+            format_func=lambda job_id: f"#{job_id} {queries[job_id].status}: {queries[job_id].label[:80]}"
+        ) if queries else None
+        selected = queries.get(selected_id)
+        if selected is not None:
+            cancel_col, remove_col = st.columns(2)
+            if cancel_col.button("⏹ Cancel job", disabled=selected.finished):
+                shared_jobs().cancel(selected.id)
+                st.rerun()
+            if remove_col.button("Remove job", disabled=not selected.finished):
+                shared_jobs().remove(selected.id)
+                st.rerun()
+            if selected.error:
+                st.error(selected.error)
+            elif selected.message:
+                st.write(selected.message)
+            # Rows appear batch by batch while the job is still running; the DataFrame is only
+            # rebuilt when more of them have arrived, not on every refresh
+            if selected.rows:
+                st.caption(f"{selected.rows:,} row(s) fetched in {selected.elapsed:.1f}s"
+                           + ("" if selected.finished else ", still running"))
+                st.dataframe(selected.dataframe(), use_container_width=True)
+                if selected.truncated:
+                    st.warning(f"Stopped at the {selected.max_rows:,} row limit")
+            elif selected.status == "done" and not selected.message:
+                st.write("No results found")
 
 # Footer
 st.markdown("---")
-st.markdown("Made with ❤️ by Vansh Jaiswal") 
\ No newline at end of file
+st.markdown("Made with ❤️ by Vansh Jaiswal") 
+
+# Redraw while this session has jobs in flight; any click interrupts the wait
+if shared_jobs().active(st.session_state.job_owner):
+    time.sleep(JOB_REFRESH_SECONDS)
+    st.rerun()
\ No newline at end of file
@@ -0,0 +1,708 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# The schema benchmarks never call the LLM, but the client still wants a key
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from sql_translator import SQLTranslator
+from schema_retrieval import estimate_tokens
+
+NOUNS = [
+    "customer", "order", "product", "invoice", "payment", "shipment", "supplier", "warehouse",
+    "employee", "department", "region", "store", "category", "review", "coupon", "cart",
+    "account", "ledger", "vendor", "contract", "ticket", "agent", "campaign", "lead",
+    "session", "device", "license", "plan", "subscription", "refund", "address", "carrier",
+]
+ATTRIBUTES = [
+    "name", "email", "status", "amount", "price", "quantity", "created_at", "updated_at",
+    "country", "city", "phone", "title", "description", "rating", "discount", "currency",
+    "balance", "priority", "deadline", "score", "weight", "color", "size", "notes",
+]
+
+
+def synthetic_schema(table_count, columns_per_table, seed):
+    """Build a deterministic {table: [columns]} schema with foreign keys between tables"""
+    rng = random.Random(seed)
+    tables = {}
+    references = {}
+    while len(tables) < table_count:
+        name = "_".join(rng.sample(NOUNS, 2)) if len(tables) >= len(NOUNS) else NOUNS[len(tables)]
+        if name in tables:
+            continue
+        columns = ["id"] + rng.sample(ATTRIBUTES, min(columns_per_table - 1, len(ATTRIBUTES)))
+        if tables and rng.random() < 0.7:
+            parent = rng.choice(list(tables))
+            columns.append(f"{parent}_id")
+            references[name] = {f"{parent}_id": f"{parent}.id"}
+        tables[name] = columns
+    return tables, references
+
+
+def bench_schema_context(args):
+    """Compare the full schema dump against the relevance-pruned context"""
+    tables, references = synthetic_schema(args.tables, args.columns, args.seed)
+    translator = SQLTranslator()
+    translator.table_schema = {}
+    for table, columns in tables.items():
+        translator.update_schema(table, columns)
+    translator.references = references
+
+    rng = random.Random(args.seed)
+    questions = []
+    for _ in range(args.questions):
+        table = rng.choice(list(tables))
+        column = rng.choice(tables[table][1:])
+        questions.append((table, f"show the {column.replace('_', ' ')} of every {table.replace('_', ' ')}"))
+
+    started = time.perf_counter()
+    full_context = translator._get_schema_context()
+    full_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    translator._get_schema_index()
+    index_ms = (time.perf_counter() - started) * 1000
+
+    pruned_tokens = []
+    pruned_ms = []
+    hits = 0
+    for table, question in questions:
+        started = time.perf_counter()
+        context = translator._get_schema_context(question)
+        pruned_ms.append((time.perf_counter() - started) * 1000)
+        pruned_tokens.append(estimate_tokens(context))
+        hits += f"Table: `{table}`" in context
+
+    return {
+        "tables": len(tables),
+        "questions": len(questions),
+        "full_context_tokens": estimate_tokens(full_context),
+        "full_context_ms": round(full_ms, 3),
+        "index_build_ms": round(index_ms, 3),
+        "pruned_context_tokens_p50": statistics.median(pruned_tokens),
+        "pruned_context_tokens_max": max(pruned_tokens),
+        "pruned_context_ms_p50": round(statistics.median(pruned_ms), 3),
+        "target_table_recall": hits / len(questions),
+    }
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _latency_summary(milliseconds):
+    ordered = sorted(milliseconds)
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(_percentile(ordered, 0.95), 3),
+        "p99_ms": round(_percentile(ordered, 0.99), 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+
+
+def measure(function, iterations, warmup=1):
+    """Time `iterations` calls of `function(i)` and trace the peak memory of one more
+
+    tracemalloc slows every allocation down, so memory is traced in a
+    separate call instead of during the timed ones.
+    """
+    # Warm-up calls get the indices after the measured ones, so every index is used once
+    for i in range(warmup):
+        function(iterations + 1 + i)
+    timings = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        function(i)
+        timings.append((time.perf_counter() - call_started) * 1000)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        function(iterations)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return dict(
+        _latency_summary(timings),
+        iterations=iterations,
+        ops_per_second=round(iterations / elapsed, 1) if elapsed else None,
+        peak_memory_kb=round(peak / 1024, 1),
+    )
+
+
+def _run_metadata(args):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "arguments": {name: value for name, value in vars(args).items() if name not in ("run", "benchmark")},
+    }
+
+
+def bench_point_lookups(args):
+    """Time repeated primary-key lookups as plain text queries and as prepared statements
+
+    Needs a reachable MySQL server (DB_HOST, DB_USER, ...); the benchmark
+    table is created in the current database and dropped afterwards.
+    """
+    from main import Database
+
+    db = Database()
+    table = args.table
+    db.execute_query(f"DROP TABLE IF EXISTS `{table}`", use_cache=False)
+    db.execute_query(
+        f"CREATE TABLE `{table}` (id INT PRIMARY KEY, name VARCHAR(64), amount DECIMAL(10, 2))", use_cache=False
+    )
+    try:
+        rng = random.Random(args.seed)
+        db.bulk_insert(
+            table,
+            ((i, f"row {i}", round(rng.uniform(0, 1000), 2)) for i in range(1, args.rows + 1)),
+            ["id", "name", "amount"],
+        )
+        query = f"SELECT id, name, amount FROM `{table}` WHERE id = %s"
+        keys = [rng.randint(1, args.rows) for _ in range(args.lookups)]
+
+        results = {"rows": args.rows, "lookups": args.lookups}
+        for label, prepared in (("text", False), ("prepared", True)):
+            # One warm-up lookup so connecting and preparing aren't timed
+            db.fetch_all(query, (keys[0],), use_cache=False, prepared=prepared)
+            timings = []
+            started = time.perf_counter()
+            for key in keys:
+                lookup_started = time.perf_counter()
+                db.fetch_all(query, (key,), use_cache=False, prepared=prepared)
+                timings.append((time.perf_counter() - lookup_started) * 1000)
+            elapsed = time.perf_counter() - started
+            results[label] = dict(_latency_summary(timings), lookups_per_second=round(len(keys) / elapsed, 1))
+
+        results["speedup_p50"] = round(results["text"]["p50_ms"] / results["prepared"]["p50_ms"], 2)
+        results["pool"] = db.get_pool_stats()
+        return results
+    finally:
+        db.execute_query(f"DROP TABLE IF EXISTS `{table}`", use_cache=False)
+
+
+def _seed_suite_database(db, args):
+    """Create the benchmark database with `args.tables` tables of `args.rows` generated rows"""
+    from datagen import generate_table_data
+
+    for statement in (f"DROP DATABASE IF EXISTS `{args.database}`", f"CREATE DATABASE `{args.database}`"):
+        outcome = db.execute_query(statement, use_cache=False)
+        if isinstance(outcome, str) and outcome.startswith("Error"):
+            raise RuntimeError(outcome)
+    if not db.switch_database(args.database):
+        raise RuntimeError(f"Could not switch to {args.database}")
+
+    tables = [f"bench_{index}" for index in range(args.tables)]
+    for table in tables:
+        db.execute_query(
+            f"CREATE TABLE `{table}` (id INT AUTO_INCREMENT PRIMARY KEY, customer_id INT NOT NULL, "
+            "name VARCHAR(64), status VARCHAR(16), amount DECIMAL(10, 2), created_at DATETIME, "
+            "INDEX idx_customer (customer_id))",
+            use_cache=False,
+        )
+
+    started = time.perf_counter()
+    for index, table in enumerate(tables):
+        generate_table_data(db, table, args.rows, seed=args.seed + index)
+    seconds = time.perf_counter() - started
+    total = args.rows * len(tables)
+    return tables, {"rows": total, "seconds": round(seconds, 3), "rows_per_second": round(total / seconds, 1)}
+
+
+def bench_suite(args):
+    """Time the query, schema, display, DataFrame and translation paths end to end
+
+    Seeds a scratch database (dropped afterwards unless --keep) on the MySQL
+    server from DB_HOST/DB_USER/DB_PASSWORD. Translation goes to the local
+    LLM stub, so its numbers are the tool's own overhead plus --llm-latency.
+    """
+    from llm_stub import start_stub
+    from main import Database, display_results
+    from translation_cache import TranslationCache
+
+    stub = start_stub(latency=args.llm_latency)
+    os.environ["GROQ_BASE_URL"] = stub.url
+
+    db = Database()
+    report = {"run": _run_metadata(args)}
+    try:
+        tables, report["seed"] = _seed_suite_database(db, args)
+        rng = random.Random(args.seed)
+        table = tables[0]
+        range_rows = min(args.rows, args.range_rows)
+
+        def keys(_):
+            return (rng.randint(1, args.rows),)
+
+        def range_bounds(_):
+            start = rng.randint(1, max(1, args.rows - range_rows + 1))
+            return (start, start + range_rows - 1)
+
+        point_query = f"SELECT * FROM `{table}` WHERE id = %s"
+        range_query = f"SELECT * FROM `{table}` WHERE id BETWEEN %s AND %s"
+        aggregate_query = (f"SELECT customer_id, COUNT(*), SUM(amount) FROM `{table}` "
+                           "GROUP BY customer_id ORDER BY customer_id")
+        sample = db.fetch_all(range_query, range_bounds(0), use_cache=False, max_rows=0)
+
+        def cold_schema(_):
+            db.invalidate_schema()
+            db.get_schema()
+
+        def display(_):
+            with contextlib.redirect_stdout(io.StringIO()):
+                display_results(sample)
+
+        translator = SQLTranslator(cache=TranslationCache(path=":memory:"))
+        translator.load_snapshot(db.get_schema_snapshot())
+        # A new question every call, so each one is a cache miss that reaches the stub
+        questions = [f"show the names in {rng.choice(tables).replace('_', ' ')} over {i}" for i in range(
+            args.iterations + 2
+        )]
+
+        iterations = args.iterations
+        paths = {
+            "execute_query.point_lookup": lambda i: db.execute_query(point_query, keys(i), use_cache=False),
+            "execute_query.range_scan": lambda i: db.execute_query(range_query, range_bounds(i), use_cache=False,
+                                                                   max_rows=0),
+            "execute_query.aggregate": lambda i: db.execute_query(aggregate_query, use_cache=False, max_rows=0),
+            "get_schema.cold": cold_schema,
+            "get_schema.warm": lambda i: db.get_schema(),
+            "display_results": display,
+            "to_dataframe": lambda i: sample.to_dataframe(),
+            "translate": lambda i: translator.translate(questions[i]),
+        }
+        report["paths"] = {}
+        for name, function in paths.items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            report["paths"][name] = measure(function, iterations)
+        report["range_rows"] = len(sample)
+        report["llm_requests"] = stub.request_count
+        report["pool"] = db.get_pool_stats()
+        return report
+    finally:
+        stub.shutdown()
+        if not args.keep:
+            db.execute_query(f"DROP DATABASE IF EXISTS `{args.database}`", use_cache=False)
+        db.close()
+
+
+def bench_compare(args):
+    """Compare two saved suite reports path by path (ratio > 1 means the new run is slower)"""
+    with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+    comparison = {
+        "baseline": baseline.get("run", {}).get("commit"),
+        "candidate": candidate.get("run", {}).get("commit"),
+        "paths": {},
+    }
+    for name, before in baseline.get("paths", {}).items():
+        after = candidate.get("paths", {}).get(name)
+        if after is None:
+            continue
+        comparison["paths"][name] = {
+            metric: round(after[metric] / before[metric], 3) if before[metric] else None
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "peak_memory_kb")
+        }
+    return comparison
+
+
+# Schema and sample questions for the fast-path benchmark; None means the LLM should answer
+FAST_PATH_SCHEMA = {
+    "customers": ["id", "name", "email", "country", "created_at"],
+    "orders": ["id", "customer_id", "status", "amount", "created_at"],
+    "products": ["id", "name", "price", "category_id", "stock"],
+    "categories": ["id", "title"],
+    "order_items": ["id", "order_id", "product_id", "quantity"],
+}
+FAST_PATH_CORPUS = [
+    ("show all customers", "SELECT `id`, `name`, `email`, `country`, `created_at` FROM `customers` LIMIT 100"),
+    ("list orders", "SELECT `id`, `customer_id`, `status`, `amount`, `created_at` FROM `orders` LIMIT 100"),
+    ("Show me all the products.", "SELECT `id`, `name`, `price`, `category_id`, `stock` FROM `products` LIMIT 100"),
+    ("get every category", "SELECT `id`, `title` FROM `categories` LIMIT 100"),
+    ("list all order items", "SELECT `id`, `order_id`, `product_id`, `quantity` FROM `order_items` LIMIT 100"),
+    ("display the data from orders",
+     "SELECT `id`, `customer_id`, `status`, `amount`, `created_at` FROM `orders` LIMIT 100"),
+    ("count customers", "SELECT COUNT(*) FROM `customers`"),
+    ("count rows in orders", "SELECT COUNT(*) FROM `orders`"),
+    ("how many products are there?", "SELECT COUNT(*) FROM `products`"),
+    ("how many orders do we have", "SELECT COUNT(*) FROM `orders`"),
+    ("how many orders are there where status is 'shipped'",
+     "SELECT COUNT(*) FROM `orders` WHERE `status` = 'shipped'"),
+    ("count customers where country is Germany", "SELECT COUNT(*) FROM `customers` WHERE `country` = 'Germany'"),
+    ("find customers where name is Alice",
+     "SELECT `id`, `name`, `email`, `country`, `created_at` FROM `customers` WHERE `name` = 'Alice' LIMIT 100"),
+    ("find customers whose email contains example.com",
+     "SELECT `id`, `name`, `email`, `country`, `created_at`"
+     " FROM `customers` WHERE `email` LIKE '%example.com%' LIMIT 100"),
+    ("show products where price > 100",
+     "SELECT `id`, `name`, `price`, `category_id`, `stock` FROM `products` WHERE `price` > 100 LIMIT 100"),
+    ("list products with stock under 5",
+     "SELECT `id`, `name`, `price`, `category_id`, `stock` FROM `products` WHERE `stock` < 5 LIMIT 100"),
+    ("show orders where amount is greater than 250.5",
+     "SELECT `id`, `customer_id`, `status`, `amount`, `created_at` FROM `orders` WHERE `amount` > 250.5 LIMIT 100"),
+    ("show customers where email is null",
+     "SELECT `id`, `name`, `email`, `country`, `created_at` FROM `customers` WHERE `email` IS NULL LIMIT 100"),
+    ("show products whose name starts with 'Pro'",
+     "SELECT `id`, `name`, `price`, `category_id`, `stock` FROM `products` WHERE `name` LIKE 'Pro%' LIMIT 100"),
+    ("show the first 10 customers", "SELECT `id`, `name`, `email`, `country`, `created_at` FROM `customers` LIMIT 10"),
+    ("show the top 5 orders by amount",
+     "SELECT `id`, `customer_id`, `status`, `amount`, `created_at` FROM `orders` ORDER BY `amount` DESC LIMIT 5"),
+    ("list the top 3 products by price asc",
+     "SELECT `id`, `name`, `price`, `category_id`, `stock` FROM `products` ORDER BY `price` ASC LIMIT 3"),
+    ("show the latest 20 orders",
+     "SELECT `id`, `customer_id`, `status`, `amount`, `created_at` FROM `orders` ORDER BY `id` DESC LIMIT 20"),
+    ("show the oldest 5 customers",
+     "SELECT `id`, `name`, `email`, `country`, `created_at` FROM `customers` ORDER BY `id` ASC LIMIT 5"),
+    ("show the names of customers", "SELECT `name` FROM `customers` LIMIT 100"),
+    ("show name and email of all customers", "SELECT `name`, `email` FROM `customers` LIMIT 100"),
+    ("get the title of every category", "SELECT `title` FROM `categories` LIMIT 100"),
+    ("list name, price of products where stock is 0",
+     "SELECT `name`, `price` FROM `products` WHERE `stock` = 0 LIMIT 100"),
+    ("show customers and their orders", None),
+    ("total amount of orders per customer", None),
+    ("average price of products in each category", None),
+    ("which customers ordered more than 3 times", None),
+    ("show orders where status is shipped and amount over 100", None),
+    ("list the distinct countries of customers", None),
+    ("show top 5 products", None),
+    ("what is the most popular product", None),
+    ("show orders placed last week", None),
+    ("find customers who never placed an order", None),
+    ("show the revenue by month", None),
+    ("list products between 10 and 20 dollars", None),
+]
+
+
+def bench_fast_path(args):
+    """Hit rate, accuracy and latency of the local fast path on a corpus of sample questions
+
+    Every question is also sent through SQLTranslator.translate with the LLM
+    stub behind it, so the end-to-end latency of each tier can be compared.
+    """
+    from fast_path import FastPath
+    from llm_stub import start_stub
+    from translation_cache import TranslationCache
+
+    schema, corpus = FAST_PATH_SCHEMA, FAST_PATH_CORPUS
+    if args.corpus:
+        with open(args.corpus) as corpus_file:
+            entries = [json.loads(line) for line in corpus_file if line.strip()]
+        corpus = [(entry["question"], entry.get("sql")) for entry in entries]
+
+    fast_path = FastPath(schema)
+    answered = correct = wrong = missed = 0
+    mismatches = []
+    for question, expected in corpus:
+        match = fast_path.translate(question)
+        if match is None:
+            missed += expected is not None
+            continue
+        answered += 1
+        if match.sql == expected:
+            correct += 1
+        else:
+            wrong += 1
+            mismatches.append({"question": question, "expected": expected, "got": match.sql})
+
+    questions = [question for question, _ in corpus]
+    match_timing = measure(lambda i: fast_path.translate(questions[i % len(questions)]), len(questions) * args.repeat)
+    # A match takes microseconds, so report those
+    for name in ("p50_ms", "p95_ms", "p99_ms", "mean_ms"):
+        match_timing[name.replace("_ms", "_us")] = round(match_timing.pop(name) * 1000, 2)
+
+    stub = start_stub(latency=args.llm_latency)
+    os.environ["GROQ_BASE_URL"] = stub.url
+    try:
+        translator = SQLTranslator(cache=TranslationCache(path=":memory:"))
+        translator.table_schema = {}
+        for table, columns in schema.items():
+            translator.update_schema(table, columns)
+        tiers = {}
+        for question in questions:
+            started = time.perf_counter()
+            translator.translate(question)
+            tiers.setdefault(translator.last_tier, []).append((time.perf_counter() - started) * 1000)
+    finally:
+        stub.shutdown()
+
+    answerable = sum(expected is not None for _, expected in corpus)
+    return {
+        "questions": len(corpus),
+        "answerable_locally": answerable,
+        "hit_rate": round(answered / len(corpus), 3),
+        "recall": round(correct / answerable, 3) if answerable else None,
+        "precision": round(correct / answered, 3) if answered else None,
+        "wrong": wrong,
+        "missed": missed,
+        "mismatches": mismatches,
+        "fast_path_match": match_timing,
+        "translate_by_tier": {
+            tier: dict(_latency_summary(timings), requests=len(timings)) for tier, timings in tiers.items()
+        },
+    }
+
+
+# What a chatty model writes after the statement; a streaming translator never waits for it
+STREAMING_TRAILING_TEXT = (
+    "\n\nThis query selects the requested column from the table and limits the result to 100 rows, "
+    "which keeps the response small. If you need more rows, raise or remove the LIMIT clause, and add a "
+    "WHERE clause to narrow the result down to the records you are interested in."
+)
+
+
+def bench_streaming(args):
+    """Time-to-SQL of streamed vs complete LLM answers against the local stub
+
+    The stub writes one word every `--token-latency` seconds and keeps
+    talking after the SQL, like a model explaining its answer. The
+    streaming translator stops reading at the end of the statement.
+    """
+    import instrumentation
+    from llm_stub import start_stub
+    from translation_cache import TranslationCache
+
+    stub = start_stub(latency=args.llm_latency, token_latency=args.token_latency, trailing=STREAMING_TRAILING_TEXT)
+    os.environ["GROQ_BASE_URL"] = stub.url
+    recorder = instrumentation.recorder
+    was_enabled = recorder.enabled
+    recorder.enabled = True
+    report = {"run": _run_metadata(args)}
+    try:
+        outputs = {}
+        for mode, stream in (("complete", False), ("streamed", True)):
+            translator = SQLTranslator(cache=TranslationCache(path=":memory:"))
+            translator.stream = stream
+            translator.fast_path_enabled = False
+            translator.table_schema = {}
+            for table, columns in FAST_PATH_SCHEMA.items():
+                translator.update_schema(table, columns)
+            # One untimed call creates the client and opens the HTTP connection
+            translator.translate("warm up the client")
+            recorder.clear()
+            chunks_before = stub.chunks_sent
+            timings = []
+            outputs[mode] = []
+            for i in range(args.requests):
+                started = time.perf_counter()
+                # Distinct questions, so the translation cache never answers
+                outputs[mode].append(translator.translate(f"show the customers, request {i}"))
+                timings.append((time.perf_counter() - started) * 1000)
+            traces = recorder.recent("translate")
+            report[mode] = dict(_latency_summary(timings), requests=args.requests)
+            if stream:
+                report[mode]["time_to_first_token"] = _latency_summary(
+                    [entry["stages_ms"]["llm_first_token"] for entry in traces]
+                )
+                report[mode]["time_to_sql"] = _latency_summary([entry["stages_ms"]["time_to_sql"] for entry in traces])
+                report[mode]["stopped_early"] = sum(bool(entry.get("stopped_early")) for entry in traces)
+                report[mode]["chunks_per_request"] = round((stub.chunks_sent - chunks_before) / args.requests, 1)
+        report["same_sql"] = outputs["complete"] == outputs["streamed"]
+        report["speedup_p50"] = round(report["complete"]["p50_ms"] / report["streamed"]["p50_ms"], 2)
+    finally:
+        recorder.enabled = was_enabled
+        stub.shutdown()
+    return report
+
+
+def _direct_imports(module, here):
+    """Cumulative import time (ms) of each module `module` imports directly, slowest first"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=here, capture_output=True, text=True
+    )
+    # importtime lists each module after the modules it imported, so children come first
+    imports, children = {}, {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # After the separator's space, importtime indents each nesting level by two spaces
+        name = name[1:]
+        if not name.startswith(" "):
+            if name == module:
+                imports = children
+            children = {}
+        elif not name.startswith("   "):
+            children[name.strip()] = round(int(cumulative) / 1000, 3)
+    return dict(sorted(imports.items(), key=lambda item: item[1], reverse=True))
+
+
+def bench_startup(args):
+    """Cold start of the CLI: bare interpreter, `import main`, and time to the first menu prompt
+
+    Every run is a fresh interpreter. The first-prompt runs use
+    `main.py --startup-time`, which connects to MySQL; without a server
+    only the import timings are reported.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def run(*command):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, *command], cwd=here, capture_output=True, text=True)
+        return (time.perf_counter() - started) * 1000, completed
+
+    report = {"run": _run_metadata(args)}
+    for name, command in (("interpreter", ("-c", "pass")), ("import_main", ("-c", "import main"))):
+        run(*command)  # warm the OS file cache and the .pyc files
+        report[name] = _latency_summary([run(*command)[0] for _ in range(args.runs)])
+
+    wall, reports = [], []
+    for _ in range(args.runs):
+        milliseconds, completed = run("main.py", "--startup-time")
+        if completed.returncode != 0:
+            output = (completed.stdout + completed.stderr).strip().splitlines()
+            report["first_prompt"] = {"error": output[-1] if output else f"exit code {completed.returncode}"}
+            break
+        wall.append(milliseconds)
+        reports.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    if reports:
+        report["first_prompt"] = dict(
+            _latency_summary(wall),
+            in_process={
+                name: _latency_summary([entry[name] for entry in reports])
+                for name in ("imports_ms", "setup_ms", "first_prompt_ms")
+            },
+            lazy_modules_loaded=reports[-1]["lazy_modules_loaded"],
+        )
+
+    report["slowest_imports_ms"] = dict(list(_direct_imports("main", here).items())[:args.top])
+    return report
+
+
+def bench_script(args):
+    """Run a generated seed script with execute_script and line by line with execute_query
+
+    Needs a reachable MySQL server; the benchmark table is created in the
+    current database and dropped afterwards. Both runs insert the same
+    `args.statements` single-row INSERTs into an emptied table.
+    """
+    from main import Database
+
+    db = Database()
+    table = args.table
+    rng = random.Random(args.seed)
+    statements = [
+        f"INSERT INTO `{table}` (id, name, amount) VALUES ({i}, 'row {i}', {rng.uniform(0, 1000):.2f})"
+        for i in range(1, args.statements + 1)
+    ]
+    script = ";\n".join(statements) + ";\n"
+    db.execute_query(f"DROP TABLE IF EXISTS `{table}`", use_cache=False)
+    db.execute_query(
+        f"CREATE TABLE `{table}` (id INT PRIMARY KEY, name VARCHAR(64), amount DECIMAL(10, 2))", use_cache=False
+    )
+    report = {"run": _run_metadata(args), "statements": args.statements, "script_bytes": len(script)}
+    try:
+        started = time.perf_counter()
+        for statement in statements:
+            outcome = db.execute_query(statement, use_cache=False)
+            if isinstance(outcome, str) and outcome.startswith("Error"):
+                raise RuntimeError(outcome)
+        seconds = time.perf_counter() - started
+        report["line_by_line"] = {
+            "seconds": round(seconds, 3), "statements_per_second": round(len(statements) / seconds, 1)
+        }
+
+        db.execute_query(f"TRUNCATE TABLE `{table}`", use_cache=False)
+        outcome = db.execute_script(script, transaction_size=args.transaction_size, batch_size=args.batch_size)
+        if outcome.failed is not None:
+            raise RuntimeError(str(outcome))
+        report["script"] = {
+            "seconds": round(outcome.seconds, 3),
+            "statements_per_second": round(outcome.statements_per_second, 1),
+            "round_trips": outcome.round_trips,
+            "transactions": outcome.commits,
+        }
+        report["speedup"] = round(report["line_by_line"]["seconds"] / outcome.seconds, 1)
+        return report
+    finally:
+        db.execute_query(f"DROP TABLE IF EXISTS `{table}`", use_cache=False)
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the MySQL Automation Tool")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    schema_parser = subparsers.add_parser("schema-context", help="full vs relevance-pruned schema prompts")
+    schema_parser.add_argument("--tables", type=int, default=300)
+    schema_parser.add_argument("--columns", type=int, default=12)
+    schema_parser.add_argument("--questions", type=int, default=200)
+    schema_parser.add_argument("--seed", type=int, default=42)
+    schema_parser.set_defaults(run=bench_schema_context)
+
+    lookup_parser = subparsers.add_parser("point-lookups", help="text vs prepared primary-key lookups (needs MySQL)")
+    lookup_parser.add_argument("--rows", type=int, default=10000)
+    lookup_parser.add_argument("--lookups", type=int, default=2000)
+    lookup_parser.add_argument("--table", default="benchmark_point_lookups")
+    lookup_parser.add_argument("--seed", type=int, default=42)
+    lookup_parser.set_defaults(run=bench_point_lookups)
+
+    suite_parser = subparsers.add_parser("suite", help="query, schema, display and translation paths (needs MySQL)")
+    suite_parser.add_argument("--database", default="chatwithdb_benchmark", help="scratch database to create")
+    suite_parser.add_argument("--tables", type=int, default=5)
+    suite_parser.add_argument("--rows", type=int, default=10000, help="rows per table")
+    suite_parser.add_argument("--range-rows", type=int, default=1000, help="rows read by the range scan")
+    suite_parser.add_argument("--iterations", type=int, default=50)
+    suite_parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub takes per completion")
+    suite_parser.add_argument("--only", nargs="*", help="run only paths starting with these names")
+    suite_parser.add_argument("--seed", type=int, default=42)
+    suite_parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    suite_parser.set_defaults(run=bench_suite)
+
+    fast_parser = subparsers.add_parser("fast-path", help="hit rate and latency of the local translator tier")
+    fast_parser.add_argument("--corpus", help="JSONL of {\"question\": ..., \"sql\": ... or null} against the sample schema")
+    fast_parser.add_argument("--repeat", type=int, default=100, help="passes over the corpus for the timing")
+    fast_parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds the stub takes per completion")
+    fast_parser.set_defaults(run=bench_fast_path)
+
+    streaming_parser = subparsers.add_parser("streaming", help="time-to-SQL of streamed vs complete LLM answers")
+    streaming_parser.add_argument("--requests", type=int, default=20)
+    streaming_parser.add_argument("--llm-latency", type=float, default=0.1, help="seconds before the first word")
+    streaming_parser.add_argument("--token-latency", type=float, default=0.02, help="seconds per streamed word")
+    streaming_parser.set_defaults(run=bench_streaming)
+
+    startup_parser = subparsers.add_parser("startup", help="cold start: imports and time to the first CLI prompt")
+    startup_parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per measurement")
+    startup_parser.add_argument("--top", type=int, default=10, help="slowest direct imports of main to list")
+    startup_parser.set_defaults(run=bench_startup)
+
+    script_parser = subparsers.add_parser("script", help="batched script execution vs line by line (needs MySQL)")
+    script_parser.add_argument("--statements", type=int, default=5000, help="INSERT statements in the script")
+    script_parser.add_argument("--transaction-size", type=int, default=1000, help="writes per transaction")
+    script_parser.add_argument("--batch-size", type=int, default=100, help="statements per round trip")
+    script_parser.add_argument("--table", default="benchmark_script")
+    script_parser.add_argument("--seed", type=int, default=42)
+    script_parser.set_defaults(run=bench_script)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two saved suite reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.set_defaults(run=bench_compare)
+
+    args = parser.parse_args()
+    print(json.dumps(args.run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import csv
+import io
+import itertools
+import os
+import time
+
+import mysql.connector
+
+
+def quote_identifier(name):
+    """Backtick-quote a table or column name for MySQL"""
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+class LoadReport:
+    """Progress and throughput of one bulk load"""
+
+    def __init__(self, table, method):
+        self.table = table
+        self.method = method
+        self.rows = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def __str__(self):
+        return (f"{self.rows} row(s) loaded into {self.table} in {self.batches} batch(es), "
+                f"{self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s, {self.method})")
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def _add_batch(self, rows):
+        self.rows += rows
+        self.batches += 1
+        self.seconds = time.perf_counter() - self.started
+
+
+def insert_statement(table, columns):
+    """INSERT statement with one %s placeholder per column, for executemany"""
+    column_list = ", ".join(quote_identifier(column) for column in columns)
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"INSERT INTO {quote_identifier(table)} ({column_list}) VALUES ({placeholders})"
+
+
+def batched(rows, batch_size):
+    """Yield lists of at most batch_size items from any iterable"""
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert_batches(db, table, columns, row_batches, progress=None, method="executemany"):
+    """Insert already-batched rows, committing after every batch"""
+    report = LoadReport(table, method)
+    statement = insert_statement(table, columns)
+    with db.raw_cursor(dictionary=False) as (conn, cursor):
+        for batch in row_batches:
+            # mysql.connector rewrites executemany of an INSERT into one multi-row INSERT
+            cursor.executemany(statement, batch)
+            conn.commit()
+            db.invalidate_cached_results([table])
+            report._add_batch(len(batch))
+            if progress:
+                progress(report)
+    return report
+
+
+def iter_dataframe_batches(df, batch_size):
+    """Yield lists of plain Python tuples from a DataFrame, NaN/NaT mapped to None"""
+    for start in range(0, len(df), batch_size):
+        chunk = df.iloc[start:start + batch_size]
+        columns = []
+        for position in range(chunk.shape[1]):
+            series = chunk.iloc[:, position]
+            # astype(object) turns numpy scalars into Python ones the connector can convert
+            values = series.astype(object).where(series.notna(), None).tolist()
+            if str(series.dtype).startswith("datetime"):
+                values = [value.to_pydatetime() if value is not None else None for value in values]
+            columns.append(values)
+        yield list(zip(*columns))
+
+
+def iter_csv_rows(csv_file):
+    """Return (header, row iterator) for a CSV file object; empty fields become NULL"""
+    reader = csv.reader(csv_file)
+    header = next(reader, None)
+    if header is None:
+        return [], iter(())
+    return header, ([value if value != "" else None for value in row] for row in reader)
+
+
+def load_data_local_infile(db, table, path, columns=None, progress=None):
+    """Load a CSV file with LOAD DATA LOCAL INFILE (header row skipped, empty fields as NULL)"""
+    if columns is None:
+        with open(path, newline="", encoding="utf-8") as csv_file:
+            columns = next(csv.reader(csv_file), [])
+
+    variables = [f"@c{position}" for position in range(len(columns))]
+    assignments = ", ".join(
+        f"{quote_identifier(column)} = NULLIF({variable}, '')" for column, variable in zip(columns, variables)
+    )
+    statement = (
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE {quote_identifier(table)} "
+        "CHARACTER SET utf8mb4 "
+        "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+        "LINES TERMINATED BY '\\n' IGNORE 1 LINES "
+        f"({', '.join(variables)}) SET {assignments}"
+    )
+
+    report = LoadReport(table, "load data local infile")
+    with db.raw_cursor(dictionary=False) as (conn, cursor):
+        cursor.execute(statement, (os.path.abspath(path),))
+        conn.commit()
+        db.invalidate_cached_results([table])
+        report._add_batch(cursor.rowcount)
+    if progress:
+        progress(report)
+    return report
+
+
+def load_csv(db, table, source, batch_size, use_local_infile=None, progress=None):
+    """Load a CSV path or text/binary file object into a table
+
+    Paths go through LOAD DATA LOCAL INFILE when it is enabled
+    (DB_ALLOW_LOCAL_INFILE) and fall back to batched INSERTs otherwise.
+    """
+    if use_local_infile is None:
+        use_local_infile = db.pool.connect_args.get("allow_local_infile", False)
+
+    if isinstance(source, (str, os.PathLike)):
+        if use_local_infile:
+            try:
+                return load_data_local_infile(db, table, source, progress=progress)
+            except mysql.connector.Error as err:
+                # Usually local_infile is disabled on the server; batched INSERTs always work
+                print(f"LOAD DATA LOCAL INFILE failed ({err}), falling back to batched inserts")
+        with open(source, newline="", encoding="utf-8") as csv_file:
+            header, rows = iter_csv_rows(csv_file)
+            return insert_batches(db, table, header, batched(rows, batch_size), progress)
+
+    if isinstance(source, io.TextIOBase):
+        csv_file = source
+    else:
+        csv_file = io.TextIOWrapper(source, encoding="utf-8", newline="")
+    header, rows = iter_csv_rows(csv_file)
+    return insert_batches(db, table, header, batched(rows, batch_size), progress)
@@ -0,0 +1,231 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sql_classifier import classify
+
+# Statements EXPLAIN accepts
+EXPLAINABLE_STATEMENTS = ("SELECT", "TABLE", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+class CostEstimate:
+    """What EXPLAIN FORMAT=JSON says a statement will cost, plus the guard's verdict"""
+
+    def __init__(self, query, plan):
+        self.query = query
+        self.plan = plan
+        # One entry per table access: table, access_type, key, possible_keys, rows, examined
+        self.tables = []
+        self.rows_examined = 0
+        self.filesort = False
+        self.temporary = False
+        self.query_cost = None
+        self.verdict = "ok"
+        self.reasons = []
+
+    @property
+    def full_scans(self):
+        # <derived2>, <union1,2>, ... are MySQL's own temporary tables, not ones the query can index
+        return [
+            table for table in self.tables
+            if table["access_type"] == "ALL" and not table["table"].startswith("<")
+        ]
+
+    def summary(self):
+        """One line for the CLI and the web app"""
+        parts = [f"~{self.rows_examined:,} row(s) examined"]
+        if self.query_cost is not None:
+            parts.append(f"cost {self.query_cost:,.1f}")
+        indexes = sorted({table["key"] for table in self.tables if table["key"]})
+        parts.append(f"indexes: {', '.join(indexes)}" if indexes else "no index used")
+        if self.full_scans:
+            parts.append("full scan of " + ", ".join(table["table"] for table in self.full_scans))
+        if self.filesort:
+            parts.append("filesort")
+        if self.temporary:
+            parts.append("temporary table")
+        return f"{self.verdict.upper()}: " + "; ".join(parts)
+
+    def feedback(self):
+        """Plan problems phrased for the translator's revision prompt"""
+        lines = [f"- {reason}" for reason in self.reasons]
+        for table in self.full_scans:
+            hint = f"; usable indexes: {', '.join(table['possible_keys'])}" if table["possible_keys"] else ""
+            lines.append(f"- `{table['table']}` is read in full (~{table['rows']:,} rows){hint}")
+        return "\n".join(lines)
+
+
+def explain_plan(db, query, params=None):
+    """Return the parsed EXPLAIN FORMAT=JSON plan of a statement, or None if it can't be explained"""
+    statement = classify(query)
+    if statement.type not in EXPLAINABLE_STATEMENTS or statement.statement_count != 1:
+        return None
+    with db.raw_cursor(dictionary=False) as (_, cursor):
+        cursor.execute("EXPLAIN FORMAT=JSON " + query.strip().rstrip(";"), params)
+        row = cursor.fetchone()
+        cursor.fetchall()
+    return json.loads(row[0]) if row else None
+
+
+def _add_table(table, estimate, outer_rows):
+    """Record one table access and return the rows the join produces after it"""
+    # MariaDB reports "rows" instead of rows_examined_per_scan
+    rows = int(table.get("rows_examined_per_scan", table.get("rows", 0)) or 0)
+    examined = outer_rows * rows
+    estimate.tables.append({
+        "table": table.get("table_name", "?"),
+        "access_type": table.get("access_type", "?"),
+        "key": table.get("key"),
+        "possible_keys": table.get("possible_keys") or [],
+        "rows": rows,
+        "examined": examined,
+    })
+    estimate.rows_examined += examined
+    # Derived tables and subqueries hang off the table node
+    for value in table.values():
+        if isinstance(value, (dict, list)):
+            _walk(value, estimate)
+    produced = table.get("rows_produced_per_join")
+    return int(produced) if produced is not None else examined
+
+
+def _walk(node, estimate):
+    if isinstance(node, list):
+        for item in node:
+            _walk(item, estimate)
+        return
+    if not isinstance(node, dict):
+        return
+
+    if node.get("using_filesort"):
+        estimate.filesort = True
+    if node.get("using_temporary_table"):
+        estimate.temporary = True
+
+    for key, value in node.items():
+        if key == "nested_loop":
+            # Each table is scanned once per row the tables before it produce
+            produced = 1
+            for item in value:
+                if "table" in item:
+                    produced = _add_table(item["table"], estimate, produced)
+                else:
+                    _walk(item, estimate)
+        elif key == "table" and isinstance(value, dict):
+            _add_table(value, estimate, 1)
+        elif isinstance(value, (dict, list)):
+            _walk(value, estimate)
+
+
+class CostGuard:
+    """Checks statements against a row budget using EXPLAIN before they run
+
+    Over `warn_rows` examined rows, or a full scan of a table larger than
+    `full_scan_rows`, is a warning; over `block_rows` blocks the statement
+    unless the guard runs in "warn" mode.
+    """
+
+    def __init__(self, warn_rows=None, block_rows=None, full_scan_rows=None, mode=None, max_revisions=None):
+        self.warn_rows = int(warn_rows or os.getenv("COST_GUARD_WARN_ROWS", 100000))
+        self.block_rows = int(block_rows or os.getenv("COST_GUARD_BLOCK_ROWS", 10000000))
+        self.full_scan_rows = int(full_scan_rows or os.getenv("COST_GUARD_FULL_SCAN_ROWS", 10000))
+        # "block", "warn" (never block) or "off"
+        self.mode = (mode or os.getenv("COST_GUARD_MODE", "block")).lower()
+        self.max_revisions = int(
+            max_revisions if max_revisions is not None else os.getenv("COST_GUARD_MAX_REVISIONS", 1)
+        )
+        # Runs EXPLAIN on a translation as soon as its statement has streamed in
+        self._explainer = ThreadPoolExecutor(max_workers=4, thread_name_prefix="explain")
+
+    def close(self):
+        """Stop the EXPLAIN threads; running checks finish, queued ones are dropped"""
+        self._explainer.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def analyze(self, plan, query=""):
+        """Build a CostEstimate from a parsed EXPLAIN FORMAT=JSON plan"""
+        estimate = CostEstimate(query, plan)
+        _walk(plan, estimate)
+        cost = plan.get("query_block", {}).get("cost_info", {}).get("query_cost")
+        estimate.query_cost = float(cost) if cost is not None else None
+
+        if estimate.rows_examined > self.block_rows:
+            estimate.reasons.append(
+                f"examines ~{estimate.rows_examined:,} rows, over the {self.block_rows:,} row budget"
+            )
+            estimate.verdict = "block" if self.mode == "block" else "warn"
+        elif estimate.rows_examined > self.warn_rows:
+            estimate.reasons.append(f"examines ~{estimate.rows_examined:,} rows (warning above {self.warn_rows:,})")
+            estimate.verdict = "warn"
+
+        large_scans = [table for table in estimate.full_scans if table["rows"] > self.full_scan_rows]
+        if large_scans:
+            joined = [table for table in large_scans if table["examined"] > table["rows"]]
+            if joined:
+                estimate.reasons.append(
+                    "joins " + ", ".join(table["table"] for table in joined) + " without an index (cartesian-like)"
+                )
+            if estimate.verdict == "ok":
+                estimate.verdict = "warn"
+        if (estimate.filesort or estimate.temporary) and estimate.rows_examined > self.full_scan_rows:
+            estimate.reasons.append("sorts or groups a large intermediate result (filesort/temporary table)")
+            if estimate.verdict == "ok":
+                estimate.verdict = "warn"
+        return estimate
+
+    def check(self, db, query, params=None):
+        """EXPLAIN a statement and judge it; None when the guard is off or EXPLAIN doesn't apply"""
+        if not self.enabled:
+            return None
+        plan = explain_plan(db, query, params)
+        return self.analyze(plan, query) if plan is not None else None
+
+    def translate(self, db, translator, natural_language_query):
+        """Translate a request and, while the plan is blocked, ask for a cheaper query
+
+        Returns (sql, estimate). Warnings cost no extra model round trips;
+        they come back in the estimate for the caller to show. A revision is only kept when EXPLAIN says
+        it examines fewer rows than the query it replaces. With a streaming
+        translator, EXPLAIN starts as soon as the statement is complete.
+        """
+        early = {}
+
+        def explain_early(sql):
+            early[sql] = self._explainer.submit(self.check, db, sql)
+
+        sql_query = translator.translate(natural_language_query, on_sql=explain_early if self.enabled else None)
+        if sql_query.startswith("Error:"):
+            return sql_query, None
+        try:
+            # Answers from the fast path or the cache never streamed, so they are explained now
+            estimate = early[sql_query].result() if sql_query in early else self.check(db, sql_query)
+        except Exception as e:
+            # Usually invalid SQL; running it reports the same error to the user
+            print(f"Error explaining query: {e}")
+            return sql_query, None
+
+        for _ in range(self.max_revisions):
+            if estimate is None or estimate.verdict != "block":
+                break
+            revised = translator.revise(natural_language_query, sql_query, estimate.feedback())
+            if revised.startswith("Error:") or revised == sql_query:
+                break
+            try:
+                revised_estimate = self.check(db, revised)
+            except Exception as e:
+                print(f"Error explaining revised query: {e}")
+                break
+            if revised_estimate is None or revised_estimate.rows_examined >= estimate.rows_examined:
+                break
+            sql_query, estimate = revised, revised_estimate
+            translator.remember(natural_language_query, sql_query)
+        return sql_query, estimate
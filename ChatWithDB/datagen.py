@@ -0,0 +1,273 @@
+import datetime
+import decimal
+import random
+import re
+
+from bulk_load import batched, insert_batches, quote_identifier
+
+FIRST_NAMES = [
+    "Vansh", "Anuj", "Arihant", "Aarav", "Diya", "Ishaan", "Meera", "Kabir", "Riya", "Arjun",
+    "Sara", "Rohan", "Anaya", "Vihaan", "Myra", "Aditya", "Kiara", "Reyansh", "Tara", "Dev",
+]
+LAST_NAMES = [
+    "Jaiswal", "Sharma", "Verma", "Gupta", "Mehta", "Iyer", "Nair", "Reddy", "Kapoor", "Singh",
+    "Patel", "Das", "Bose", "Menon", "Joshi", "Khan", "Rao", "Chopra", "Malhotra", "Agarwal",
+]
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Pune", "Chennai", "Kolkata", "Jaipur", "Lucknow", "Indore", "Surat"]
+COUNTRIES = ["India", "United States", "Germany", "Japan", "Brazil", "Canada", "Australia", "France"]
+STATUSES = ["active", "inactive", "pending", "shipped", "cancelled", "completed"]
+WORDS = [
+    "alpha", "bravo", "cobalt", "delta", "ember", "falcon", "garnet", "harbor", "indigo", "jade",
+    "kepler", "lumen", "meadow", "nova", "orbit", "pixel", "quartz", "river", "summit", "tundra",
+]
+
+INTEGER_RANGES = {
+    "tinyint": 127, "smallint": 32767, "mediumint": 8388607, "int": 2147483647, "bigint": 2 ** 63 - 1,
+}
+BASE_DATETIME = datetime.datetime(2020, 1, 1)
+TEXT_TYPES = ("char", "varchar", "tinytext", "text", "mediumtext", "longtext")
+
+
+def _with_suffix(text, suffix, max_length):
+    """`text` cut short enough for the unique `suffix` to fit in `max_length` characters"""
+    return text[:max(0, max_length - len(suffix))] + suffix
+
+
+def _unique_sequence(column):
+    """How unique values of a column are numbered: "integer", "email", "text" or None (not unique)"""
+    if column.key not in ("PRI", "UNI") or column.references:
+        return None
+    data_type = (column.data_type or "").lower()
+    if data_type in INTEGER_RANGES:
+        return "integer"
+    if data_type in TEXT_TYPES:
+        return "email" if "email" in column.name.lower() else "text"
+    return None
+
+
+def _sequence_limit(column):
+    """Largest number a unique column's values can carry"""
+    if _unique_sequence(column) == "integer":
+        upper = INTEGER_RANGES[column.data_type.lower()]
+        return 2 * upper + 1 if "unsigned" in (column.column_type or "").lower() else upper
+    # The number alone must fit when the column is too short for anything else
+    return 10 ** (column.max_length or 255) - 1
+
+
+def _sequence_max(column):
+    """SQL for the largest number already used in a unique column's values"""
+    name = quote_identifier(column.name)
+    sequence = _unique_sequence(column)
+    if sequence == "integer":
+        return f"MAX({name})"
+    text = f"SUBSTRING_INDEX({name}, '@', 1)" if sequence == "email" else name
+    # Generated text ends in its number (the local part, for emails)
+    return f"MAX(CAST(REGEXP_SUBSTR({text}, '[0-9]+$') AS UNSIGNED))"
+
+
+def _column_generator(column, rng, unique_offset):
+    """Return f(i) -> value for the i-th generated row of a column"""
+    data_type = (column.data_type or "").lower()
+    column_type = (column.column_type or "").lower()
+    name = column.name.lower()
+    unique = column.key in ("PRI", "UNI")
+    max_length = column.max_length or 255
+
+    if data_type in INTEGER_RANGES:
+        if unique:
+            return lambda i: unique_offset + i + 1
+        if column_type.startswith("tinyint(1)"):
+            return lambda i: rng.random() < 0.5
+        upper = min(INTEGER_RANGES[data_type], 100000)
+        return lambda i: rng.randint(0, upper)
+
+    if data_type in ("decimal", "numeric"):
+        match = re.search(r"\((\d+),(\d+)\)", column_type)
+        precision, scale = (int(match.group(1)), int(match.group(2))) if match else (10, 2)
+        upper = min(10 ** (precision - scale) - 1, 100000)
+        quantum = decimal.Decimal(1).scaleb(-scale)
+        return lambda i: decimal.Decimal(rng.uniform(0, upper)).quantize(quantum)
+
+    if data_type in ("float", "double", "real"):
+        return lambda i: round(rng.uniform(0, 1000), 4)
+
+    if data_type in ("date", "datetime", "timestamp"):
+        def datetime_value(i):
+            value = BASE_DATETIME + datetime.timedelta(seconds=rng.randrange(5 * 365 * 24 * 3600))
+            return value.date() if data_type == "date" else value
+        return datetime_value
+
+    if data_type == "time":
+        return lambda i: datetime.timedelta(seconds=rng.randrange(24 * 3600))
+
+    if data_type == "year":
+        return lambda i: rng.randint(2000, 2030)
+
+    if data_type in ("enum", "set"):
+        options = re.findall(r"'((?:[^']|'')*)'", column_type) or [""]
+        return lambda i: rng.choice(options)
+
+    if data_type == "json":
+        return lambda i: f'{{"seq": {i}, "tag": "{rng.choice(WORDS)}"}}'
+
+    if data_type in ("binary", "varbinary", "blob", "tinyblob", "mediumblob", "longblob", "bit"):
+        size = 1 if data_type == "bit" else min(max_length, 16)
+        return lambda i: bytes(rng.getrandbits(8) for _ in range(size))
+
+    # Character types: pick realistic values from the column name
+    if "email" in name:
+        def text(i):
+            number = str(unique_offset + i + 1)
+            # Short columns drop the domain before the number that keeps the address unique
+            suffix = f"{number}@example.com" if len(number) + len("@example.com") < max_length else number
+            return _with_suffix(
+                f"{rng.choice(FIRST_NAMES).lower()}.{rng.choice(LAST_NAMES).lower()}", suffix, max_length
+            )
+    elif name in ("name", "full_name", "fullname", "customer_name", "user_name", "username"):
+        text = lambda i: f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    elif "first" in name:
+        text = lambda i: rng.choice(FIRST_NAMES)
+    elif "last" in name or "surname" in name:
+        text = lambda i: rng.choice(LAST_NAMES)
+    elif "city" in name:
+        text = lambda i: rng.choice(CITIES)
+    elif "country" in name:
+        text = lambda i: rng.choice(COUNTRIES)
+    elif "status" in name or "state" in name:
+        text = lambda i: rng.choice(STATUSES)
+    elif "phone" in name:
+        text = lambda i: f"+91{rng.randint(7000000000, 9999999999)}"
+    else:
+        text = lambda i: " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+    if unique and "email" not in name:
+        def unique_text(i):
+            number = str(unique_offset + i + 1)
+            return _with_suffix(text(i), f"-{number}" if len(number) < max_length else number, max_length)
+        return unique_text
+    return lambda i: text(i)[:max_length]
+
+
+class DataGenerator:
+    """Deterministic, schema-aware row generator for one table
+
+    Values follow each column's type and length; foreign key columns draw
+    from keys that already exist in the referenced table, or are NULL when
+    it has none and the column is nullable or points back at this table.
+    Unique foreign keys (1:1 children) take parent keys this table doesn't
+    use yet, each at most once. Unique columns continue numbering after the
+    largest number each one already holds. The same seed and database state always produce the
+    same rows.
+    """
+
+    def __init__(self, db, table_name, seed=0, null_rate=0.05, parent_key_sample=10000, count=None):
+        snapshot = db.get_schema_snapshot()
+        self.table = snapshot.get_table(table_name) if snapshot else None
+        if self.table is None:
+            raise ValueError(f"Table {table_name} not found in the current database")
+
+        self.rng = random.Random(f"{seed}:{self.table.name}")
+        self.columns = [column for column in self.table.columns.values() if not column.is_auto_increment]
+
+        # column name -> first number its unique values may use, minus one
+        self._unique_offsets = self._unique_offsets(db)
+        # column name -> unused parent keys a unique foreign key draws from without replacement
+        self._unique_parent_keys = {}
+
+        self._generators = []
+        for column in self.columns:
+            if column.references:
+                parent_table = column.references[0]
+                unique = column.key in ("PRI", "UNI")
+                if unique:
+                    parent_keys = self._unused_parent_keys(db, column, count or parent_key_sample)
+                    self.rng.shuffle(parent_keys)
+                else:
+                    parent_keys = self._parent_keys(db, *column.references, parent_key_sample)
+                if parent_keys and unique:
+                    self._unique_parent_keys[column.name] = parent_keys
+                    generator = lambda i, keys=parent_keys: keys[i]
+                elif parent_keys:
+                    generator = lambda i, keys=parent_keys: self.rng.choice(keys)
+                elif column.nullable or parent_table.lower() == self.table.name.lower():
+                    # Nothing to point at yet, as in the first rows of a tree (parent_id -> id)
+                    generator = lambda i: None
+                else:
+                    raise ValueError(
+                        f"{self.table.name}.{column.name} references {parent_table}, which has no "
+                        f"{'unused ' if unique else ''}rows; generate data for it first"
+                    )
+            else:
+                generator = _column_generator(column, self.rng, self._unique_offsets.get(column.name, 0))
+
+            if column.nullable and not column.key and null_rate:
+                generator = lambda i, inner=generator: None if self.rng.random() < null_rate else inner(i)
+            self._generators.append(generator)
+
+    def _unique_offsets(self, db):
+        """Largest number each generated unique column already uses (at least the row count)"""
+        unique = [column for column in self.columns if _unique_sequence(column)]
+        if not unique:
+            return {}
+        expressions = ", ".join(f"COALESCE({_sequence_max(column)}, 0)" for column in unique)
+        with db.raw_cursor(dictionary=False) as (_, cursor):
+            cursor.execute(f"SELECT COUNT(*), {expressions} FROM {quote_identifier(self.table.name)}")
+            count, *maxima = cursor.fetchone()
+        return {column.name: max(int(count), int(value)) for column, value in zip(unique, maxima)}
+
+    @staticmethod
+    def _parent_keys(db, table, column, limit):
+        with db.raw_cursor(dictionary=False) as (_, cursor):
+            cursor.execute(
+                f"SELECT {quote_identifier(column)} FROM {quote_identifier(table)} "
+                f"ORDER BY {quote_identifier(column)} LIMIT {int(limit)}"
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def _unused_parent_keys(self, db, column, limit):
+        """Parent keys no row of this table points at yet"""
+        parent_table, parent_column = (quote_identifier(name) for name in column.references)
+        with db.raw_cursor(dictionary=False) as (_, cursor):
+            cursor.execute(
+                f"SELECT p.{parent_column} FROM {parent_table} p WHERE NOT EXISTS "
+                f"(SELECT 1 FROM {quote_identifier(self.table.name)} c "
+                f"WHERE c.{quote_identifier(column.name)} = p.{parent_column}) "
+                f"ORDER BY p.{parent_column} LIMIT {int(limit)}"
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    @property
+    def column_names(self):
+        return [column.name for column in self.columns]
+
+    def rows(self, count):
+        """Yield `count` row tuples lazily
+
+        Raises ValueError up front when a unique column's type can't hold
+        `count` more distinct values, or a unique foreign key has fewer than
+        `count` unused parent keys.
+        """
+        for column in self.columns:
+            offset = self._unique_offsets.get(column.name)
+            if offset is not None and offset + count > _sequence_limit(column):
+                raise ValueError(
+                    f"{self.table.name}.{column.name} ({column.column_type}) can't hold {count} more unique "
+                    f"values after {offset}"
+                )
+        for name, keys in self._unique_parent_keys.items():
+            if count > len(keys):
+                parent_table = self.table.columns[name].references[0]
+                raise ValueError(
+                    f"{self.table.name}.{name} is unique and only {len(keys)} {parent_table} keys are unused; "
+                    f"can't generate {count} rows"
+                )
+        generators = self._generators
+        for i in range(count):
+            yield tuple(generator(i) for generator in generators)
+
+
+def generate_table_data(db, table_name, count, seed=0, batch_size=None, progress=None):
+    """Fill a table with `count` generated rows through batched inserts"""
+    generator = DataGenerator(db, table_name, seed, count=count)
+    batches = batched(generator.rows(count), batch_size or db.load_batch_size)
+    return insert_batches(db, generator.table.name, generator.column_names, batches, progress)
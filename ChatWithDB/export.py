@@ -0,0 +1,319 @@
+import csv
+import gzip
+import io
+import re
+import time
+
+from mysql.connector import FieldFlag, FieldType
+
+from sql_classifier import classify
+
+# format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrows", "application/vnd.apache.arrow.stream"),
+}
+# Formats that store column types, so the writer wants the schema snapshot's
+TYPED_FORMATS = ("parquet", "arrow")
+
+# Character set number MySQL reports for BINARY, VARBINARY and BLOB columns
+BINARY_CHARSET = 63
+
+_DECIMAL_TYPE = re.compile(r"^decimal\((\d+)(?:,(\d+))?\)", re.IGNORECASE)
+
+
+class ExportReport:
+    """Rows, bytes and throughput of one export"""
+
+    def __init__(self, export_format):
+        self.format = export_format
+        self.rows = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def __str__(self):
+        return (f"{self.rows} row(s) exported as {self.format} ({self.bytes:,} bytes) in "
+                f"{self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s)")
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class ExportWriter:
+    """Writes QueryResult batches to a binary file object in one export format
+
+    Only the current batch is held in memory; call close() to flush the
+    format's footer. The file object itself is left open. Arrow and Parquet
+    column types come from the cursor description, refined by
+    `schema_columns` ({column name (lower case): ColumnInfo}, see
+    result_columns) where MySQL doesn't send them, e.g. DECIMAL precision.
+    Binary values are written to CSV as hex.
+    """
+
+    def __init__(self, fileobj, export_format="csv", schema_columns=None):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format {export_format!r}; choose from {', '.join(EXPORT_FORMATS)}")
+        self.fileobj = fileobj
+        self.format = export_format
+        self.schema_columns = schema_columns or {}
+        self.report = ExportReport(export_format)
+        self._start_offset = fileobj.tell() if fileobj.seekable() else 0
+        self._text = None
+        self._gzip = None
+        self._csv = None
+        self._arrow_writer = None
+        self._arrow_schema = None
+
+    def write(self, batch):
+        if self.format in ("csv", "csv.gz"):
+            self._write_csv(batch)
+        else:
+            self._write_arrow(batch)
+        self.report.rows += len(batch)
+        self.report.seconds = time.perf_counter() - self.report.started
+
+    def _write_csv(self, batch):
+        if self._csv is None:
+            target = self.fileobj
+            if self.format == "csv.gz":
+                target = self._gzip = gzip.GzipFile(fileobj=self.fileobj, mode="wb")
+            self._text = io.TextIOWrapper(target, encoding="utf-8", newline="", write_through=True)
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(batch.columns)
+        binary = _binary_positions(batch)
+        if binary is None or binary:
+            self._csv.writerows(_hex_encoded(batch.rows, binary))
+        else:
+            self._csv.writerows(batch.rows)
+
+    def _write_arrow(self, batch):
+        pa = _import_pyarrow()
+        if self._arrow_writer is None:
+            self._arrow_schema = _arrow_schema(pa, batch, self.schema_columns)
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+                self._arrow_writer = pq.ParquetWriter(self.fileobj, self._arrow_schema)
+            else:
+                self._arrow_writer = pa.ipc.new_stream(self.fileobj, self._arrow_schema)
+        columns = batch.to_columns()
+        arrays = [
+            _to_arrow_array(pa, columns[field.name], field.type)
+            for field in self._arrow_schema
+        ]
+        self._arrow_writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self._arrow_schema))
+
+    def close(self):
+        """Finish the file (CSV header, gzip trailer, Parquet footer) and return the report"""
+        if self._text is not None:
+            self._text.flush()
+            # Detach so closing the wrapper never closes the caller's file
+            self._text.detach()
+        if self._gzip is not None:
+            self._gzip.close()
+        if self._arrow_writer is not None:
+            self._arrow_writer.close()
+        self.fileobj.flush()
+        if self.fileobj.seekable():
+            self.report.bytes = self.fileobj.tell() - self._start_offset
+        self.report.seconds = time.perf_counter() - self.report.started
+        return self.report
+
+
+def export_query(db, query, fileobj, export_format="csv", params=None, batch_size=None, progress=None,
+                 timeout=None, max_rows=None):
+    """Stream a query's rows straight from the cursor into `fileobj`"""
+    schema_columns = result_columns(db, query) if export_format in TYPED_FORMATS else None
+    writer = ExportWriter(fileobj, export_format, schema_columns)
+    for batch in db.iter_query(query, params, batch_size, timeout=timeout, max_rows=max_rows):
+        writer.write(batch)
+        if progress:
+            progress(writer.report)
+    return writer.close()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError as err:
+        raise RuntimeError("Parquet and Arrow exports need pyarrow (pip install pyarrow)") from err
+    return pyarrow
+
+
+def result_columns(db, query):
+    """{column name (lower case): ColumnInfo} for the columns of the tables `query` reads
+
+    Names found in several of those tables with different types are left
+    out, as are tables of other databases. Errors only cost the refinement.
+    """
+    try:
+        snapshot = db.get_schema_snapshot()
+        tables = classify(query).tables
+    except Exception as e:
+        print(f"Error reading column types for export: {e}")
+        return {}
+    if snapshot is None:
+        return {}
+    columns, ambiguous = {}, set()
+    for table_name in tables:
+        schema, _, name = table_name.rpartition(".")
+        table = snapshot.get_table(name) if not schema or schema == snapshot.database.lower() else None
+        for column in (table.columns.values() if table else ()):
+            key = column.name.lower()
+            known = columns.setdefault(key, column)
+            if known.column_type != column.column_type:
+                ambiguous.add(key)
+    for key in ambiguous:
+        del columns[key]
+    return columns
+
+
+def _arrow_schema(pa, batch, schema_columns):
+    """Arrow schema of a result from its description and the schema snapshot
+
+    Values of the first batch are only looked at for columns neither of
+    them can type (results without a description, e.g. from a fan-out).
+    """
+    description = batch.description or [None] * len(batch.columns)
+    values = None
+    fields = []
+    for position, (name, described) in enumerate(zip(batch.columns, description)):
+        column = schema_columns.get(name.lower())
+        if described is not None:
+            arrow_type = _described_arrow_type(pa, described, column)
+        elif column is not None:
+            arrow_type = _column_arrow_type(pa, column)
+        else:
+            if values is None:
+                values = list(zip(*batch.rows)) if batch.rows else [()] * len(batch.columns)
+            arrow_type = _inferred_arrow_type(pa, values[position])
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _described_arrow_type(pa, described, column=None):
+    """Arrow type for one cursor description entry (column: its ColumnInfo, if known)"""
+    type_code = described[1]
+    flags = described[7] if len(described) > 7 else 0
+    if type_code in (FieldType.TINY, FieldType.SHORT, FieldType.INT24, FieldType.LONG, FieldType.YEAR):
+        return pa.int64()
+    if type_code == FieldType.LONGLONG:
+        return pa.uint64() if flags & FieldFlag.UNSIGNED else pa.int64()
+    if type_code == FieldType.BIT:
+        return pa.uint64()
+    if type_code == FieldType.FLOAT:
+        return pa.float32()
+    if type_code == FieldType.DOUBLE:
+        return pa.float64()
+    if type_code in (FieldType.DECIMAL, FieldType.NEWDECIMAL):
+        # MySQL doesn't send precision and scale; computed decimals stay exact as text
+        return _decimal_arrow_type(pa, column) or pa.string()
+    if type_code in (FieldType.DATE, FieldType.NEWDATE):
+        return pa.date32()
+    if type_code in (FieldType.DATETIME, FieldType.TIMESTAMP):
+        return pa.timestamp("us")
+    if type_code == FieldType.TIME:
+        return pa.duration("us")
+    if _is_binary(described):
+        return pa.binary()
+    # Text, ENUM, SET, JSON and all-NULL columns
+    return pa.string()
+
+
+def _column_arrow_type(pa, column):
+    """Arrow type for a schema snapshot column"""
+    data_type = (column.data_type or "").lower()
+    if data_type in ("tinyint", "smallint", "mediumint", "int", "integer", "year"):
+        return pa.int64()
+    if data_type == "bigint":
+        return pa.uint64() if "unsigned" in (column.column_type or "").lower() else pa.int64()
+    if data_type == "bit":
+        return pa.uint64()
+    if data_type == "float":
+        return pa.float32()
+    if data_type in ("double", "real"):
+        return pa.float64()
+    if data_type == "decimal":
+        return _decimal_arrow_type(pa, column) or pa.string()
+    if data_type == "date":
+        return pa.date32()
+    if data_type in ("datetime", "timestamp"):
+        return pa.timestamp("us")
+    if data_type == "time":
+        return pa.duration("us")
+    if data_type in ("binary", "varbinary", "tinyblob", "blob", "mediumblob", "longblob", "geometry"):
+        return pa.binary()
+    return pa.string()
+
+
+def _decimal_arrow_type(pa, column):
+    match = _DECIMAL_TYPE.match(column.column_type or "") if column is not None else None
+    if not match:
+        return None
+    precision, scale = int(match.group(1)), int(match.group(2) or 0)
+    return pa.decimal128(precision, scale) if precision <= 38 else pa.decimal256(precision, scale)
+
+
+def _inferred_arrow_type(pa, values):
+    """Arrow type guessed from values; all-NULL columns fall back to strings"""
+    try:
+        arrow_type = pa.array(values).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        arrow_type = pa.string()
+    if pa.types.is_null(arrow_type):
+        arrow_type = pa.string()
+    return arrow_type
+
+
+def _is_binary(described):
+    """Whether a cursor description entry is a column of raw bytes (BLOB, VARBINARY, GEOMETRY)"""
+    type_code = described[1]
+    charset = described[8] if len(described) > 8 else None
+    if type_code == FieldType.GEOMETRY:
+        return True
+    return charset == BINARY_CHARSET and type_code in (
+        FieldType.TINY_BLOB, FieldType.MEDIUM_BLOB, FieldType.LONG_BLOB, FieldType.BLOB,
+        FieldType.VAR_STRING, FieldType.STRING, FieldType.VARCHAR,
+    )
+
+
+def _binary_positions(batch):
+    """Positions of the byte columns, or None when every value has to be checked"""
+    if batch.description is None:
+        return None
+    return [position for position, described in enumerate(batch.description) if _is_binary(described)]
+
+
+def _hex_encoded(rows, positions):
+    """Rows with bytes replaced by their hex digits (UNHEX() reads them back)"""
+    for row in rows:
+        row = list(row)
+        for position in range(len(row)) if positions is None else positions:
+            value = row[position]
+            if isinstance(value, (bytes, bytearray)):
+                row[position] = value.hex()
+        yield row
+
+
+def _to_arrow_array(pa, values, arrow_type):
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if pa.types.is_string(arrow_type):
+            return pa.array([_as_text(value) for value in values], type=arrow_type)
+        raise
+
+
+def _as_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    if isinstance(value, (set, frozenset)):
+        # SET columns come back as Python sets from the pure-Python connector
+        return ",".join(sorted(value))
+    return str(value)
@@ -0,0 +1,454 @@
+import collections
+import fnmatch
+import heapq
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from pool import ConnectionPool, PoolExhaustedError
+from results import QueryResult
+from sql_classifier import classify
+
+# Column added in front of every merged row with the shard it came from
+SOURCE_COLUMN = "source"
+
+# Marks the end of a shard's row stream in the sorted merge
+_DONE = object()
+
+
+class ShardTarget:
+    """One database to fan out to: `database` or `host[:port]/database`"""
+
+    def __init__(self, database, host=None, port=None):
+        self.database = database
+        self.host = host
+        self.port = port
+
+    @property
+    def name(self):
+        if not self.host:
+            return self.database
+        port = f":{self.port}" if self.port else ""
+        return f"{self.host}{port}/{self.database}"
+
+    def __repr__(self):
+        return f"ShardTarget({self.name!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, ShardTarget) and self.name == other.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+
+def parse_targets(spec):
+    """Parse a comma/newline separated list like ``shard_1, db2:3307/shard_2``
+
+    Database names may be fnmatch patterns (``shard_*``); FanOut.resolve
+    expands them against SHOW DATABASES.
+    """
+    targets = []
+    for item in spec.replace("\n", ",").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, port = None, None
+        if "/" in item:
+            address, item = item.rsplit("/", 1)
+            host, _, port = address.partition(":")
+            port = int(port) if port else None
+        targets.append(ShardTarget(item.strip(), host or None, port))
+    return targets
+
+
+class ShardResult:
+    """Outcome of the query on one shard"""
+
+    def __init__(self, target):
+        self.target = target
+        self.rows = 0
+        self.seconds = 0.0
+        self.error = None
+        # Status message of statements that don't return rows
+        self.message = None
+        self.truncated = False
+
+    def as_dict(self):
+        return {
+            "source": self.target.name,
+            "rows": self.rows,
+            "seconds": round(self.seconds, 3),
+            "status": self.error or self.message or "ok",
+        }
+
+
+class FanoutResult:
+    """Merged rows of every shard plus what happened on each one"""
+
+    def __init__(self, result, shards, seconds):
+        self.result = result
+        self.shards = shards
+        self.seconds = seconds
+
+    @property
+    def failed(self):
+        return [shard for shard in self.shards if shard.error]
+
+    def summary(self):
+        slowest = max(self.shards, key=lambda shard: shard.seconds, default=None)
+        parts = [f"{len(self.result) if self.result is not None else 0} row(s) from "
+                 f"{len(self.shards) - len(self.failed)}/{len(self.shards)} shard(s) in {self.seconds:.2f}s"]
+        if slowest is not None:
+            parts.append(f"slowest {slowest.target.name} ({slowest.seconds:.2f}s)")
+        if self.failed:
+            parts.append(f"{len(self.failed)} failed")
+        return ", ".join(parts)
+
+
+def _sort_key(positions):
+    # MySQL sorts NULL before any value; (False, None) < (True, value) keeps that order
+    def key(row):
+        return tuple((row[position] is not None, row[position]) for position in positions)
+    return key
+
+
+class FanOut:
+    """Runs one statement on many databases at once and merges the results
+
+    Shards on db's server share db's pool; other servers get one pool each,
+    closed by close() or when the FanOut is garbage collected. One FanOut
+    can serve many callers (the web app keeps one for every session): pass
+    an `owner` to run() and cancel(owner) stops only that caller's shards.
+    At most `max_workers` shard statements run on one pool at a time (and
+    never more than the pool's size), so a fan-out can't take every
+    connection of the shared pool. Without `order_by` the shards' rows
+    are concatenated in target order. With `order_by`, every shard must
+    already return rows sorted on those columns: when all of them fit in
+    their pools' limits they stream at once and are merged on the fly,
+    holding only a few batches per shard in memory; otherwise they are
+    fetched like unsorted shards and sorted at the end.
+    """
+
+    def __init__(self, db, max_workers=None):
+        self.db = db
+        self.max_workers = int(max_workers or os.getenv("FANOUT_CONCURRENCY", 8))
+        # (host, port) -> ConnectionPool of the servers other than db's
+        self._pools = {}
+        # Database handle -> owner, for the shard statements running right now
+        self._active = {}
+        # ConnectionPool -> semaphore bounding the shard statements run on it at once
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._close_pools = weakref.finalize(self, _close_pools, self._pools, self._lock)
+
+    def _on_db_server(self, target):
+        connect_args = self.db.pool.connect_args
+        return (target.host or connect_args["host"]) == connect_args["host"] and \
+            (target.port or connect_args.get("port", 3306)) == connect_args.get("port", 3306)
+
+    def _pool(self, target):
+        key = (target.host, target.port)
+        with self._lock:
+            # db's own server: reuse its pool rather than open a second one to the same host
+            pool = self.db.pool if self._on_db_server(target) else self._pools.get(key)
+            if pool is None:
+                # Same credentials as the main connection, different server
+                connect_args = dict(self.db.pool.connect_args)
+                if target.host:
+                    connect_args["host"] = target.host
+                if target.port:
+                    connect_args["port"] = target.port
+                host = connect_args.pop("host")
+                user = connect_args.pop("user")
+                password = connect_args.pop("password")
+                pool = ConnectionPool(host, user, password, size=self.max_workers, **connect_args)
+                self._pools[key] = pool
+            return pool
+
+    def _slot_count(self, pool):
+        return max(1, min(self.max_workers, pool.size))
+
+    def _pool_slots(self, pool):
+        with self._lock:
+            slots = self._slots.get(pool)
+            if slots is None:
+                slots = self._slots[pool] = threading.BoundedSemaphore(self._slot_count(pool))
+            return slots
+
+    @contextmanager
+    def _shard(self, target, owner=None):
+        """A Database handle on the target, registered for cancel() while the block runs
+
+        Waits for one of the pool's fan-out slots first, as long as the
+        pool would wait for a connection.
+        """
+        pool = self._pool(target)
+        slots = self._pool_slots(pool)
+        if not slots.acquire(timeout=pool.timeout):
+            raise PoolExhaustedError(msg=f"No free fan-out slot for {target.name} after {pool.timeout}s")
+        try:
+            # A missing database fails the shard on its first statement
+            shard = type(self.db).on_pool(pool, target.database)
+            # Limits follow the interactive session
+            shard.query_timeout = self.db.query_timeout
+            shard.max_rows = self.db.max_rows
+            with self._lock:
+                self._active[shard] = owner
+            try:
+                yield shard
+            finally:
+                with self._lock:
+                    del self._active[shard]
+        finally:
+            slots.release()
+
+    def can_stream_sorted(self, shards):
+        """Whether iter_sorted can stream every shard at once within the pools' limits"""
+        if len(shards) > self.max_workers:
+            return False
+        per_pool = collections.Counter(self._pool(shard.target) for shard in shards)
+        return all(count <= self._slot_count(pool) for pool, count in per_pool.items())
+
+    def resolve(self, targets):
+        """Expand fnmatch patterns in target database names, dropping duplicates"""
+        resolved = []
+        for target in targets:
+            if not any(char in target.database for char in "*?["):
+                resolved.append(target)
+                continue
+            lister = self.db if not target.host else type(self.db).on_pool(self._pool(target))
+            for database in lister.list_databases():
+                if fnmatch.fnmatchcase(database, target.database):
+                    resolved.append(ShardTarget(database, target.host, target.port))
+        return list(dict.fromkeys(resolved))
+
+    def run(self, query, targets, params=None, order_by=None, descending=False, timeout=None, max_rows=None,
+            owner=None):
+        """Run `query` on every target and return a FanoutResult
+
+        Rows get a leading `source` column naming their shard. Shards that
+        fail are reported in FanoutResult.shards and leave the rest intact.
+        """
+        started = time.perf_counter()
+        targets = self.resolve(targets)
+        if not classify(query).returns_rows:
+            shards = self._run_statement(query, targets, params, timeout, owner)
+            result = QueryResult((SOURCE_COLUMN, "status"), [
+                (shard.target.name, shard.error or shard.message) for shard in shards
+            ])
+            return FanoutResult(result, shards, time.perf_counter() - started)
+
+        shards = [ShardResult(target) for target in targets]
+        result = None
+        streamed = order_by and self.can_stream_sorted(shards)
+        if streamed:
+            batches = self.iter_sorted(query, shards, order_by, params, descending, timeout, max_rows, owner=owner)
+        else:
+            batches = self._iter_concatenated(query, shards, params, timeout, max_rows, owner)
+        for batch in batches:
+            if result is None:
+                result = QueryResult(batch.columns)
+            result.extend(batch)
+        if result is not None:
+            if order_by and not streamed:
+                # Too many shards to stream side by side; the whole result is in memory anyway
+                order_by = [order_by] if isinstance(order_by, str) else list(order_by)
+                missing = [column for column in order_by if column not in result.columns]
+                if missing:
+                    raise KeyError(f"ORDER BY column(s) {', '.join(missing)} not in the result")
+                key = _sort_key([result.columns.index(column) for column in order_by])
+                result.rows.sort(key=key, reverse=descending)
+            result.truncated = any(shard.truncated for shard in shards)
+        return FanoutResult(result, shards, time.perf_counter() - started)
+
+    def _run_statement(self, query, targets, params, timeout, owner):
+        def run_one(shard):
+            shard_started = time.perf_counter()
+            try:
+                with self._shard(shard.target, owner) as database:
+                    outcome = database.execute_query(query, params, use_cache=False, timeout=timeout)
+                if isinstance(outcome, str) and outcome.startswith("Error"):
+                    shard.error = outcome
+                else:
+                    shard.message = outcome if isinstance(outcome, str) else f"{len(outcome)} row(s)"
+            except Exception as e:
+                shard.error = f"Error: {e}"
+            shard.seconds = time.perf_counter() - shard_started
+            return shard
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fanout") as executor:
+            return list(executor.map(run_one, [ShardResult(target) for target in targets]))
+
+    def _fetch(self, query, shard, params, timeout, max_rows, owner):
+        shard_started = time.perf_counter()
+        try:
+            with self._shard(shard.target, owner) as database:
+                result = database.fetch_all(query, params, use_cache=False, timeout=timeout, max_rows=max_rows)
+            shard.rows = len(result)
+            shard.truncated = result.truncated
+        except Exception as e:
+            shard.error = f"Error: {e}"
+            result = None
+        shard.seconds = time.perf_counter() - shard_started
+        return result
+
+    def _iter_concatenated(self, query, shards, params, timeout, max_rows, owner):
+        columns = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fanout") as executor:
+            futures = [
+                executor.submit(self._fetch, query, shard, params, timeout, max_rows, owner) for shard in shards
+            ]
+            for shard, future in zip(shards, futures):
+                try:
+                    result = future.result()
+                except KeyboardInterrupt:
+                    # Kill the shard statements, or leaving the executor would wait for all of them
+                    for pending in futures:
+                        pending.cancel()
+                    self.cancel(owner)
+                    raise
+                if result is None or not result.columns:
+                    continue
+                if columns is None:
+                    columns = result.columns
+                elif result.columns != columns:
+                    shard.error = f"Error: columns {list(result.columns)} differ from {list(columns)}"
+                    continue
+                name = shard.target.name
+                yield QueryResult((SOURCE_COLUMN,) + columns, [(name,) + row for row in result.rows])
+
+    def iter_sorted(self, query, shards, order_by, params=None, descending=False, timeout=None, max_rows=None,
+                    batch_size=None, owner=None):
+        """Stream-merge shards whose rows already come back sorted on `order_by`
+
+        Yields QueryResult batches with the `source` column. Every shard
+        runs at the same time on its own connection, feeding a small queue,
+        so the shards must fit in `max_workers` and their pools' sizes (see
+        can_stream_sorted); more raise ValueError.
+        """
+        if not self.can_stream_sorted(shards):
+            raise ValueError(
+                f"A sorted merge streams every shard at once: {len(shards)} shard(s) is more than "
+                f"{self.max_workers} (FANOUT_CONCURRENCY) or than a server's pool allows"
+            )
+        batch_size = batch_size or self.db.fetch_batch_size
+        order_by = [order_by] if isinstance(order_by, str) else list(order_by)
+        streams = [queue.Queue(maxsize=2) for _ in shards]
+        stop = threading.Event()
+
+        def produce(shard, stream):
+            shard_started = time.perf_counter()
+            try:
+                with self._shard(shard.target, owner) as database:
+                    batches = database.iter_query(
+                        query, params, use_cache=False, timeout=timeout, max_rows=max_rows
+                    )
+                    try:
+                        for batch in batches:
+                            shard.rows += len(batch)
+                            shard.truncated = batch.truncated
+                            while not stop.is_set():
+                                try:
+                                    stream.put(batch, timeout=0.1)
+                                    break
+                                except queue.Full:
+                                    continue
+                            if stop.is_set():
+                                return
+                    finally:
+                        # Hands the connection back even when the merge stopped early
+                        batches.close()
+            except Exception as e:
+                shard.error = f"Error: {e}"
+            finally:
+                shard.seconds = time.perf_counter() - shard_started
+                stream.put(_DONE)
+
+        def rows(shard, stream, columns):
+            name = shard.target.name
+            while True:
+                batch = stream.get()
+                if batch is _DONE:
+                    return
+                if columns[0] is None:
+                    columns[0] = batch.columns
+                elif batch.columns != columns[0]:
+                    shard.error = f"Error: columns {list(batch.columns)} differ from {list(columns[0])}"
+                    return
+                for row in batch.rows:
+                    yield (name,) + row
+
+        workers = [
+            threading.Thread(target=produce, args=(shard, stream), daemon=True, name=f"fanout-{shard.target.name}")
+            for shard, stream in zip(shards, streams)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            # The first batch of any shard fixes the columns (and the sort key positions)
+            columns = [None]
+            iterators = [rows(shard, stream, columns) for shard, stream in zip(shards, streams)]
+            heads = []
+            for iterator in iterators:
+                first = next(iterator, _DONE)
+                if first is not _DONE:
+                    heads.append(((first,), iterator))
+            if columns[0] is None:
+                return
+            merged_columns = (SOURCE_COLUMN,) + columns[0]
+            missing = [column for column in order_by if column not in merged_columns]
+            if missing:
+                raise KeyError(f"ORDER BY column(s) {', '.join(missing)} not in the result")
+            key = _sort_key([merged_columns.index(column) for column in order_by])
+
+            merged = heapq.merge(*[_chain(head, iterator) for head, iterator in heads], key=key, reverse=descending)
+            batch = []
+            for row in merged:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    yield QueryResult(merged_columns, batch)
+                    batch = []
+            if batch:
+                yield QueryResult(merged_columns, batch)
+        except KeyboardInterrupt:
+            self.cancel(owner)
+            raise
+        finally:
+            # A consumer that stops early releases the producers and their connections
+            stop.set()
+            for stream in streams:
+                while True:
+                    try:
+                        stream.get_nowait()
+                    except queue.Empty:
+                        break
+            for worker in workers:
+                worker.join()
+
+    def cancel(self, owner=None):
+        """Stop the shard statements run for `owner`, or every running shard statement"""
+        with self._lock:
+            shards = [shard for shard, shard_owner in self._active.items() if owner is None or shard_owner == owner]
+        return sum(shard.cancel() for shard in shards)
+
+    def close(self):
+        """Close the pools of the other servers; db's pool belongs to the caller"""
+        self._close_pools()
+
+
+def _close_pools(pools, lock):
+    with lock:
+        closing = list(pools.values())
+        pools.clear()
+    for pool in closing:
+        pool.close()
+
+
+def _chain(head, iterator):
+    yield from head
+    yield from iterator
@@ -0,0 +1,201 @@
+import re
+
+from bulk_load import quote_identifier
+from pagination import sql_literal
+
+_VERB = r"(?:show|list|get|display|fetch|find|give|return|select)(?: me)?"
+_ALL = r"(?:all the |all |every |the )?"
+_FILTER = r"(?P<filter> (?:where|with|whose) .+)?"
+
+# Tried in order; a rule whose table/columns don't resolve passes the question on to the next one
+_RULES = [
+    ("count", re.compile(
+        r"^(?:count|how many)(?: (?:rows|records|entries))?(?: (?:are )?(?:there )?(?:in|of))?(?: the)? "
+        r"(?P<table>.+?)(?: (?:are there|there are|exist|do we have|do i have))?" + _FILTER + "$"
+    )),
+    ("top_n", re.compile(
+        rf"^{_VERB} (?:the )?(?P<which>first|top|last|latest|newest|oldest) (?P<n>\d+) (?P<table>.+?)"
+        r"(?: (?:by|ordered by|sorted by) (?P<order>.+?)(?: (?P<direction>asc|ascending|desc|descending))?)?"
+        + _FILTER + "$"
+    )),
+    ("columns", re.compile(
+        rf"^{_VERB} (?:the )?(?P<columns>.+?) (?:of|for|from|in) {_ALL}(?P<table>.+?)" + _FILTER + "$"
+    )),
+    ("select_all", re.compile(
+        rf"^{_VERB} {_ALL}(?:(?:rows|records|entries|data) )?(?:(?:of|from|in) )?(?:the )?(?P<table>.+?)"
+        + _FILTER + "$"
+    )),
+]
+
+_CONDITION = re.compile(
+    r"^ (?:where|with|whose) (?P<column>.+?) "
+    r"(?P<op>is not equal to|is equal to|is greater than|is less than|greater than|less than|is not|is|equals|"
+    r"!=|<>|>=|<=|=|>|<|contains|starts with|ends with|over|under|above|below|after|before|of) "
+    r"(?P<value>.+)$"
+)
+_OPERATORS = {
+    "is": "=", "equals": "=", "is equal to": "=", "=": "=", "of": "=",
+    "is not": "<>", "is not equal to": "<>", "!=": "<>", "<>": "<>",
+    "is greater than": ">", "greater than": ">", "over": ">", "above": ">", "after": ">", ">": ">",
+    "is less than": "<", "less than": "<", "under": "<", "below": "<", "before": "<", "<": "<",
+    ">=": ">=", "<=": "<=",
+}
+_LIKE_PATTERNS = {"contains": "%{}%", "starts with": "{}%", "ends with": "%{}"}
+# Same default as the LLM prompt's "LIMIT large result sets" rule
+DEFAULT_LIMIT = 100
+_NUMBER = re.compile(r"^-?\d+(?:\.\d+)?$")
+# Words that mean a join, a grouping or an aggregate: left to the LLM
+_NOT_SIMPLE = re.compile(
+    r"\b(?:join|joined|per|each|group|grouped|average|avg|sum|total|max|maximum|min|minimum|"
+    r"distinct|unique|between|without|not in|except)\b"
+)
+
+
+def _word_forms(name):
+    """Spellings a table or column name may take in a question (spaces, singular, plural)"""
+    base = name.lower().replace("_", " ")
+    forms = {name.lower(), base}
+    if base.endswith("ies"):
+        forms.add(base[:-3] + "y")
+    elif base.endswith(("ses", "xes", "ches", "shes")):
+        forms.add(base[:-2])
+    elif base.endswith("s"):
+        forms.add(base[:-1])
+    else:
+        forms.add(base[:-1] + "ies" if base.endswith("y") else base + "s")
+        forms.add(base + "es")
+    return forms
+
+
+def _alias_map(names):
+    aliases = {}
+    for name in names:
+        for form in _word_forms(name):
+            # A spelling shared by two names is ambiguous, so it resolves to neither
+            aliases[form] = None if form in aliases and aliases[form] != name else name
+    return aliases
+
+
+class FastPathMatch:
+    """SQL produced by the fast path and the rule that produced it"""
+
+    def __init__(self, sql, rule):
+        self.sql = sql
+        self.rule = rule
+
+    def __repr__(self):
+        return f"FastPathMatch({self.sql!r}, rule={self.rule!r})"
+
+
+class FastPath:
+    """Deterministic translator for simple single-table requests
+
+    Understands "show all <table>", "count <table>", "show the first/top N
+    <table> [by <column>]", "show <columns> of <table>", each with at most
+    one "where <column> <op> <value>" condition. Only exact matches against
+    the known tables and columns are answered; anything else returns None
+    so the caller can ask the LLM. Like the LLM's answers, row queries name
+    their columns and read at most `default_limit` rows unless asked for N.
+    """
+
+    def __init__(self, table_schema, table_names=None, default_limit=DEFAULT_LIMIT):
+        # lower-case table name -> columns, as kept by SQLTranslator
+        self.table_schema = table_schema
+        # lower-case table name -> name as MySQL spells it
+        self.table_names = table_names or {}
+        self.default_limit = default_limit
+        self._tables = _alias_map(table_schema)
+        self._columns = {table: _alias_map(columns) for table, columns in table_schema.items()}
+
+    def translate(self, question):
+        """Return a FastPathMatch, or None when the request isn't simple enough"""
+        text = re.sub(r"\s+", " ", question.strip().rstrip("?.!;")).strip()
+        lowered = text.lower()
+        # Groups found in the lower-cased text are cut from the original, so lengths must agree
+        if len(lowered) != len(text) or not lowered or _NOT_SIMPLE.search(_strip_quoted(lowered)):
+            return None
+        for rule, pattern in _RULES:
+            match = pattern.match(lowered)
+            if match is None:
+                continue
+            sql = self._build(rule, match, text)
+            if sql is not None:
+                return FastPathMatch(sql, rule)
+        return None
+
+    def _build(self, rule, match, text):
+        table = self._tables.get(match.group("table"))
+        if table is None:
+            return None
+        columns = self._columns[table]
+
+        where = ""
+        if match.group("filter"):
+            if re.search(r"\b(?:and|or)\b", _strip_quoted(match.group("filter"))):
+                # Only one condition is understood
+                return None
+            # Values keep their original case, so the condition is parsed from the original text
+            condition = self._condition(text[match.start("filter"):match.end("filter")], columns)
+            if condition is None:
+                return None
+            where = f" WHERE {condition}"
+        source = quote_identifier(self.table_names.get(table, table))
+        # Every column, spelled out instead of *
+        select_list = ", ".join(quote_identifier(column) for column in self.table_schema[table])
+
+        if rule == "count":
+            return f"SELECT COUNT(*) FROM {source}{where}"
+        if rule == "select_all":
+            return f"SELECT {select_list} FROM {source}{where} LIMIT {self.default_limit}"
+        if rule == "columns":
+            names = [name.strip() for name in re.split(r",| and ", match.group("columns")) if name.strip()]
+            resolved = [columns.get(name) for name in names]
+            if not resolved or None in resolved:
+                return None
+            select_list = ", ".join(quote_identifier(column) for column in resolved)
+            return f"SELECT {select_list} FROM {source}{where} LIMIT {self.default_limit}"
+
+        # top_n
+        limit = int(match.group("n"))
+        which = match.group("which")
+        if match.group("order"):
+            order_column = columns.get(match.group("order"))
+            if order_column is None:
+                return None
+            direction = match.group("direction") or ("asc" if which in ("first", "oldest") else "desc")
+            descending = direction.startswith("desc")
+        elif which == "first":
+            return f"SELECT {select_list} FROM {source}{where} LIMIT {limit}"
+        elif which in ("last", "latest", "newest", "oldest") and columns.get("id"):
+            # Without a named column, "latest" only has an obvious meaning for an id key
+            order_column = columns["id"]
+            descending = which != "oldest"
+        else:
+            return None
+        order = f"{quote_identifier(order_column)} {'DESC' if descending else 'ASC'}"
+        return f"SELECT {select_list} FROM {source}{where} ORDER BY {order} LIMIT {limit}"
+
+    def _condition(self, text, columns):
+        match = _CONDITION.match(text.lower())
+        if match is None:
+            return None
+        column = columns.get(match.group("column"))
+        if column is None:
+            return None
+        raw = text[match.start("value"):match.end("value")].strip()
+        if len(raw) > 1 and raw[0] == raw[-1] and raw[0] in "'\"`":
+            raw = raw[1:-1]
+        elif raw.lower() == "null" and match.group("op") in ("is", "is not"):
+            return f"{quote_identifier(column)} {'IS NOT' if match.group('op') == 'is not' else 'IS'} NULL"
+
+        op = match.group("op")
+        if op in _LIKE_PATTERNS:
+            escaped = raw.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            return f"{quote_identifier(column)} LIKE {sql_literal(_LIKE_PATTERNS[op].format(escaped))}"
+        value = raw if _NUMBER.match(raw) else sql_literal(raw)
+        return f"{quote_identifier(column)} {_OPERATORS[op]} {value}"
+
+
+def _strip_quoted(text):
+    """Drop quoted values so words inside them ("Smith and Sons") don't count as grammar"""
+    return re.sub(r"'[^']*'|\"[^\"]*\"", "''", text)
@@ -0,0 +1,187 @@
+import collections
+import contextvars
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Stage timer handed out while instrumentation is off
+_NO_STAGE = nullcontext()
+
+# Trace of the operation running in this thread/task, if any
+_current = contextvars.ContextVar("chatwithdb_trace", default=None)
+
+
+class _NoTrace:
+    """Stand-in used while instrumentation is off; every method does nothing"""
+
+    def stage(self, name):
+        return _NO_STAGE
+
+    def add(self, name, seconds):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+    def finish(self, error=None):
+        pass
+
+
+NO_TRACE = _NoTrace()
+
+
+class Trace:
+    """Timings and attributes of one operation (a query, a translation, ...)
+
+    Stages with the same name add up, so a stage entered once per batch
+    reports the total time spent in it. Operations started while a trace is
+    already running join it instead of recording on their own.
+    """
+
+    def __init__(self, recorder, operation, attrs):
+        self.recorder = recorder
+        self.operation = operation
+        self.attrs = attrs
+        self.stages = {}
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._depth = 1
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self, error=None):
+        if error is not None:
+            self.attrs.setdefault("error", str(error))
+        self._depth -= 1
+        if self._depth == 0:
+            self.recorder.record(self)
+
+    def as_dict(self):
+        return {
+            "time": datetime.datetime.fromtimestamp(self.started_at).isoformat(timespec="milliseconds"),
+            "operation": self.operation,
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+            **self.attrs,
+        }
+
+
+class Recorder:
+    """Keeps the last `buffer_size` traces in memory and appends each one to a JSONL log
+
+    Off unless PERF_TRACE is set or PERF_LOG_PATH names a log file; the
+    web app can also switch it on at runtime.
+    """
+
+    def __init__(self, enabled=None, log_path=None, buffer_size=None):
+        self.log_path = log_path or os.getenv("PERF_LOG_PATH")
+        self.enabled = (
+            enabled if enabled is not None
+            else bool(self.log_path) or os.getenv("PERF_TRACE", "").lower() in ("1", "true", "yes")
+        )
+        self.buffer = collections.deque(maxlen=int(buffer_size or os.getenv("PERF_BUFFER_SIZE", 500)))
+        self._lock = threading.Lock()
+        self._log = None
+
+    def begin(self, operation, **attrs):
+        """Start a trace, or join the one already running in this context"""
+        if not self.enabled:
+            return NO_TRACE
+        trace = _current.get()
+        if trace is not None:
+            trace._depth += 1
+            for name, value in attrs.items():
+                trace.attrs.setdefault(name, value)
+            return trace
+        return Trace(self, operation, attrs)
+
+    def record(self, trace):
+        entry = trace.as_dict()
+        with self._lock:
+            self.buffer.append(entry)
+            if self.log_path:
+                if self._log is None:
+                    self._log = open(self.log_path, "a", encoding="utf-8")
+                self._log.write(json.dumps(entry, default=str) + "\n")
+                self._log.flush()
+
+    def recent(self, operation=None):
+        with self._lock:
+            entries = list(self.buffer)
+        return [entry for entry in entries if operation is None or entry["operation"] == operation]
+
+    def slowest(self, count=10, operation=None):
+        return sorted(self.recent(operation), key=lambda entry: entry["total_ms"], reverse=True)[:count]
+
+    def clear(self):
+        with self._lock:
+            self.buffer.clear()
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+recorder = Recorder()
+
+
+@contextmanager
+def trace(operation, **attrs):
+    """Time the block as `operation`; inside it, stage() and annotate() add to this trace"""
+    if not recorder.enabled:
+        yield NO_TRACE
+        return
+    active = recorder.begin(operation, **attrs)
+    token = _current.set(active) if active._depth == 1 else None
+    error = None
+    try:
+        yield active
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        active.finish(error)
+        if token is not None:
+            _current.reset(token)
+
+
+def current():
+    """The trace running in this context, or the do-nothing one"""
+    return (_current.get() or NO_TRACE) if recorder.enabled else NO_TRACE
+
+
+def stage(name):
+    """Time a block as stage `name` of the current trace"""
+    if not recorder.enabled:
+        return _NO_STAGE
+    active = _current.get()
+    return active.stage(name) if active is not None else _NO_STAGE
+
+
+def annotate(**attrs):
+    """Attach attributes (rows, bytes, ...) to the current trace"""
+    if recorder.enabled:
+        active = _current.get()
+        if active is not None:
+            active.set(**attrs)
+
+
+def enabled():
+    return recorder.enabled
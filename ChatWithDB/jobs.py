@@ -0,0 +1,305 @@
+import collections
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pool import ConnectionPool
+from results import QueryResult
+from sql_classifier import classify
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Job:
+    """A query or translation waiting for, or running on, a JobExecutor worker
+
+    Query jobs collect their rows batch by batch as they arrive, so the
+    page can show what was fetched so far while the rest streams in. They
+    keep at most `max_rows` rows; `truncated` tells when there were more.
+    Translation jobs leave (sql, cost estimate, tier) in `value`.
+    """
+
+    def __init__(self, job_id, owner, kind, label):
+        self.id = job_id
+        self.owner = owner
+        self.kind = kind
+        self.label = label
+        self.status = QUEUED
+        self.columns = None
+        self.rows = 0
+        self.truncated = False
+        # Row cap of a query job, set when it starts
+        self.max_rows = None
+        # Status message of statements that don't return rows
+        self.message = None
+        self.value = None
+        self.error = None
+        self.created_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self._batches = []
+        # (row count, DataFrame) of the last dataframe() call
+        self._dataframe = None
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        # Database running the job's statements, so cancel() can kill them
+        self._database = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    @property
+    def elapsed(self):
+        """Seconds spent running so far (or in total), 0 while still queued"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def add_batch(self, batch):
+        with self._lock:
+            if self.columns is None:
+                self.columns = batch.columns
+            self._batches.append(batch)
+            self.rows += len(batch)
+            self.truncated = batch.truncated
+
+    def result(self):
+        """Every row fetched so far as one QueryResult, or None before the first batch"""
+        with self._lock:
+            if self.columns is None:
+                return None
+            result = QueryResult(self.columns)
+            for batch in self._batches:
+                result.extend(batch)
+            result.truncated = self.truncated
+            if self.finished:
+                # No more batches will come; keep the merged rows instead of the pieces
+                self._batches = [result]
+            return result
+
+    def dataframe(self):
+        """The rows fetched so far as a DataFrame, rebuilt only when new rows have arrived"""
+        with self._lock:
+            if self._dataframe is not None and self._dataframe[0] == self.rows:
+                return self._dataframe[1]
+        result = self.result()
+        if result is None:
+            return None
+        dataframe = result.to_dataframe()
+        with self._lock:
+            self._dataframe = (len(result), dataframe)
+        return dataframe
+
+    def cancel(self):
+        """Drop the job if it is queued, or stop its statement if it is running"""
+        self._cancelled.set()
+        database = self._database
+        if database is not None:
+            database.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def as_dict(self):
+        return {
+            "job": self.id,
+            "type": self.kind,
+            "statement": self.label,
+            "status": self.status,
+            "rows": self.rows,
+            "seconds": round(self.elapsed, 1),
+        }
+
+
+class JobExecutor:
+    """Runs queries and translations on a thread pool with its own pooled connections
+
+    Shared by every session of the web app. Each owner (a browser session)
+    runs at most `per_user` jobs at a time; the rest wait in that owner's
+    queue, so one user queueing many queries can't take every worker.
+    Finished jobs are kept until the owner has more than `history` of them,
+    and each query job holds at most `max_rows` rows.
+    """
+
+    def __init__(self, max_workers=None, per_user=None, history=None, max_rows=None):
+        self.max_workers = int(max_workers or os.getenv("JOB_WORKERS", 4))
+        self.per_user = int(per_user or os.getenv("JOB_MAX_PER_USER", 2))
+        self.history = int(history or os.getenv("JOB_HISTORY", 20))
+        # Rows a query job keeps when neither the call nor the session sets a lower cap
+        self.max_rows = int(max_rows or os.getenv("JOB_MAX_ROWS", 100000))
+        self.pool = None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        # job id -> Job, oldest first
+        self._jobs = {}
+        # owner -> deque of (Job, work) not started yet, and owner -> jobs running now
+        self._waiting = {}
+        self._running = collections.Counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _job_database(self, db, database_name):
+        """A Database on the executor's own pool, pointed at `database_name` with db's limits"""
+        with self._lock:
+            if self.pool is None:
+                # Same server and credentials as the sessions, separate connections
+                connect_args = dict(db.pool.connect_args)
+                host = connect_args.pop("host")
+                user = connect_args.pop("user")
+                password = connect_args.pop("password")
+                self.pool = ConnectionPool(host, user, password, size=self.max_workers, **connect_args)
+        # One per job, so cancelling a job never stops another one's statement
+        database = type(db).on_pool(self.pool, database_name, result_cache=db.result_cache)
+        database.query_timeout = db.query_timeout
+        database.max_rows = db.max_rows
+        return database
+
+    def submit_query(self, owner, db, query, params=None, use_cache=True, timeout=None, max_rows=None,
+                     prepared=None):
+        """Queue `query` against db's current database and return its Job"""
+        # The database in use now, not whichever one the session has moved to when the job starts
+        database_name = db.database
+
+        def work(job):
+            database = job._database = self._job_database(db, database_name)
+            if not classify(query).returns_rows:
+                outcome = database.execute_query(
+                    query, params, use_cache=use_cache, timeout=timeout, max_rows=max_rows, prepared=prepared
+                )
+                if isinstance(outcome, str) and outcome.startswith("Error"):
+                    raise RuntimeError(outcome)
+                job.message = outcome if isinstance(outcome, str) else f"{len(outcome)} row(s)"
+                return
+            # Finished jobs stay in memory, so their rows are always capped
+            job.max_rows = min(limit for limit in (max_rows, database.max_rows, self.max_rows) if limit)
+            batches = database.iter_query(
+                query, params, use_cache=use_cache, timeout=timeout, max_rows=job.max_rows, prepared=prepared
+            )
+            try:
+                for batch in batches:
+                    job.add_batch(batch)
+                    if job.cancelled:
+                        break
+            finally:
+                batches.close()
+
+        return self._submit(owner, "query", query, work)
+
+    def submit_translation(self, owner, db, translator, question, cost_guard=None):
+        """Queue a natural language request; the Job's value becomes (sql, estimate, tier)"""
+        database_name = db.database
+
+        def work(job):
+            if cost_guard is None:
+                sql = translator.translate(question)
+                job.value = (sql, None, translator.last_tier)
+                return
+            # The cost guard's EXPLAIN runs on the executor's connections too
+            database = job._database = self._job_database(db, database_name)
+            sql, estimate = cost_guard.translate(database, translator, question)
+            # last_tier is per thread, and this worker made the call
+            job.value = (sql, estimate, translator.last_tier)
+
+        return self._submit(owner, "translation", question, work)
+
+    def _submit(self, owner, kind, label, work):
+        with self._lock:
+            job = Job(next(self._ids), owner, kind, label)
+            self._jobs[job.id] = job
+            self._waiting.setdefault(owner, collections.deque()).append((job, work))
+            self._forget_old(owner)
+        self._dispatch(owner)
+        return job
+
+    def _dispatch(self, owner):
+        """Start the owner's queued jobs while they are under their limit"""
+        with self._lock:
+            waiting = self._waiting.get(owner)
+            while waiting and self._running[owner] < self.per_user:
+                job, work = waiting.popleft()
+                if job.cancelled:
+                    job.status = CANCELLED
+                    continue
+                self._running[owner] += 1
+                self._executor.submit(self._run, job, work)
+
+    def _run(self, job, work):
+        job.started_at = time.monotonic()
+        job.status = RUNNING
+        try:
+            if not job.cancelled:
+                work(job)
+            job.status = CANCELLED if job.cancelled else DONE
+        except Exception as e:
+            # A killed statement raises QueryCancelled; only a time limit (QueryTimeout) counts as a failure
+            job.status = CANCELLED if job.cancelled else FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.monotonic()
+            job._database = None
+            with self._lock:
+                self._running[job.owner] -= 1
+            self._dispatch(job.owner)
+
+    def _forget_old(self, owner):
+        finished = [job for job in self._jobs.values() if job.owner == owner and job.finished]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job.id]
+
+    def jobs(self, owner):
+        """The owner's jobs, newest first"""
+        with self._lock:
+            return [job for job in reversed(self._jobs.values()) if job.owner == owner]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active(self, owner):
+        """Whether any of the owner's jobs is still queued or running"""
+        return any(not job.finished for job in self.jobs(owner))
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel()
+            # Queued jobs are skipped when their turn comes; show them as cancelled right away
+            with self._lock:
+                if job.started_at is None:
+                    job.status = CANCELLED
+        return job
+
+    def remove(self, job_id):
+        """Forget a finished job and the rows it holds"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            statuses = collections.Counter(job.status for job in self._jobs.values())
+        return {
+            "workers": self.max_workers,
+            "per_user": self.per_user,
+            "queued": statuses[QUEUED],
+            "running": statuses[RUNNING],
+            "finished": sum(statuses[status] for status in FINISHED),
+        }
+
+    def close(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self.pool is not None:
+            self.pool.close()
@@ -0,0 +1,156 @@
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_sql(prompt):
+    """Deterministic stand-in for the model: select the first column of the first table"""
+    table = re.search(r"Table: `([^`]+)`", prompt)
+    column = re.search(r"Columns:\n  - (\S+)", prompt)
+    if not table or not column:
+        return "SELECT 1"
+    return f"SELECT {column.group(1)} FROM {table.group(1)} LIMIT 100"
+
+
+def _words(text):
+    """Split text into word-sized chunks that join back into it"""
+    return re.findall(r"\s*\S+|\s+", text) or [text]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers Groq/OpenAI chat completion requests without a real model
+
+    The answer is followed by the server's `trailing` text (the model
+    rambling on after the SQL) and takes `token_latency` per word to
+    write. Requests with ``"stream": true`` get it as server-sent events,
+    one word per chunk.
+    """
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            request_number = server.request_count
+
+        if server.rate_limit_every and request_number % server.rate_limit_every == 0:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                            {"retry-after": str(server.retry_after)})
+            return
+
+        time.sleep(server.latency)
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        pieces = _words(server.responder(prompt) + server.trailing)
+        if body.get("stream"):
+            self._send_stream(f"stub-{request_number}", body.get("model", "stub"), pieces)
+            return
+        # A complete answer takes as long to write as the whole stream
+        time.sleep(server.token_latency * max(0, len(pieces) - 1))
+        content = "".join(pieces)
+        self._send_json(200, {
+            "id": f"stub-{request_number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        })
+
+    def _send_stream(self, completion_id, model, pieces):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        server = self.server
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        try:
+            for index, piece in enumerate(pieces):
+                if index and server.token_latency:
+                    time.sleep(server.token_latency)
+                delta = {"role": "assistant", "content": piece} if index == 0 else {"content": piece}
+                self._send_event(dict(chunk, choices=[{"index": 0, "delta": delta, "finish_reason": None}]))
+                with server.lock:
+                    server.chunks_sent += 1
+            self._send_event(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading once it had what it needed
+            with server.lock:
+                server.streams_closed_early += 1
+
+    def _send_event(self, payload):
+        self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0, latency=0.0, rate_limit_every=0, retry_after=0.1, responder=stub_sql,
+               token_latency=0.0, trailing=""):
+    """Start the stub in a background thread; set GROQ_BASE_URL to the returned server's url
+
+    `latency` is the wait before the answer (or its first streamed chunk),
+    `token_latency` the wait between streamed chunks.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.latency = latency
+    server.token_latency = token_latency
+    server.trailing = trailing
+    server.chunks_sent = 0
+    server.streams_closed_early = 0
+    server.rate_limit_every = rate_limit_every
+    server.retry_after = retry_after
+    server.responder = responder
+    server.request_count = 0
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Groq chat completion API")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per completion")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with 429")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="seconds between streamed chunks")
+    parser.add_argument("--trailing", default="", help="text streamed after the SQL, like a model explaining it")
+    args = parser.parse_args()
+
+    server = start_stub(args.port, args.latency, args.rate_limit_every,
+                        token_latency=args.token_latency, trailing=args.trailing.replace("\\n", "\n"))
+    print(f"LLM stub listening on {server.url} (set GROQ_BASE_URL={server.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
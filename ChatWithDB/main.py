@@ -1,35 +1,196 @@
+import json
 import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Taken before the imports below, for the --startup-time report
+_IMPORTS_STARTED = time.perf_counter()
+
 import mysql.connector
 from dotenv import load_dotenv
+from cost_guard import CostGuard
+from bulk_load import batched, insert_batches, iter_dataframe_batches, load_csv
+from datagen import generate_table_data
+from export import EXPORT_FORMATS, export_query
+from fanout import FanOut, parse_targets
+import instrumentation
+from pool import ConnectionPool
+from query_limits import QueryWatchdog, add_max_execution_time
+from result_cache import ResultCache, estimate_size, is_cacheable
+from results import QueryResult
+from schema import fetch_schema_version, load_schema
+from sql_classifier import DML_STATEMENTS, PARAMETERIZABLE_STATEMENTS, classify, parameterize
+from sql_script import run_script
 from sql_translator import SQLTranslator
 
+_IMPORTS_FINISHED = time.perf_counter()
+
 # Load environment variables
 load_dotenv()
 
+# Dependencies that should only be imported once a feature needs them
+LAZY_MODULES = ("groq", "httpx", "pandas", "numpy", "pyarrow", "openpyxl")
+
 class Database:
-    def __init__(self):
+    def __init__(self, pool=None, result_cache=None, database=None, schema_cache=None):
         try:
-            self.connection = mysql.connector.connect(
-                host=os.getenv("DB_HOST", "localhost"),
-                user=os.getenv("DB_USER", "root"),
-                password=os.getenv("DB_PASSWORD", "1231")
-            )
-            self.cursor = self.connection.cursor(dictionary=True)
+            # Share a pool between instances by passing it in; otherwise own one
+            self._owns_pool = pool is None
+            self._configure(pool or ConnectionPool(), result_cache, schema_cache)
+
+            # Open the first pooled connection up front so bad credentials fail early
+            with self.pool.connection():
+                pass
             print("Database connection successful!")
             
-            # Connect to default database if specified
-            default_db = os.getenv("DB_NAME")
+            # Connect to the requested or default database if specified
+            default_db = database or os.getenv("DB_NAME")
             if default_db:
                 self.switch_database(default_db)
         except mysql.connector.Error as err:
             print(f"Error connecting to database: {err}")
             raise
 
+    @classmethod
+    def on_pool(cls, pool, database=None, result_cache=None, schema_cache=None):
+        """A Database on an already working pool, set to `database` without checking it
+
+        Skips the connection check, the messages and the SHOW DATABASES of
+        the constructor, for short-lived handles such as one per background
+        job or per shard. A missing database fails on the first statement.
+        """
+        db = cls.__new__(cls)
+        db._owns_pool = False
+        db._configure(pool, result_cache, schema_cache)
+        db.database = database
+        return db
+
+    def _configure(self, pool, result_cache, schema_cache):
+        self.pool = pool
+        self.database = None
+        self.fetch_batch_size = int(os.getenv("DB_FETCH_BATCH_SIZE", 1000))
+        self.load_batch_size = int(os.getenv("DB_LOAD_BATCH_SIZE", 1000))
+
+        # Defaults for the per-call timeout/max_rows arguments; 0 turns a limit off
+        self.query_timeout = float(os.getenv("QUERY_TIMEOUT", 0))
+        self.max_rows = int(os.getenv("QUERY_MAX_ROWS", 0))
+        # Default for the per-call prepared argument: run DML as cached server-side prepared statements
+        self.prepared_statements = os.getenv("DB_PREPARED_STATEMENTS", "").lower() in ("1", "true", "yes")
+        # Watchdogs of the statements running right now, for cancel()
+        self._running = set()
+        self._running_lock = threading.Lock()
+
+        # database name -> (SchemaSnapshot, time of the last version check); pass a dict in to share it
+        self._schema_cache = schema_cache if schema_cache is not None else {}
+        self.schema_check_interval = float(os.getenv("SCHEMA_CHECK_INTERVAL", 5))
+
+        # Opt-in cache of read-only SELECT results (QUERY_CACHE_MB enables the default one)
+        if result_cache is None and os.getenv("QUERY_CACHE_MB"):
+            result_cache = ResultCache()
+        self.result_cache = result_cache
+
+    @contextmanager
+    def raw_cursor(self, dictionary=True, **options):
+        """Check out a pooled connection on the current database and yield (conn, cursor)
+
+        For helpers that drive the cursor themselves (EXPLAIN, bulk loads,
+        scripts); the connection goes back to the pool on exit.
+        """
+        with self.pool.connection(self.database) as conn:
+            cursor = conn.cursor(dictionary=dictionary, **options)
+            try:
+                yield conn, cursor
+            finally:
+                try:
+                    cursor.close()
+                except mysql.connector.Error:
+                    # Unread rows are left on the wire; don't hand this connection out again
+                    conn.invalidate()
+
+    @contextmanager
+    def time_limit(self, conn, timeout):
+        """Guard the statement(s) run on `conn` (from raw_cursor) inside the block with a watchdog
+
+        The statement is killed after `timeout` seconds, on cancel(), or when
+        the caller is interrupted with Ctrl+C, and the server's "interrupted"
+        error is raised as QueryTimeout or QueryCancelled.
+        """
+        watchdog = QueryWatchdog(self.pool.connect_args, conn.connection_id, timeout)
+        with self._running_lock:
+            self._running.add(watchdog)
+        try:
+            yield watchdog
+        except mysql.connector.Error as err:
+            translated = watchdog.translate_error(err)
+            if translated is err:
+                raise
+            raise translated from err
+        except KeyboardInterrupt:
+            watchdog.cancel()
+            raise
+        finally:
+            watchdog.stop()
+            with self._running_lock:
+                self._running.discard(watchdog)
+
+    @contextmanager
+    def _executed(self, statement, params, timeout, prepared=False, buffered=None, trace=None):
+        """Run `statement` on a pooled connection under the time limit and yield (conn, cursor)
+
+        Prepared statements come from the connection's statement cache and
+        are left open; plain cursors are closed on exit. The execute time
+        goes to `trace` (the current one by default).
+        """
+        trace = trace or instrumentation.current()
+        if prepared:
+            with self.pool.connection(self.database) as conn:
+                try:
+                    with self.time_limit(conn, timeout):
+                        with trace.stage("execute"):
+                            cursor = conn.execute_prepared(statement, params)
+                        yield conn, cursor
+                finally:
+                    if conn.raw.unread_result:
+                        # Rows left unread block the session, so don't hand it out again
+                        conn.invalidate()
+            return
+
+        options = {} if buffered is None else {"buffered": buffered}
+        with self.raw_cursor(dictionary=False, **options) as (conn, cursor), self.time_limit(conn, timeout):
+            with trace.stage("execute"):
+                if params:
+                    cursor.execute(statement, params)
+                else:
+                    cursor.execute(statement)
+            yield conn, cursor
+
+    def _use_prepared(self, classified, prepared):
+        if prepared is None:
+            prepared = self.prepared_statements
+        return bool(prepared) and classified.type in PARAMETERIZABLE_STATEMENTS and classified.statement_count == 1
+
+    def _resolve_limits(self, query, timeout, max_rows):
+        """Apply the instance defaults and return (statement to send, timeout, max_rows)"""
+        timeout = self.query_timeout if timeout is None else timeout
+        max_rows = self.max_rows if max_rows is None else max_rows
+        return add_max_execution_time(query, timeout), timeout or None, max_rows or None
+
+    def cancel(self):
+        """Stop every statement this instance is running (from any thread)"""
+        with self._running_lock:
+            running = list(self._running)
+        for watchdog in running:
+            watchdog.cancel()
+        return len(running)
+
     def list_databases(self):
         """List all available databases"""
         try:
-            self.cursor.execute("SHOW DATABASES")
-            databases = [db['Database'] for db in self.cursor.fetchall()]
+            with self.raw_cursor() as (_, cursor):
+                cursor.execute("SHOW DATABASES")
+                databases = [db['Database'] for db in cursor.fetchall()]
             return [db for db in databases if db not in ['information_schema', 'performance_schema', 'mysql', 'sys']]
         except mysql.connector.Error as err:
             print(f"Error listing databases: {err}")
@@ -37,72 +198,44 @@ class Database:
 
     def switch_database(self, database_name):
         """Switch to a different database"""
-        try:
-            # First check if the database exists
-            self.cursor.execute("SHOW DATABASES")
-            databases = [db['Database'] for db in self.cursor.fetchall()]
-            
-            if database_name not in databases:
-                print(f"Database {database_name} does not exist")
-                return False
-                
-            # Close existing connection
-            if hasattr(self, 'cursor') and self.cursor:
-                self.cursor.close()
-            if hasattr(self, 'connection') and self.connection:
-                self.connection.close()
-                
-            # Create new connection with the selected database
-            self.connection = mysql.connector.connect(
-                host=os.getenv("DB_HOST", "localhost"),
-                user=os.getenv("DB_USER", "root"),
-                password=os.getenv("DB_PASSWORD", "1231"),
-                database=database_name
-            )
-            self.cursor = self.connection.cursor(dictionary=True)
-            
-            # Verify the connection
-            if not self.connection.is_connected():
-                print("Failed to establish connection to the database")
+        with instrumentation.trace("switch_database", database=database_name):
+            try:
+                with self.raw_cursor() as (conn, cursor):
+                    # First check if the database exists
+                    cursor.execute("SHOW DATABASES")
+                    databases = [db['Database'] for db in cursor.fetchall()]
+
+                    if database_name not in databases:
+                        print(f"Database {database_name} does not exist")
+                        return False
+
+                    # Pooled connections switch with USE instead of reconnecting
+                    conn.use(database_name)
+
+                self.database = database_name
+                print(f"Switched to database: {database_name}")
+                return True
+            except mysql.connector.Error as err:
+                print(f"Error switching to database {database_name}: {err}")
                 return False
-                
-            print(f"Switched to database: {database_name}")
-            return True
-        except mysql.connector.Error as err:
-            print(f"Error switching to database {database_name}: {err}")
-            return False
 
     def get_current_database(self):
         """Get the name of the current database"""
-        try:
-            self.cursor.execute("SELECT DATABASE()")
-            return self.cursor.fetchone()['DATABASE()']
-        except mysql.connector.Error as err:
-            print(f"Error getting current database: {err}")
-            return None
+        return self.database
+
+    def get_pool_stats(self):
+        """Return connection pool counters (checkouts, waits, reconnects, ...)"""
+        return self.pool.get_stats()
 
     def _create_database(self):
         """Create the database if it doesn't exist"""
         try:
-            temp_conn = mysql.connector.connect(
-                host=os.getenv("DB_HOST", "localhost"),
-                user=os.getenv("DB_USER", "root"),
-                password=os.getenv("DB_PASSWORD", "1234")
-            )
-            temp_cursor = temp_conn.cursor()
             db_name = os.getenv("DB_NAME", "project")
-            temp_cursor.execute(f"CREATE DATABASE {db_name}")
-            temp_cursor.close()
-            temp_conn.close()
-            
-            # Reconnect with the new database
-            self.connection = mysql.connector.connect(
-                host=os.getenv("DB_HOST", "localhost"),
-                user=os.getenv("DB_USER", "root"),
-                password=os.getenv("DB_PASSWORD", "1234"),
-                database=db_name
-            )
-            self.cursor = self.connection.cursor(dictionary=True)
+            with self.raw_cursor() as (_, cursor):
+                cursor.execute(f"CREATE DATABASE {db_name}")
+
+            # Point this instance at the new database
+            self.switch_database(db_name)
             
             # Create initial tables
             self._create_initial_tables()
@@ -114,112 +247,391 @@ class Database:
     def _create_initial_tables(self):
         """Create initial tables in the database"""
         try:
-            # Create USERS table
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS USERS (
-                    ID INT AUTO_INCREMENT PRIMARY KEY,
-                    NAME VARCHAR(100) NOT NULL
-                )
-            """)
-            self.connection.commit()
+            with self.raw_cursor() as (conn, cursor):
+                # Create USERS table
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS USERS (
+                        ID INT AUTO_INCREMENT PRIMARY KEY,
+                        NAME VARCHAR(100) NOT NULL
+                    )
+                """)
+                conn.commit()
+            self.invalidate_schema()
             print("Initial tables created successfully!")
         except mysql.connector.Error as err:
             print(f"Error creating tables: {err}")
             
-    def execute_query(self, query, params=None):
+    def execute_query(self, query, params=None, use_cache=True, timeout=None, max_rows=None, prepared=None):
+        """Run one statement and return its QueryResult or a status message
+
+        `timeout` (seconds) and `max_rows` default to QUERY_TIMEOUT and
+        QUERY_MAX_ROWS; pass 0 to lift a limit for this call. A result cut
+        off at `max_rows` has ``truncated`` set. With `prepared` (default
+        DB_PREPARED_STATEMENTS) SELECT/INSERT/UPDATE/DELETE/REPLACE run as
+        server-side prepared statements, reused while the SQL text repeats.
+        """
+        with instrumentation.trace("execute_query", query=query, database=self.database):
+            try:
+                classified = classify(query)
+                # USE would only move one pooled connection, so route it through switch_database
+                if classified.type == "USE":
+                    database_name = classified.database
+                    if self.switch_database(database_name):
+                        return f"Database changed to {database_name}"
+                    return f"Error executing query: could not switch to database {database_name}"
+
+                statement, timeout, max_rows = self._resolve_limits(query, timeout, max_rows)
+                cache_key = self._result_cache_key(query, params) if use_cache else None
+                if cache_key is not None:
+                    cached = self.result_cache.get(cache_key)
+                    if cached is not None:
+                        instrumentation.annotate(cache_hit=True, rows=len(cached))
+                        if max_rows and len(cached) > max_rows:
+                            cached = cached[:max_rows]
+                            cached.truncated = True
+                        return cached if cached else "No results found"
+
+                # Plain tuple rows; QueryResult keeps the column names once
+                use_prepared = self._use_prepared(classified, prepared)
+                with self._executed(statement, params, timeout, use_prepared) as (conn, cursor):
+
+                    if classified.is_ddl:
+                        self.invalidate_schema()
+                        self.invalidate_cached_results()
+                
+                    if classified.type in DML_STATEMENTS:
+                        conn.commit()
+                        self.invalidate_cached_results(classified.write_tables or None)
+                        affected_rows = cursor.rowcount
+                        return f"{affected_rows} row(s) affected"
+                    elif not cursor.with_rows:
+                        if classified.is_write and not classified.is_ddl:
+                            # CALL, GRANT, ...: the effects are unknown, so commit and drop every cached result
+                            conn.commit()
+                            self.invalidate_cached_results()
+                        return "Query executed successfully"
+                    else:
+                        with instrumentation.stage("fetch"):
+                            if max_rows:
+                                # Rows past the cap stay unread; raw_cursor then retires the connection
+                                rows = cursor.fetchmany(max_rows + 1)
+                                result = QueryResult(cursor.column_names, rows[:max_rows], cursor.description)
+                                result.truncated = len(rows) > max_rows
+                            else:
+                                result = QueryResult(cursor.column_names, cursor.fetchall(), cursor.description)
+                        if instrumentation.enabled():
+                            instrumentation.annotate(rows=len(result), bytes=estimate_size(result))
+                        if cache_key is not None and not result.truncated:
+                            self.result_cache.put(cache_key, result, classified.tables)
+                        if not result:
+                            return "No results found"
+                        return result
+            except Exception as e:
+                instrumentation.annotate(error=str(e))
+                return f"Error executing query: {e}"
+    
+    def iter_query(self, query, params=None, batch_size=None, use_cache=True, timeout=None, max_rows=None,
+                   prepared=None):
+        """Stream a query's rows as QueryResult batches of at most `batch_size` rows
+
+        Rows are read from an unbuffered cursor, so only one batch is held in
+        memory at a time. The pooled connection stays checked out until the
+        generator is exhausted or closed. With a result cache, hits are
+        replayed from memory and small enough results are stored.
+        `timeout`, `max_rows` and `prepared` work as in execute_query; the
+        last batch before the row cap has ``truncated`` set.
+        """
+        # A generator can't hold the trace context across yields, so the trace is passed along
+        trace = instrumentation.recorder.begin("iter_query", query=query, database=self.database)
+        measure_bytes = instrumentation.enabled()
+        rows = fetched_bytes = 0
+        error = None
+        batches = self._iter_batches(query, params, batch_size, use_cache, timeout, max_rows, prepared, trace)
         try:
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
-            
-            if query.strip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
-                self.connection.commit()
-                affected_rows = self.cursor.rowcount
-                return f"{affected_rows} row(s) affected"
-            else:
-                result = self.cursor.fetchall()
-                if not result:
-                    return "No results found"
-                return result
+            for batch in batches:
+                rows += len(batch)
+                if measure_bytes:
+                    fetched_bytes += estimate_size(batch)
+                yield batch
         except Exception as e:
-            return f"Error executing query: {e}"
-    
+            error = e
+            raise
+        finally:
+            # Closing hands the connection back right away when the caller stops early
+            batches.close()
+            trace.set(rows=rows, bytes=fetched_bytes)
+            trace.finish(error)
+
+    def _iter_batches(self, query, params, batch_size, use_cache, timeout, max_rows, prepared, trace):
+        batch_size = batch_size or self.fetch_batch_size
+        statement, timeout, max_rows = self._resolve_limits(query, timeout, max_rows)
+        cache_key = self._result_cache_key(query, params) if use_cache else None
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                trace.set(cache_hit=True)
+                for start in range(0, len(cached), batch_size):
+                    batch = cached[start:start + batch_size]
+                    if max_rows and start + len(batch) > max_rows:
+                        batch = batch[:max_rows - start]
+                        batch.truncated = True
+                        yield batch
+                        return
+                    yield batch
+                return
+
+        use_prepared = self._use_prepared(classify(query), prepared)
+        with self._executed(statement, params, timeout, use_prepared, buffered=False, trace=trace) as (_, cursor):
+            if not cursor.with_rows:
+                return
+
+            columns, description = cursor.column_names, cursor.description
+            collected = QueryResult(columns, description=description) if cache_key is not None else None
+            collected_bytes = 0
+            remaining = max_rows
+            while True:
+                size = batch_size if remaining is None else min(batch_size, remaining + 1)
+                with trace.stage("fetch"):
+                    rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                batch = QueryResult(columns, rows, description)
+                if remaining is not None:
+                    if len(rows) > remaining:
+                        batch = batch[:remaining]
+                        batch.truncated = True
+                        yield batch
+                        # The cap cut the result short, so it must not be cached
+                        return
+                    remaining -= len(rows)
+                if collected is not None:
+                    collected.extend(batch)
+                    collected_bytes += estimate_size(batch)
+                    if collected_bytes > self.result_cache.max_entry_bytes:
+                        collected = None
+                yield batch
+
+            if collected is not None:
+                self.result_cache.put(cache_key, collected, classify(query).tables, collected_bytes)
+
+    def fetch_all(self, query, params=None, use_cache=True, timeout=None, max_rows=None, prepared=None):
+        """Run a row-returning query and return all rows as one QueryResult
+
+        Unlike execute_query, errors are raised and an empty result is an
+        empty QueryResult rather than a message.
+        """
+        result = QueryResult(())
+        for batch in self.iter_query(query, params, use_cache=use_cache, timeout=timeout, max_rows=max_rows,
+                                     prepared=prepared):
+            if not result.columns:
+                result = QueryResult(batch.columns, description=batch.description)
+            result.extend(batch)
+            result.truncated = batch.truncated
+        return result
+
+    def iter_rows(self, query, params=None, batch_size=None):
+        """Stream a query's rows one at a time"""
+        for batch in self.iter_query(query, params, batch_size):
+            yield from batch
+
+    def bulk_insert(self, table, rows, columns, batch_size=None, progress=None):
+        """Insert an iterable of row tuples with batched multi-row INSERTs
+
+        Each batch is committed on its own; `progress` is called with the
+        running LoadReport after every batch.
+        """
+        batches = batched(rows, batch_size or self.load_batch_size)
+        return insert_batches(self, table, columns, batches, progress)
+
+    def load_dataframe(self, table, df, batch_size=None, progress=None):
+        """Insert every row of a pandas DataFrame, using its column names"""
+        batches = iter_dataframe_batches(df, batch_size or self.load_batch_size)
+        return insert_batches(self, table, list(df.columns), batches, progress)
+
+    def load_csv(self, table, source, batch_size=None, use_local_infile=None, progress=None):
+        """Load a CSV file (path or file object) whose header row names the columns"""
+        return load_csv(self, table, source, batch_size or self.load_batch_size, use_local_infile, progress)
+
+    def execute_script(self, script, transaction_size=None, batch_size=None, timeout=None, progress=None):
+        """Run a SQL script (text or list of statements) in batched transactions and return its ScriptReport"""
+        return run_script(self, script, transaction_size, batch_size, timeout=timeout, progress=progress)
+
+    def _result_cache_key(self, query, params):
+        """Cache key for a cacheable query, or None when it must go to the server"""
+        if self.result_cache is None or not is_cacheable(query):
+            return None
+        return self.result_cache.make_key(self.database, query, params)
+
+    def invalidate_cached_results(self, tables=None, database=None):
+        """Drop cached results that read any of `tables` (all of the database's when None)
+
+        Unqualified table names, and `database` itself, default to the current database.
+        """
+        if self.result_cache is not None:
+            self.result_cache.invalidate_tables(database or self.database, tables)
+
+    def get_cache_stats(self):
+        """Return result cache counters, or None when caching is off"""
+        return self.result_cache.get_stats() if self.result_cache is not None else None
+
+    def get_schema_snapshot(self, force=False):
+        """Return the cached SchemaSnapshot of the current database
+
+        The snapshot is loaded with one information_schema query and reused
+        until DDL runs through execute_query or the schema version check
+        (at most once every `schema_check_interval` seconds) sees a change.
+        """
+        current_db = self.get_current_database()
+        if not current_db:
+            return None
+
+        snapshot, checked_at = self._schema_cache.get(current_db, (None, 0.0))
+        now = time.monotonic()
+        if snapshot is not None and not force and now - checked_at < self.schema_check_interval:
+            return snapshot
+
+        with self.raw_cursor() as (_, cursor):
+            with instrumentation.stage("version_check"):
+                version = fetch_schema_version(cursor, current_db)
+            if snapshot is None or force or snapshot.version != version:
+                with instrumentation.stage("load_schema"):
+                    snapshot = load_schema(cursor, current_db, version)
+
+        self._schema_cache[current_db] = (snapshot, now)
+        return snapshot
+
+    def invalidate_schema(self, database_name=None):
+        """Drop the cached schema of a database (the current one by default)"""
+        self._schema_cache.pop(database_name or self.database, None)
+
     def get_schema(self):
         """Get the database schema information"""
-        schema = {}
-        
-        try:
-            # Check if we have a valid connection
-            if not self.connection or not self.connection.is_connected():
-                print("Database connection is not active")
-                return {}
-                
-            # Get current database
-            current_db = self.get_current_database()
-            if not current_db:
-                print("No database selected")
-                return {}
-                
-            # Get all tables
-            self.cursor.execute("SHOW TABLES")
-            tables = [table[f'Tables_in_{current_db}'] for table in self.cursor.fetchall()]
-            
-            if not tables:
-                print(f"No tables found in database {current_db}")
+        with instrumentation.trace("get_schema", database=self.database):
+            try:
+                # Check that a database is selected
+                current_db = self.get_current_database()
+                if not current_db:
+                    print("No database selected")
+                    return {}
+
+                snapshot = self.get_schema_snapshot()
+                if not snapshot.tables:
+                    print(f"No tables found in database {current_db}")
+                    return {}
+
+                return snapshot.column_names()
+            except Exception as e:
+                print(f"Error fetching schema: {str(e)}")
                 return {}
             
-            # Get columns for each table
-            for table in tables:
-                try:
-                    self.cursor.execute(f"DESCRIBE {table}")
-                    columns = [row['Field'] for row in self.cursor.fetchall()]
-                    schema[table.lower()] = columns
-                except mysql.connector.Error as err:
-                    print(f"Error getting columns for table {table}: {err}")
-                    continue
-                
-            return schema
-        except Exception as e:
-            print(f"Error fetching schema: {str(e)}")
-            return {}
-            
     def close(self):
-        if hasattr(self, 'cursor') and self.cursor:
-            self.cursor.close()
-        if hasattr(self, 'connection') and self.connection:
-            self.connection.close()
+        # A pool passed in by the caller may still be serving other instances
+        if self._owns_pool:
+            self.pool.close()
         print("Database connection closed")
 
+def returns_rows(query):
+    """Whether a statement produces a result set that can be streamed"""
+    return classify(query).returns_rows
+
+# How each translator tier is named to the user
+TIER_LABELS = {
+    "fast_path": "local fast path",
+    "cache": "translation cache",
+    "llm": "LLM",
+    "error": "failed",
+}
+
 def display_results(results):
-    """Format and display query results"""
+    """Format and display query results
+
+    `results` may be a QueryResult or an iterator of QueryResult batches
+    from Database.iter_query; batches are printed as they arrive.
+    """
     if isinstance(results, str):
         print(results)
         return
-        
-    if not results:
+
+    if isinstance(results, QueryResult):
+        results = [results]
+
+    headers = None
+    separator = ""
+    total_rows = 0
+    for batch in results:
+        if headers is None and batch:
+            # Print table headers
+            headers = batch.columns
+            header_row = " | ".join(str(h).upper() for h in headers)
+            separator = "-" * len(header_row)
+
+            print(separator)
+            print(header_row)
+            print(separator)
+
+        # Print rows
+        for values in batch.rows:
+            print(" | ".join(str(value) for value in values))
+        total_rows += len(batch)
+
+    if headers is None:
         print("No results found")
         return
-        
-    # Print table headers
-    headers = results[0].keys()
-    header_row = " | ".join(str(h).upper() for h in headers)
-    separator = "-" * len(header_row)
-    
-    print(separator)
-    print(header_row)
-    print(separator)
-    
-    # Print rows
-    for row in results:
-        print(" | ".join(str(row[h]) for h in headers))
-    
+
     print(separator)
-    print(f"Total rows: {len(results)}")
+    print(f"Total rows: {total_rows}")
+    if batch.truncated:
+        print("(stopped at the row limit; set QUERY_MAX_ROWS=0 to fetch everything)")
 
-def main():
+def run_and_display(db, query, params=None, prepared=None):
+    """Execute a query, streaming row-returning statements to the terminal
+
+    Ctrl+C stops the statement on the server as well.
+    """
+    try:
+        if not returns_rows(query):
+            display_results(db.execute_query(query, params, prepared=prepared))
+            return
+
+        display_results(db.iter_query(query, params, prepared=prepared))
+    except mysql.connector.Error as err:
+        print(f"Error executing query: {err}")
+    except KeyboardInterrupt:
+        print("\nQuery cancelled")
+
+def display_fanout(outcome):
+    """Print a fan-out's merged rows followed by one line per shard"""
+    display_results(outcome.result if outcome.result is not None else "No results found")
+    print(f"\n{outcome.summary()}")
+    for shard in outcome.shards:
+        status = shard.error or shard.message or f"{shard.rows} row(s)"
+        print(f"  {shard.target.name}: {status} ({shard.seconds:.2f}s)")
+
+def load_translator_schema(db, translator):
+    """Load the current database's schema, with foreign keys, into the translator"""
+    schema = db.get_schema()
+    if schema:
+        translator.load_snapshot(db.get_schema_snapshot())
+    return schema
+
+def startup_report(setup_started):
+    """Timings from the first import to the first menu prompt, for `python main.py --startup-time`"""
+    now = time.perf_counter()
+    return {
+        "imports_ms": round((_IMPORTS_FINISHED - _IMPORTS_STARTED) * 1000, 3),
+        "setup_ms": round((now - setup_started) * 1000, 3),
+        "first_prompt_ms": round((now - _IMPORTS_STARTED) * 1000, 3),
+        # Any of these here means something imported them eagerly
+        "lazy_modules_loaded": [name for name in LAZY_MODULES if name in sys.modules],
+    }
+
+def main(startup_time=False):
+    setup_started = time.perf_counter()
     db = Database()
+    # Cheap to create: groq is imported and the client built on the first LLM call
     translator = SQLTranslator()
+    cost_guard = CostGuard()
+    fan_out = FanOut(db)
     
     while True:
         print("\n=== MySQL Automation Tool ===")
@@ -228,49 +640,86 @@ def main():
         print("3. Add test data")
         print("4. Update schema information")
         print("5. Switch database")
-        print("6. Exit")
+        print("6. Bulk load CSV file")
+        print("7. Export query results")
+        print("8. Run a query across several databases")
+        print("9. Run a SQL script file")
+        print("10. Exit")
+
+        if startup_time:
+            # Stop where the user would be asked for input
+            print(json.dumps(startup_report(setup_started)))
+            fan_out.close()
+            cost_guard.close()
+            db.close()
+            return
         
-        choice = input("Enter your choice (1-6): ")
+        choice = input("Enter your choice (1-10): ")
         
         if choice == "1":
             query = input("Enter SQL query: ")
-            result = db.execute_query(query)
-            display_results(result)
+            run_and_display(db, query)
             
         elif choice == "2":
             nl_query = input("Enter your request in natural language: ")
-            sql_query = translator.translate(nl_query)
-            print("\nGenerated SQL Query:")
+            # Blocked plans are sent back to the model once with the EXPLAIN findings
+            sql_query, estimate = cost_guard.translate(db, translator, nl_query)
+            print(f"\nGenerated SQL Query ({TIER_LABELS.get(translator.last_tier, 'unknown')}):")
             print(sql_query)
             
             if sql_query.startswith("Error:"):
                 print(sql_query)
                 continue
+
+            if estimate is not None:
+                print(f"\nEstimated cost: {estimate.summary()}")
+                for reason in estimate.reasons:
+                    print(f"  - {reason}")
+                if estimate.verdict == "block":
+                    print("Query blocked by the cost guard "
+                          "(raise COST_GUARD_BLOCK_ROWS or set COST_GUARD_MODE=warn to allow it).")
+                    continue
                 
+            params = None
+            if translator.parameterize:
+                sql_query, params = parameterize(sql_query)
+                if params:
+                    print(f"\nPrepared as: {sql_query}")
+                    print(f"Parameters: {params}")
+
             execute = input("\nDo you want to execute this query? (y/n): ")
             if execute.lower() == 'y':
-                result = db.execute_query(sql_query)
-                display_results(result)
+                run_and_display(db, sql_query, params, prepared=True if params else None)
                 
                 # Update schema after potential structure changes
-                if sql_query.strip().upper().startswith("CREATE TABLE"):
-                    schema = db.get_schema()
-                    for table, columns in schema.items():
-                        translator.update_schema(table, columns)
-                    print("Schema updated after table creation.")
+                if classify(sql_query).is_ddl:
+                    load_translator_schema(db, translator)
+                    print("Schema updated after the structure change.")
         
         elif choice == "3":
-            print("Adding test data to USERS table...")
-            db.execute_query("INSERT INTO USERS (name) VALUES ('Vansh')")
-            db.execute_query("INSERT INTO USERS (name) VALUES ('Anuj')")
-            db.execute_query("INSERT INTO USERS (name) VALUES ('Arihant')")
-            print("Test data added successfully!")
+            table = input("Table to fill [USERS]: ").strip() or "USERS"
+            try:
+                row_count = int(input("Number of rows [1000]: ").strip() or 1000)
+                seed = int(input("Random seed [0]: ").strip() or 0)
+                print(f"Adding test data to {table} table...")
+                report = generate_table_data(
+                    db,
+                    table,
+                    row_count,
+                    seed=seed,
+                    progress=lambda report: print(
+                        f"\r  {report.rows:,} rows ({report.rows_per_second:,.0f} rows/s)", end="", flush=True
+                    ),
+                )
+                print()
+                print(report)
+                print("Test data added successfully!")
+            except (mysql.connector.Error, ValueError) as err:
+                print(f"\nError adding test data: {err}")
             
         elif choice == "4":
             print("Updating schema information...")
-            schema = db.get_schema()
-            for table, columns in schema.items():
-                translator.update_schema(table, columns)
+            load_translator_schema(db, translator)
             print("Current database schema:")
             for table, columns in translator.get_table_schema().items():
                 print(f"Table: {table}")
@@ -289,10 +738,8 @@ def main():
                     selected_db = databases[db_choice - 1]
                     if db.switch_database(selected_db):
                         # Update schema for the new database
-                        schema = db.get_schema()
-                        translator = SQLTranslator()  # Reset translator
-                        for table, columns in schema.items():
-                            translator.update_schema(table, columns)
+                        translator = SQLTranslator(cache=translator.cache)  # Reset translator, keep its cache
+                        load_translator_schema(db, translator)
                         print(f"Switched to database: {selected_db}")
                         print("Schema updated for the new database.")
                 else:
@@ -301,6 +748,105 @@ def main():
                 print("Please enter a valid number.")
             
         elif choice == "6":
+            table = input("Target table: ").strip()
+            path = input("CSV file path (first row must name the columns): ").strip()
+            batch_size = input(f"Rows per batch [{db.load_batch_size}]: ").strip()
+            try:
+                report = db.load_csv(
+                    table,
+                    path,
+                    batch_size=int(batch_size) if batch_size else None,
+                    progress=lambda report: print(
+                        f"\r  {report.rows:,} rows ({report.rows_per_second:,.0f} rows/s)", end="", flush=True
+                    ),
+                )
+                print()
+                print(report)
+            except (mysql.connector.Error, OSError, ValueError) as err:
+                print(f"\nError loading CSV: {err}")
+
+        elif choice == "7":
+            query = input("Enter SQL query to export: ")
+            export_format = input(f"Format ({', '.join(EXPORT_FORMATS)}) [csv]: ").strip() or "csv"
+            extension = EXPORT_FORMATS.get(export_format, ("",))[0]
+            path = input(f"Output file [export{extension}]: ").strip() or f"export{extension}"
+            try:
+                with open(path, "wb") as output:
+                    report = export_query(
+                        db,
+                        query,
+                        output,
+                        export_format,
+                        progress=lambda report: print(
+                            f"\r  {report.rows:,} rows ({report.rows_per_second:,.0f} rows/s)", end="", flush=True
+                        ),
+                    )
+                print()
+                print(report)
+                print(f"Saved to {path}")
+            except (mysql.connector.Error, OSError, ValueError, RuntimeError) as err:
+                print(f"\nError exporting results: {err}")
+
+        elif choice == "8":
+            default_targets = os.getenv("FANOUT_TARGETS", "")
+            spec = input(f"Databases (comma separated, host[:port]/name, patterns like shard_*) "
+                         f"[{default_targets}]: ").strip() or default_targets
+            targets = parse_targets(spec)
+            if not targets:
+                print("No databases given")
+                continue
+            query = input("Enter SQL query (or nl: followed by a natural language request): ").strip()
+            if query.lower().startswith("nl:"):
+                # The shards share one schema, so the current database's schema drives the translation
+                query, estimate = cost_guard.translate(db, translator, query[3:].strip())
+                print(f"\nGenerated SQL Query:\n{query}")
+                if query.startswith("Error:"):
+                    continue
+                if estimate is not None and estimate.verdict == "block":
+                    print(f"Query blocked by the cost guard: {estimate.summary()}")
+                    continue
+                if estimate is not None and estimate.verdict == "warn":
+                    print(f"Cost warning: {estimate.summary()}")
+            order_by = [column.strip() for column in input(
+                "Merge rows already sorted on column(s) (comma separated, blank to concatenate): "
+            ).split(",") if column.strip()]
+            descending = bool(order_by) and input("Descending order? (y/n) [n]: ").strip().lower() == "y"
+            try:
+                display_fanout(fan_out.run(query, targets, order_by=order_by or None, descending=descending))
+            except (mysql.connector.Error, KeyError) as err:
+                print(f"Error running fan-out: {err}")
+            except KeyboardInterrupt:
+                print("\nQuery cancelled")
+
+        elif choice == "9":
+            path = input("SQL script path: ").strip()
+            transaction_size = input(
+                f"Writes per transaction (0 for one transaction) [{os.getenv('SCRIPT_TRANSACTION_SIZE', 1000)}]: "
+            ).strip()
+            try:
+                with open(path, encoding="utf-8") as script:
+                    report = db.execute_script(
+                        script.read(),
+                        transaction_size=int(transaction_size) if transaction_size else None,
+                        progress=lambda report: print(
+                            f"\r  {report.round_trips:,} round trip(s) "
+                            f"({report.statements_per_second:,.0f} statements/s)", end="", flush=True
+                        ),
+                    )
+                print()
+                print(report)
+                print("Slowest statements:")
+                for statement in report.slowest():
+                    print(f"  #{statement.index + 1} {statement.seconds * 1000:.1f}ms "
+                          f"{statement.as_dict()['sql']}")
+            except (mysql.connector.Error, OSError, ValueError) as err:
+                print(f"\nError running script: {err}")
+            except KeyboardInterrupt:
+                print("\nScript cancelled, open transaction rolled back")
+
+        elif choice == "10":
+            fan_out.close()
+            cost_guard.close()
             db.close()
             print("Goodbye!")
             break
@@ -309,7 +855,7 @@ def main():
             print("Invalid choice. Please try again.")
 
 if __name__ == "__main__":
-    main()
+    main(startup_time="--startup-time" in sys.argv[1:])
 
 
 # database.execute("show databases")
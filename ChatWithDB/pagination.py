@@ -0,0 +1,238 @@
+import datetime
+import decimal
+import re
+
+import mysql.connector
+
+from bulk_load import quote_identifier
+from sql_classifier import classify, parameterize, strip_comments, tokenize
+
+# SELECT <columns> FROM <table> [alias] [WHERE <condition>] and nothing else
+_SIMPLE_SELECT = re.compile(
+    r"^(?P<head>\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+(?P<table>`[^`]+`|\w+)"
+    r"(?:\s+(?:AS\s+)?(?!WHERE\b)(?P<alias>\w+))?)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_NOT_KEYSET_SAFE = re.compile(
+    r"\b(JOIN|UNION|GROUP\s+BY|ORDER\s+BY|LIMIT|HAVING|DISTINCT|INTO|FOR\s+UPDATE|LOCK\s+IN)\b|\(\s*SELECT\b",
+    re.IGNORECASE,
+)
+# Aggregates collapse a SELECT without GROUP BY into one row, so its select list can't become "1"
+_AGGREGATES = frozenset({
+    "COUNT", "SUM", "AVG", "MIN", "MAX", "GROUP_CONCAT", "JSON_ARRAYAGG", "JSON_OBJECTAGG", "BIT_AND",
+    "BIT_OR", "BIT_XOR", "STD", "STDDEV", "STDDEV_POP", "STDDEV_SAMP", "VARIANCE", "VAR_POP", "VAR_SAMP",
+})
+# MySQL's "Duplicate column name": a derived table can't hold two columns of one name (SELECT * ... JOIN)
+_DUPLICATE_COLUMN = 1060
+
+
+def is_pageable(query):
+    """Single SELECT/TABLE statements can take a LIMIT; SHOW, EXPLAIN, ... cannot"""
+    statement = classify(query)
+    return statement.type in ("SELECT", "TABLE") and statement.statement_count == 1 and not statement.locking
+
+
+def sql_literal(value):
+    """Render a Python value as a SQL literal"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return f"'{value.isoformat(sep=' ') if isinstance(value, datetime.datetime) else value.isoformat()}'"
+    if isinstance(value, (bytes, bytearray)):
+        return f"X'{bytes(value).hex()}'"
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def _top_level(tokens):
+    """Yield (index, token) for the tokens outside parentheses"""
+    depth = 0
+    for index, token in enumerate(tokens):
+        if token[0] == "punct" and token[1] == "(":
+            depth += 1
+        elif token[0] == "punct" and token[1] == ")":
+            depth -= 1
+        elif depth == 0:
+            yield index, token
+
+
+def _own_limit(tokens):
+    """(start of the clause, row count, offset) of a query's trailing LIMIT, None without one, False if unreadable"""
+    for index, token in _top_level(tokens):
+        if token[0] == "word" and token[2] == "LIMIT":
+            tail = tokens[index + 1:]
+            texts = [text.upper() for _, text, *_ in tail]
+            if not all(kind == "number" and text.isdigit() for kind, text, *_ in tail[::2]):
+                return False
+            if len(tail) == 1:
+                return token[3], int(texts[0]), 0
+            if len(tail) == 3 and texts[1] == ",":
+                return token[3], int(texts[2]), int(texts[0])
+            if len(tail) == 3 and texts[1] == "OFFSET":
+                return token[3], int(texts[0]), int(texts[2])
+            return False
+    return None
+
+
+class Paginator:
+    """Fetches one page of a SELECT at a time
+
+    Simple single-table SELECTs whose table has a one-column primary key are
+    paged by key (``WHERE key > %s ORDER BY key LIMIT n``, with the last
+    key as the parameter), which costs the same on every page. Everything else is wrapped in
+    ``LIMIT/OFFSET``. The total row count is only computed on request.
+    """
+
+    def __init__(self, db, query, page_size=100, use_cache=True, timeout=None):
+        self.db = db
+        # Comments go, so a trailing "-- note" can't swallow the LIMIT added to each page
+        self.query = strip_comments(query).strip().rstrip(";").strip()
+        self.page_size = page_size
+        self.use_cache = use_cache
+        self.timeout = timeout
+        self.key_column = None
+        self._total = None
+        # page number -> key of the last row on that page
+        self._last_keys = {}
+        self._has_next = {}
+        # False once counting failed; the total then stays unknown
+        self.countable = True
+        self._tokens = tokenize(self.query)
+        self._own_limit = _own_limit(self._tokens)
+        self._plan_keyset()
+
+    @property
+    def mode(self):
+        return "keyset" if self.key_column else "offset"
+
+    def _plan_keyset(self):
+        if len(classify(self.query).tables) != 1:
+            return
+        # The key goes in as a %s parameter, so the query's own literals must be parameters too:
+        # a '%s' inside one of them would be taken for a placeholder
+        template, params = parameterize(self.query)
+        if "%" in template and not params:
+            return
+        match = _SIMPLE_SELECT.match(template)
+        if not match or _NOT_KEYSET_SAFE.search(template):
+            return
+
+        snapshot = self.db.get_schema_snapshot()
+        table = snapshot.get_table(match.group("table").strip("`")) if snapshot else None
+        if table is None or len(table.primary_key) != 1:
+            return
+
+        key = table.primary_key[0]
+        selected = [column.strip().split(".")[-1].strip("`").lower() for column in match.group("columns").split(",")]
+        if "*" not in selected and key.lower() not in selected:
+            return
+
+        self.key_column = key
+        self._params = params
+        self._head = match.group("head").strip()
+        self._where = match.group("where")
+        prefix = match.group("alias") or match.group("table")
+        self._key_sql = f"{prefix}.{quote_identifier(key)}"
+
+    def _page_sql(self, page):
+        """(SQL, params) of one page"""
+        limit = self.page_size + 1
+        if not self.key_column:
+            if self._own_limit is None:
+                return f"{self.query} LIMIT {limit} OFFSET {page * self.page_size}", None
+            if self._own_limit:
+                # Page inside the query's own LIMIT rather than wrap it in a derived table
+                start, count, offset = self._own_limit
+                rows = max(0, min(limit, count - page * self.page_size))
+                return f"{self.query[:start].rstrip()} LIMIT {rows} OFFSET {offset + page * self.page_size}", None
+            # A LIMIT with placeholders or variables: the derived table also keeps MySQL from dropping its ORDER BY
+            return f"SELECT * FROM ({self.query}) AS _page LIMIT {limit} OFFSET {page * self.page_size}", None
+
+        conditions = [f"({self._where})"] if self._where else []
+        params = list(self._params)
+        offset = ""
+        if page > 0:
+            if page - 1 in self._last_keys:
+                conditions.append(f"{self._key_sql} > %s")
+                params.append(self._last_keys[page - 1])
+            else:
+                # Jumped past pages that were never fetched, so there is no key to seek from
+                offset = f" OFFSET {page * self.page_size}"
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"{self._head}{where} ORDER BY {self._key_sql} LIMIT {limit}{offset}", params or None
+
+    def page(self, page):
+        """Return the rows of page `page` (0-based) as a QueryResult"""
+        sql, params = self._page_sql(page)
+        # LIMIT already bounds the page, so the row cap is not applied
+        result = self.db.fetch_all(sql, params, use_cache=self.use_cache, timeout=self.timeout, max_rows=0)
+        self._has_next[page] = len(result) > self.page_size
+        result = result[:self.page_size]
+        if self.key_column and result:
+            self._last_keys[page] = result[len(result) - 1][self._key_index(result)]
+        return result
+
+    def _key_index(self, result):
+        lowered = [column.lower() for column in result.columns]
+        return lowered.index(self.key_column.lower())
+
+    def has_next(self, page):
+        """Whether a page after `page` exists (known once `page` was fetched)"""
+        return self._has_next.get(page, False)
+
+    @property
+    def total(self):
+        """Row count if total_count() already ran, otherwise None"""
+        return self._total
+
+    def _count_sql(self):
+        """COUNT(*) over the query, with its select list replaced by 1 where that keeps the row count
+
+        Besides reading less, this avoids MySQL's "Duplicate column name"
+        error for SELECT * over a join of tables sharing a column name.
+        """
+        tokens = self._tokens
+        count_sql = f"SELECT COUNT(*) FROM ({self.query}) AS _count"
+        if not tokens or tokens[0][2] != "SELECT":
+            return count_sql
+        clauses = {}
+        for index, (kind, _, upper, start, _) in _top_level(tokens):
+            if kind != "word":
+                continue
+            if upper in ("DISTINCT", "DISTINCTROW", "GROUP", "HAVING", "WINDOW", "UNION", "INTERSECT", "EXCEPT"):
+                return count_sql
+            if upper in ("FROM", "ORDER", "LIMIT") and upper not in clauses:
+                clauses[upper] = (index, start)
+        if "FROM" not in clauses:
+            return count_sql
+        select_list = tokens[1:clauses["FROM"][0]]
+        if any(kind == "word" and upper in _AGGREGATES and following[1] == "("
+               for (kind, _, upper, *_), following in zip(select_list, select_list[1:])):
+            return count_sql
+        # ORDER BY may name select list aliases, and never changes the count
+        end = clauses.get("ORDER", clauses.get("LIMIT", (None, len(self.query))))[1]
+        limit = self.query[clauses["LIMIT"][1]:] if "LIMIT" in clauses else ""
+        return f"SELECT COUNT(*) FROM (SELECT 1 {self.query[clauses['FROM'][1]:end].strip()} {limit}) AS _count"
+
+    def total_count(self):
+        """Count every row of the query; run once and remembered. None if the query can't be counted"""
+        if self._total is None and self.countable:
+            try:
+                result = self.db.fetch_all(self._count_sql(), use_cache=self.use_cache, timeout=self.timeout)
+            except mysql.connector.Error as err:
+                if err.errno != _DUPLICATE_COLUMN:
+                    raise
+                # Same-named columns that couldn't be dropped (SELECT DISTINCT * over a join)
+                self.countable = False
+                return None
+            self._total = int(result.rows[0][0]) if result else 0
+        return self._total
+
+    def page_count(self):
+        """Number of pages, or None when the total can't be counted"""
+        total = self.total_count()
+        return None if total is None else max(1, -(-total // self.page_size))
@@ -0,0 +1,256 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import mysql.connector
+
+
+class PoolExhaustedError(mysql.connector.Error):
+    """Raised when no pooled connection becomes free before the timeout"""
+
+
+class PooledConnection:
+    """A pooled MySQL connection that remembers which database it is using"""
+
+    def __init__(self, raw, database=None, statement_cache_size=0, count=None):
+        self.raw = raw
+        self.database = database
+        self.last_used = time.monotonic()
+        self.invalid = False
+        # SQL text -> (the exact string it was prepared from, prepared cursor), least recently used first
+        self.statements = OrderedDict()
+        self.statement_cache_size = statement_cache_size
+        self._count = count or (lambda name: None)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def use(self, database_name):
+        """Point this connection at another database without reconnecting"""
+        if database_name and database_name != self.database:
+            cursor = self.raw.cursor()
+            try:
+                cursor.execute(f"USE `{database_name.replace('`', '``')}`")
+            finally:
+                cursor.close()
+            self.database = database_name
+
+    def execute_prepared(self, statement, params=None):
+        """Execute `statement` as a server-side prepared statement, preparing it on first use
+
+        Prepared statements stay cached per connection (LRU, up to
+        `statement_cache_size`). Returns the cursor; read all of its rows
+        before the connection runs anything else.
+        """
+        entry = self.statements.get(statement)
+        if entry is None:
+            entry = (statement, self.raw.cursor(prepared=True))
+            self.statements[statement] = entry
+            self._count("statements_prepared")
+            while len(self.statements) > max(1, self.statement_cache_size):
+                _, (_, evicted) = self.statements.popitem(last=False)
+                try:
+                    # Deallocates the statement on the server
+                    evicted.close()
+                except mysql.connector.Error:
+                    pass
+        else:
+            self.statements.move_to_end(statement)
+            self._count("statement_cache_hits")
+        # The cursor only skips re-preparing when it gets the identical string object back
+        operation, cursor = entry
+        cursor.execute(operation, params or ())
+        return cursor
+
+    def invalidate(self):
+        """Mark the connection as unusable so the pool discards it on release"""
+        self.invalid = True
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections shared by Database instances"""
+
+    def __init__(self, host=None, user=None, password=None, size=None,
+                 timeout=None, health_check_interval=None, statement_cache_size=None, **connect_args):
+        self.connect_args = {
+            "host": host or os.getenv("DB_HOST", "localhost"),
+            "user": user or os.getenv("DB_USER", "root"),
+            "password": password if password is not None else os.getenv("DB_PASSWORD", "1231"),
+            # Needed for LOAD DATA LOCAL INFILE in bulk_load.load_csv
+            "allow_local_infile": os.getenv("DB_ALLOW_LOCAL_INFILE", "").lower() in ("1", "true", "yes"),
+            **connect_args,
+        }
+        self.size = int(size or os.getenv("DB_POOL_SIZE", 5))
+        self.timeout = float(timeout or os.getenv("DB_POOL_TIMEOUT", 30))
+        # Connections idle for less than this many seconds skip the ping on checkout
+        self.health_check_interval = float(
+            health_check_interval if health_check_interval is not None
+            else os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", 30)
+        )
+        # Prepared statements kept per connection
+        self.statement_cache_size = int(
+            statement_cache_size if statement_cache_size is not None
+            else os.getenv("DB_STATEMENT_CACHE_SIZE", 64)
+        )
+        # Idle connections, most recently used last
+        self._idle = []
+        self._lock = threading.Lock()
+        # Signalled whenever a connection goes back to the pool or one is discarded
+        self._available = threading.Condition(self._lock)
+        self._created = 0
+        self._closed = False
+        self.stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "reconnects": 0,
+            "created": 0,
+            "discarded": 0,
+            "statements_prepared": 0,
+            "statement_cache_hits": 0,
+        }
+
+    def _connect(self):
+        conn = PooledConnection(
+            mysql.connector.connect(**self.connect_args),
+            self.connect_args.get("database"),
+            self.statement_cache_size,
+            self._count,
+        )
+        with self._lock:
+            self.stats["created"] += 1
+        return conn
+
+    def _checkout(self):
+        if self._closed:
+            raise mysql.connector.Error("Connection pool is closed")
+
+        conn = None
+        with self._available:
+            started = None
+            # Wait until a connection is idle or one may be opened (a discard frees a slot too)
+            while not self._idle and self._created >= self.size:
+                if self._closed:
+                    raise mysql.connector.Error("Connection pool is closed")
+                if started is None:
+                    started = time.monotonic()
+                    self.stats["waits"] += 1
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.stats["wait_time"] += time.monotonic() - started
+                    raise PoolExhaustedError(
+                        msg=f"No free connection in pool of {self.size} after {self.timeout}s"
+                    )
+                self._available.wait(remaining)
+            if started is not None:
+                self.stats["wait_time"] += time.monotonic() - started
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._created += 1
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._available:
+                    self._created -= 1
+                    self._available.notify()
+                raise
+
+        try:
+            self._ensure_healthy(conn)
+        except Exception:
+            self._discard(conn)
+            raise
+        with self._lock:
+            self.stats["checkouts"] += 1
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _ensure_healthy(self, conn):
+        """Ping connections that have been idle for a while and reconnect dead ones"""
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return
+        try:
+            conn.raw.ping(reconnect=False)
+        except mysql.connector.Error:
+            conn.raw.reconnect(attempts=3, delay=1)
+            # Prepared statements died with the old session
+            conn.statements.clear()
+            # A fresh session starts without a default database
+            database = conn.database
+            conn.database = None
+            conn.use(database)
+            with self._lock:
+                self.stats["reconnects"] += 1
+
+    def _release(self, conn):
+        if self._closed or conn.invalid:
+            self._discard(conn)
+            return
+        try:
+            # Don't leak an open transaction to the next borrower
+            if conn.raw.in_transaction:
+                conn.raw.rollback()
+        except mysql.connector.Error:
+            self._discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        with self._available:
+            self._idle.append(conn)
+            self._available.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+        with self._available:
+            self._created -= 1
+            self.stats["discarded"] += 1
+            # A caller waiting on a full pool may open a new connection in its place
+            self._available.notify()
+
+    @contextmanager
+    def connection(self, database=None):
+        """Check out a connection, switched to `database` if one is given"""
+        conn = self._checkout()
+        try:
+            conn.use(database)
+            yield conn
+        except (mysql.connector.ProgrammingError, mysql.connector.IntegrityError,
+                mysql.connector.DataError):
+            # Errors reported by the server for one statement leave the session usable
+            raise
+        except BaseException:
+            # The session state is unknown after a failure, so never reuse it
+            conn.invalidate()
+            raise
+        finally:
+            self._release(conn)
+
+    def get_stats(self):
+        """Return a snapshot of pool usage counters for sizing the pool"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = self.size
+            stats["open"] = self._created
+            stats["idle"] = len(self._idle)
+        stats["in_use"] = stats["open"] - stats["idle"]
+        return stats
+
+    def close(self):
+        """Close every idle connection; checked-out ones close on release"""
+        with self._available:
+            self._closed = True
+            closing, self._idle = self._idle, []
+            # Waiting callers give up instead of sitting out the timeout
+            self._available.notify_all()
+        for conn in closing:
+            self._discard(conn)
@@ -0,0 +1,108 @@
+import os
+import re
+import threading
+
+import mysql.connector
+
+# Server errors for a statement stopped by MAX_EXECUTION_TIME or KILL QUERY
+ER_QUERY_TIMEOUT = 3024
+ER_QUERY_INTERRUPTED = 1317
+
+# How long the watchdog waits to open its KILL connection, in seconds
+KILL_CONNECT_TIMEOUT = int(os.getenv("QUERY_KILL_CONNECT_TIMEOUT", 3))
+
+# A top-level SELECT that doesn't already carry optimizer hints
+_HINTABLE_SELECT = re.compile(r"^\s*SELECT\b(?!\s*/\*\+)", re.IGNORECASE)
+
+
+class QueryCancelled(mysql.connector.Error):
+    """Raised when a running statement was stopped with Database.cancel()"""
+
+
+class QueryTimeout(QueryCancelled):
+    """Raised when a statement ran longer than its time limit"""
+
+
+def add_max_execution_time(query, timeout):
+    """Add a MAX_EXECUTION_TIME hint so the server itself stops a slow SELECT
+
+    MySQL only honours the hint on top-level SELECTs; anything else is
+    returned unchanged and relies on the watchdog.
+    """
+    if not timeout:
+        return query
+    milliseconds = max(1, int(timeout * 1000))
+    return _HINTABLE_SELECT.sub(
+        lambda match: f"{match.group(0)} /*+ MAX_EXECUTION_TIME({milliseconds}) */", query, count=1
+    )
+
+
+class QueryWatchdog:
+    """Stops the statement running on one connection with KILL QUERY
+
+    The kill is sent from a separate, short-lived connection (never from the
+    pool, which may be exhausted) after `timeout` seconds or as soon as
+    cancel() is called. Only the statement dies; the session stays open.
+    """
+
+    def __init__(self, connect_args, connection_id, timeout=None):
+        self.connect_args = connect_args
+        self.connection_id = connection_id
+        self.timeout = timeout
+        # "timeout" or "cancelled" once the statement has been killed
+        self.reason = None
+        self._finished = False
+        self._lock = threading.Lock()
+        self._timer = None
+        if timeout:
+            self._timer = threading.Timer(timeout, self._kill, ("timeout",))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        self._kill("cancelled")
+
+    def stop(self):
+        """Disarm the watchdog once the statement is done
+
+        Waits for a KILL already being sent, so it can never hit the next
+        statement run on the same connection; a kill still connecting is
+        dropped.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+        with self._lock:
+            self._finished = True
+
+    def _kill(self, reason):
+        with self._lock:
+            if self._finished or self.reason:
+                return
+            self.reason = reason
+        # Connect outside the lock so stop() never waits on an unreachable server
+        try:
+            conn = mysql.connector.connect(**{**self.connect_args, "connection_timeout": KILL_CONNECT_TIMEOUT})
+        except mysql.connector.Error as err:
+            print(f"Error stopping query on connection {self.connection_id}: {err}")
+            return
+        try:
+            with self._lock:
+                # The statement may have finished while connecting; the next one must survive
+                if self._finished:
+                    return
+                cursor = conn.cursor()
+                cursor.execute(f"KILL QUERY {int(self.connection_id)}")
+                cursor.close()
+        except mysql.connector.Error as err:
+            print(f"Error stopping query on connection {self.connection_id}: {err}")
+        finally:
+            conn.close()
+
+    def translate_error(self, err):
+        """Turn the server's 'interrupted' error into QueryTimeout/QueryCancelled"""
+        if err.errno == ER_QUERY_TIMEOUT or self.reason == "timeout":
+            limit = f"the {self.timeout:g}s" if self.timeout else "its"
+            return QueryTimeout(msg=f"Query exceeded {limit} time limit and was stopped")
+        if self.reason == "cancelled" or err.errno == ER_QUERY_INTERRUPTED:
+            return QueryCancelled(msg="Query was cancelled")
+        return err
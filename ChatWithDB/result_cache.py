@@ -0,0 +1,139 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from sql_classifier import classify
+
+# Quoted strings/identifiers are kept verbatim; only whitespace between tokens is collapsed
+_TOKEN_PATTERN = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"|`[^`]*`|\s+")
+
+
+def normalize_sql(query):
+    """Collapse whitespace outside quotes and drop a trailing semicolon"""
+    normalized = _TOKEN_PATTERN.sub(lambda match: " " if match.group(0).isspace() else match.group(0), query)
+    return normalized.strip().rstrip(";").strip()
+
+
+def referenced_tables(query):
+    """Lower-case names of the tables a statement reads or writes"""
+    return classify(query).tables
+
+
+def qualified_tables(database, tables):
+    """(database, table) pairs; a schema-qualified name (shop.users) names its own database"""
+    pairs = set()
+    for table in tables:
+        schema, _, name = table.lower().rpartition(".")
+        pairs.add((schema or (database or "").lower(), name))
+    return frozenset(pairs)
+
+
+def is_cacheable(query):
+    """Only deterministic, read-only SELECTs are cached"""
+    return classify(query).is_cacheable
+
+
+def estimate_size(result, sample=100):
+    """Approximate memory held by a QueryResult, from a sample of its rows"""
+    rows = result.rows
+    if not rows:
+        return sys.getsizeof(rows)
+    sampled = rows[:sample]
+    row_bytes = sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in sampled)
+    return sys.getsizeof(rows) + row_bytes * len(rows) // len(sampled)
+
+
+class ResultCache:
+    """Memory-bounded LRU/TTL cache of read-only query results
+
+    Entries remember the tables their query referenced, so a write to any
+    of them through Database drops the entry, whichever database it was
+    made from when the names are schema-qualified. Writes made by other clients
+    are only picked up once the TTL expires.
+    """
+
+    def __init__(self, max_bytes=None, ttl=None, max_entry_bytes=None):
+        self.max_bytes = int(max_bytes or float(os.getenv("QUERY_CACHE_MB", 64)) * 1024 * 1024)
+        self.ttl = float(ttl or os.getenv("QUERY_CACHE_TTL", 60))
+        # Bigger results are streamed to the caller but not kept
+        self.max_entry_bytes = int(max_entry_bytes or self.max_bytes // 4)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(database, query, params=None):
+        return (database, normalize_sql(query), repr(params) if params else None)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry["stored_at"] >= self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["result"]
+
+    def put(self, key, result, tables, size=None):
+        size = size if size is not None else estimate_size(result)
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "result": result,
+                "tables": qualified_tables(key[0], tables),
+                "size": size,
+                "stored_at": time.monotonic(),
+            }
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry["size"]
+
+    def invalidate_tables(self, database, tables=None):
+        """Drop entries that read any of `tables`, as named from `database` (all of database's when None)"""
+        written = qualified_tables(database, tables) if tables is not None else None
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if (key[0] == database if written is None else entry["tables"] & written)
+            ]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,108 @@
+class Row:
+    """Read-only, dict-style view over one row of a QueryResult"""
+
+    __slots__ = ("_index", "_values")
+
+    def __init__(self, index, values):
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._values[key]
+        return self._values[self._index[key]]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            return self._values == other._values and list(self._index) == list(other._index)
+        if isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self):
+        return self._values
+
+    def items(self):
+        return zip(self._index, self._values)
+
+    def get(self, key, default=None):
+        position = self._index.get(key)
+        return default if position is None else self._values[position]
+
+
+class QueryResult:
+    """Result set that holds column names once and each row as a plain tuple
+
+    Indexing and iteration hand out Row views, so code written against the
+    old list-of-dicts results (``result[0].keys()``, ``row["name"]``) keeps
+    working without a dict being allocated per row.
+    """
+
+    def __init__(self, columns, rows=None, description=None):
+        self.columns = tuple(columns)
+        self.rows = rows if rows is not None else []
+        # The cursor's description (name, type code, ..., null_ok, flags, charset), when known
+        self.description = description
+        self._index = {name: position for position, name in enumerate(self.columns)}
+        # Set when a row limit stopped the fetch before the last row
+        self.truncated = False
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __iter__(self):
+        index = self._index
+        for values in self.rows:
+            yield Row(index, values)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return QueryResult(self.columns, self.rows[position], self.description)
+        return Row(self._index, self.rows[position])
+
+    def __repr__(self):
+        return f"QueryResult(columns={list(self.columns)}, rows={len(self.rows)})"
+
+    def extend(self, other):
+        """Append the rows of another result with the same columns"""
+        self.rows.extend(other.rows)
+
+    def column(self, name):
+        """Return every value of one column as a list"""
+        position = self._index[name]
+        return [values[position] for values in self.rows]
+
+    def to_columns(self):
+        """Return the result as a dict of column name to list of values"""
+        if not self.rows:
+            return {name: [] for name in self.columns}
+        return {name: list(values) for name, values in zip(self.columns, zip(*self.rows))}
+
+    def to_dicts(self):
+        """Return the result as a list of dicts, one per row"""
+        return [dict(zip(self.columns, values)) for values in self.rows]
+
+    def to_dataframe(self):
+        """Build a pandas DataFrame straight from the row tuples"""
+        import pandas as pd
+
+        # from_records keeps duplicate column names (e.g. from a JOIN) that a dict would merge
+        return pd.DataFrame.from_records(self.rows, columns=self.columns, coerce_float=False)
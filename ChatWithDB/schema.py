@@ -0,0 +1,165 @@
+import time
+
+# One round trip for the whole schema: every column with its type and key,
+# the foreign key it references and each index it belongs to
+SCHEMA_QUERY = """
+    SELECT c.TABLE_NAME, c.COLUMN_NAME, c.COLUMN_TYPE, c.DATA_TYPE, c.IS_NULLABLE,
+           c.COLUMN_KEY, c.COLUMN_DEFAULT, c.EXTRA, c.COLUMN_COMMENT,
+           c.CHARACTER_MAXIMUM_LENGTH,
+           k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME,
+           s.INDEX_NAME, s.NON_UNIQUE, s.SEQ_IN_INDEX
+    FROM information_schema.COLUMNS c
+    LEFT JOIN information_schema.KEY_COLUMN_USAGE k
+        ON k.TABLE_SCHEMA = c.TABLE_SCHEMA
+        AND k.TABLE_NAME = c.TABLE_NAME
+        AND k.COLUMN_NAME = c.COLUMN_NAME
+        AND k.REFERENCED_TABLE_NAME IS NOT NULL
+    LEFT JOIN information_schema.STATISTICS s
+        ON s.TABLE_SCHEMA = c.TABLE_SCHEMA
+        AND s.TABLE_NAME = c.TABLE_NAME
+        AND s.COLUMN_NAME = c.COLUMN_NAME
+    WHERE c.TABLE_SCHEMA = %s
+    ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+# Cheap fingerprint of the column definitions, computed server side.
+# UPDATE_TIME is not used because it also moves on every INSERT/UPDATE.
+SCHEMA_VERSION_QUERY = """
+    SELECT COUNT(*) AS column_count,
+           COALESCE(SUM(CRC32(CONCAT_WS(':', TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, COLUMN_KEY))), 0) AS checksum
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = %s
+"""
+
+
+class ColumnInfo:
+    """One column of a table, as described by information_schema"""
+
+    def __init__(self, name, column_type, data_type, nullable, key, default, extra,
+                 comment="", max_length=None):
+        self.name = name
+        self.column_type = column_type
+        self.data_type = data_type
+        self.nullable = nullable
+        self.key = key
+        self.default = default
+        self.extra = extra
+        self.comment = comment
+        self.max_length = max_length
+        self.references = None
+
+    def __repr__(self):
+        return f"ColumnInfo({self.name!r}, {self.column_type!r})"
+
+    @property
+    def is_auto_increment(self):
+        return "auto_increment" in (self.extra or "").lower()
+
+
+class TableInfo:
+    """Columns, indexes and foreign keys of one table"""
+
+    def __init__(self, name):
+        self.name = name
+        self.columns = {}
+        self.indexes = {}
+        self.foreign_keys = []
+
+    def __repr__(self):
+        return f"TableInfo({self.name!r}, columns={list(self.columns)})"
+
+    @property
+    def column_names(self):
+        return list(self.columns)
+
+    @property
+    def primary_key(self):
+        """Column names of the primary key, in index order"""
+        index = self.indexes.get("PRIMARY")
+        return list(index["columns"]) if index else []
+
+
+class SchemaSnapshot:
+    """Picture of one database's schema at a given version"""
+
+    def __init__(self, database, version, tables):
+        self.database = database
+        self.version = version
+        self.tables = tables
+        self.loaded_at = time.time()
+
+    def __repr__(self):
+        return f"SchemaSnapshot({self.database!r}, tables={len(self.tables)})"
+
+    def column_names(self):
+        """Return {table name (lower case): [column names]} as get_schema always has"""
+        return {name.lower(): table.column_names for name, table in self.tables.items()}
+
+    def get_table(self, name):
+        """Look a table up case-insensitively"""
+        table = self.tables.get(name)
+        if table is None:
+            for table_name, info in self.tables.items():
+                if table_name.lower() == name.lower():
+                    return info
+        return table
+
+
+def fetch_schema_version(cursor, database):
+    """Return a fingerprint that changes whenever a column is added, dropped or retyped"""
+    cursor.execute(SCHEMA_VERSION_QUERY, (database,))
+    row = cursor.fetchone()
+    return (int(row["column_count"]), int(row["checksum"]))
+
+
+def load_schema(cursor, database, version=None):
+    """Load the full schema of `database` with a single information_schema query"""
+    cursor.execute(SCHEMA_QUERY, (database,))
+    tables = {}
+    # (table, index) -> (unique, {column: position in index})
+    index_parts = {}
+    for row in cursor.fetchall():
+        table = tables.get(row["TABLE_NAME"])
+        if table is None:
+            table = tables[row["TABLE_NAME"]] = TableInfo(row["TABLE_NAME"])
+
+        column = table.columns.get(row["COLUMN_NAME"])
+        if column is None:
+            column = table.columns[row["COLUMN_NAME"]] = ColumnInfo(
+                row["COLUMN_NAME"],
+                _text(row["COLUMN_TYPE"]),
+                _text(row["DATA_TYPE"]),
+                row["IS_NULLABLE"] == "YES",
+                row["COLUMN_KEY"],
+                row["COLUMN_DEFAULT"],
+                row["EXTRA"],
+                row["COLUMN_COMMENT"] or "",
+                row["CHARACTER_MAXIMUM_LENGTH"],
+            )
+
+        if row["REFERENCED_TABLE_NAME"] and column.references is None:
+            column.references = (row["REFERENCED_TABLE_NAME"], row["REFERENCED_COLUMN_NAME"])
+            table.foreign_keys.append(
+                (column.name, row["REFERENCED_TABLE_NAME"], row["REFERENCED_COLUMN_NAME"])
+            )
+
+        if row["INDEX_NAME"]:
+            unique, parts = index_parts.setdefault(
+                (table.name, row["INDEX_NAME"]), (not int(row["NON_UNIQUE"]), {})
+            )
+            parts[column.name] = int(row["SEQ_IN_INDEX"])
+
+    for (table_name, index_name), (unique, parts) in index_parts.items():
+        tables[table_name].indexes[index_name] = {
+            "columns": sorted(parts, key=parts.get),
+            "unique": unique,
+        }
+
+    return SchemaSnapshot(database, version, tables)
+
+
+def _text(value):
+    # information_schema returns some columns as bytes on older servers
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode()
+    return value
@@ -0,0 +1,105 @@
+import math
+import re
+from collections import Counter
+
+# Table name tokens count this many times more than column tokens
+TABLE_NAME_WEIGHT = 3
+
+
+def tokenize(text):
+    """Split identifiers and prose into lower-case terms (snake_case and camelCase aware)"""
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text or "")
+    terms = []
+    for word in re.split(r"[^A-Za-z0-9]+", text.lower()):
+        if not word:
+            continue
+        # Cheap plural folding so "users" matches "user" and "categories" matches "category"
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def estimate_tokens(text):
+    """Rough LLM token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+class SchemaIndex:
+    """BM25 index over table names, column names and comments of one schema
+
+    Built once per schema and used to pick the tables worth sending to the
+    LLM for a given question.
+    """
+
+    def __init__(self, table_schema, foreign_keys=None, comments=None, k1=1.5, b=0.75):
+        self.table_schema = table_schema
+        self.foreign_keys = foreign_keys or {}
+        self.k1 = k1
+        self.b = b
+
+        self._docs = {}
+        for table, columns in table_schema.items():
+            terms = tokenize(table) * TABLE_NAME_WEIGHT
+            for column in columns:
+                terms.extend(tokenize(column))
+            terms.extend(tokenize((comments or {}).get(table, "")))
+            self._docs[table] = Counter(terms)
+
+        self._lengths = {table: sum(doc.values()) for table, doc in self._docs.items()}
+        self._avg_length = (sum(self._lengths.values()) / len(self._docs)) if self._docs else 0.0
+        document_frequency = Counter()
+        for doc in self._docs.values():
+            document_frequency.update(doc.keys())
+        total = len(self._docs)
+        self._idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def rank(self, question):
+        """Return (table, score) pairs for tables matching the question, best first"""
+        terms = set(tokenize(question))
+        scores = []
+        for table, doc in self._docs.items():
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[table] / (self._avg_length or 1))
+            for term in terms:
+                frequency = doc.get(term)
+                if frequency:
+                    score += self._idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            if score > 0:
+                scores.append((table, score))
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores
+
+    def select(self, question, top_k=8, token_budget=None, render=None):
+        """Pick the top-k relevant tables plus their foreign key neighbours
+
+        Tables are added in relevance order until `token_budget` (measured on
+        `render(table)`) would be exceeded. When nothing matches the question,
+        tables are taken in schema order instead.
+        """
+        ranked = [table for table, _ in self.rank(question)[:top_k]]
+        if not ranked:
+            ranked = list(self.table_schema)[:top_k]
+
+        candidates = list(ranked)
+        for table in ranked:
+            for neighbour in sorted(self.foreign_keys.get(table, ())):
+                if neighbour in self.table_schema:
+                    candidates.append(neighbour)
+
+        selected = []
+        used_tokens = 0
+        for table in candidates:
+            if table in selected:
+                continue
+            cost = estimate_tokens(render(table)) if render and token_budget else 0
+            if token_budget and selected and used_tokens + cost > token_budget:
+                continue
+            selected.append(table)
+            used_tokens += cost
+        return selected
@@ -0,0 +1,532 @@
+import decimal
+import functools
+import re
+
+# Comments and quoted text are tokens of their own, so keywords inside them never count
+_TOKEN_PATTERN = re.compile(
+    r"(?P<space>\s+)"
+    r"|(?P<comment>--(?=\s|$)[^\n]*|#[^\n]*|/\*.*?(?:\*/|$))"
+    r"|(?P<string>'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\")"
+    r"|(?P<quoted>`(?:[^`]|``)*`)"
+    r"|(?P<variable>@@?(?:[\w.$]+|'[^']*'|`[^`]*`)?)"
+    r"|(?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?(?![\w$])|\.\d+)"
+    r"|(?P<word>[\w$]+)"
+    r"|(?P<punct>.)",
+    re.DOTALL,
+)
+
+DML_STATEMENTS = frozenset({"INSERT", "UPDATE", "DELETE", "REPLACE", "LOAD"})
+DDL_STATEMENTS = frozenset({"CREATE", "ALTER", "DROP", "TRUNCATE", "RENAME"})
+ROW_RETURNING_STATEMENTS = frozenset({
+    "SELECT", "TABLE", "VALUES", "SHOW", "DESCRIBE", "EXPLAIN", "HELP",
+    "ANALYZE", "CHECK", "CHECKSUM", "OPTIMIZE", "REPAIR",
+})
+# Statements that neither change data nor schema; anything unknown (CALL, GRANT, ...) counts as a write
+_READ_ONLY_STATEMENTS = ROW_RETURNING_STATEMENTS | {
+    "USE", "SET", "BEGIN", "START", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "DO", "LOCK", "UNLOCK",
+    "EMPTY",
+}
+
+# Results of these can change without any table being written
+VOLATILE_FUNCTIONS = frozenset({
+    "NOW", "CURDATE", "CURTIME", "CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP", "LOCALTIME",
+    "LOCALTIMESTAMP", "SYSDATE", "UNIX_TIMESTAMP", "UTC_DATE", "UTC_TIME", "UTC_TIMESTAMP", "RAND",
+    "UUID", "UUID_SHORT", "CONNECTION_ID", "LAST_INSERT_ID", "FOUND_ROWS", "ROW_COUNT", "SLEEP",
+    "GET_LOCK", "SQL_NO_CACHE",
+})
+
+# Words that end a table reference, so they are never read as a table name or alias
+_RESERVED = frozenset({
+    "ACCESSIBLE", "ADD", "ALL", "ALTER", "AND", "AS", "ASC", "BETWEEN", "BY", "CASE", "CROSS", "DELETE",
+    "DESC", "DISTINCT", "DUPLICATE", "ELSE", "END", "EXCEPT", "EXISTS", "FOR", "FORCE", "FROM", "FULL",
+    "GROUP", "HAVING", "IF", "IGNORE", "IN", "INDEX", "INNER", "INSERT", "INTERSECT", "INTO", "IS", "JOIN",
+    "KEY", "LATERAL", "LEFT", "LIKE", "LIMIT", "LOCK", "NATURAL", "NOT", "NULL", "OFFSET", "ON", "OR",
+    "ORDER", "OUTER", "PARTITION", "PRIMARY", "REFERENCES", "RETURNING", "RIGHT", "SELECT", "SET",
+    "STRAIGHT_JOIN", "TABLE", "THEN", "TO", "UNION", "UPDATE", "USE", "USING", "VALUE", "VALUES", "WHEN",
+    "WHERE", "WINDOW", "WITH", "OUTFILE", "DUMPFILE",
+})
+# Modifiers that may sit between a keyword and the table name
+_TABLE_MODIFIERS = frozenset({
+    "IF", "NOT", "EXISTS", "LOW_PRIORITY", "HIGH_PRIORITY", "DELAYED", "IGNORE", "QUICK", "TEMPORARY", "ONLY",
+})
+# FROM inside these calls is part of their syntax, e.g. EXTRACT(YEAR FROM created_at)
+_FROM_FUNCTIONS = frozenset({"EXTRACT", "TRIM", "SUBSTRING", "SUBSTR"})
+# Words that end a table reference list; until one of them, a comma starts another reference
+# (FROM a JOIN b ON a.id = b.id, c)
+_END_OF_TABLE_LIST = frozenset({
+    "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "WINDOW", "UNION", "INTERSECT", "EXCEPT", "SET", "FOR",
+    "LOCK", "INTO", "DUPLICATE", "SELECT", "VALUES", "RETURNING",
+})
+
+CLASSIFY_CACHE_SIZE = 4096
+
+# Statements whose literals parameterize() turns into placeholders
+PARAMETERIZABLE_STATEMENTS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE"})
+# A string right after these is a typed or introduced literal (DATE '2024-01-01', X'ff'), not a value
+_LITERAL_PREFIXES = frozenset({"DATE", "TIME", "TIMESTAMP", "X", "B", "N"})
+# Numbers inside these parentheses are lengths and precisions, e.g. CAST(x AS DECIMAL(10, 2))
+_TYPE_WORDS = frozenset({
+    "CHAR", "VARCHAR", "BINARY", "VARBINARY", "DECIMAL", "NUMERIC", "FLOAT", "DOUBLE", "INT", "INTEGER",
+    "BIGINT", "SMALLINT", "TINYINT", "DATETIME", "TIME", "TIMESTAMP",
+})
+_STRING_ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+class Statement:
+    """What a piece of SQL does: type, tables touched and read/write intent
+
+    Instances come from a shared memo cache, so treat them as read-only.
+    For input with several statements the type is the first one's and
+    tables and flags are combined over all of them.
+    """
+
+    def __init__(self, statement_type, tables=frozenset(), write_tables=frozenset(), has_where=False,
+                 volatile=False, locking=False, database=None, statement_count=1):
+        self.type = statement_type
+        self.tables = frozenset(tables)
+        self.write_tables = frozenset(write_tables)
+        self.is_ddl = statement_type in DDL_STATEMENTS
+        self.is_write = statement_type not in _READ_ONLY_STATEMENTS
+        self.returns_rows = statement_type in ROW_RETURNING_STATEMENTS
+        # Only meaningful for UPDATE/DELETE: a WHERE on the statement itself, not in a subquery
+        self.has_where = has_where
+        self.volatile = volatile
+        self.locking = locking
+        # Target of a USE statement
+        self.database = database
+        self.statement_count = statement_count
+
+    def __repr__(self):
+        return (f"Statement(type={self.type!r}, tables={sorted(self.tables)}, "
+                f"write_tables={sorted(self.write_tables)}, is_write={self.is_write})")
+
+    @property
+    def is_cacheable(self):
+        """Deterministic, read-only SELECT whose result only changes when its tables do"""
+        return self.type == "SELECT" and self.statement_count == 1 and not (self.volatile or self.locking)
+
+
+def tokenize(sql, comments=False):
+    """Return (kind, text, upper, start, end) tokens, without whitespace and (unless asked for) comments
+
+    `upper` is the keyword form of a word and the unquoted name of a
+    backtick-quoted identifier.
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(sql):
+        kind = match.lastgroup
+        if kind == "space" or (kind == "comment" and not comments):
+            continue
+        text = match.group()
+        if kind == "word":
+            upper = text.upper()
+        elif kind == "quoted":
+            upper = text[1:-1].replace("``", "`")
+        else:
+            upper = text
+        tokens.append((kind, text, upper, match.start(), match.end()))
+    return tokens
+
+
+def strip_comments(sql):
+    """Replace every comment with a space, except the /*! */ and /*+ */ ones MySQL acts on
+
+    Text appended to the result (a LIMIT clause) can't end up inside a
+    trailing -- or # comment.
+    """
+    pieces = []
+    position = 0
+    for kind, text, _, start, end in tokenize(sql, comments=True):
+        if kind == "comment" and not text.startswith(("/*!", "/*+")):
+            pieces.append(sql[position:start])
+            pieces.append(" ")
+            position = end
+    pieces.append(sql[position:])
+    return "".join(pieces)
+
+
+def _split_tokens(tokens):
+    statements = []
+    current = []
+    depth = 0
+    for token in tokens:
+        if token[0] == "punct":
+            if token[1] == "(":
+                depth += 1
+            elif token[1] == ")":
+                depth = max(0, depth - 1)
+            elif token[1] == ";" and depth == 0:
+                if current:
+                    statements.append(current)
+                current = []
+                continue
+        current.append(token)
+    if current:
+        statements.append(current)
+    return statements
+
+
+def split_statements(sql):
+    """Split SQL text on top-level semicolons, ignoring those in strings and comments"""
+    return [sql[tokens[0][3]:tokens[-1][4]] for tokens in _split_tokens(tokenize(sql))]
+
+
+def complete_statement(sql):
+    """Return the first statement of partial SQL text once a top-level semicolon ends it, else None
+
+    For text still arriving (a streamed LLM answer). A quote left open at
+    the end of `sql` means a semicolon may be inside a string, so the
+    statement isn't complete yet. The statement keeps its semicolon.
+    """
+    start = None
+    depth = 0
+    for token in tokenize(sql):
+        if token[0] == "punct" and token[1] in "'\"`":
+            # The string pattern only matches closed quotes, so this one is still open
+            return None
+        if token[0] == "punct" and token[1] == ";" and depth == 0:
+            if start is not None:
+                return sql[start:token[4]]
+            # Empty statements before the first one are skipped
+            continue
+        if start is None:
+            start = token[3]
+        if token[0] == "punct" and token[1] == "(":
+            depth += 1
+        elif token[0] == "punct" and token[1] == ")":
+            depth = max(0, depth - 1)
+    return None
+
+
+def _is_word(token, *words):
+    return token is not None and token[0] == "word" and token[2] in words
+
+
+def _token(tokens, index):
+    return tokens[index] if index < len(tokens) else None
+
+
+def _skip_parens(tokens, index):
+    """Index just past the parenthesis group that starts at `index`"""
+    depth = 0
+    while index < len(tokens):
+        if tokens[index][1] == "(":
+            depth += 1
+        elif tokens[index][1] == ")":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        index += 1
+    return index
+
+
+def _read_name(tokens, index):
+    """Read `name` or `schema.name`; return (lower-case name, qualifier kept, or None, next index)"""
+    token = _token(tokens, index)
+    if token is None or token[0] not in ("word", "quoted") or (token[0] == "word" and token[2] in _RESERVED):
+        return None, index
+    name = token[2]
+    index += 1
+    while _token(tokens, index) is not None and tokens[index][1] == "." and \
+            _token(tokens, index + 1) is not None and tokens[index + 1][0] in ("word", "quoted"):
+        name = f"{name}.{tokens[index + 1][2]}"
+        index += 2
+    return name.lower(), index
+
+
+def _table_refs(tokens, index, allow_list=True):
+    """Table names of the reference list starting at `index` (FROM a x, b AS y, (SELECT ...) z)"""
+    names = []
+    while True:
+        while _is_word(_token(tokens, index), *_TABLE_MODIFIERS):
+            index += 1
+        token = _token(tokens, index)
+        if token is not None and token[1] == "(":
+            # Derived table; its own FROM is picked up separately
+            index = _skip_parens(tokens, index)
+        else:
+            name, index = _read_name(tokens, index)
+            if name is None:
+                break
+            names.append(name)
+        if not allow_list:
+            break
+        # Optional alias
+        if _is_word(_token(tokens, index), "AS"):
+            index += 2
+        elif _token(tokens, index) is not None and _read_name(tokens, index)[0] is not None:
+            index += 1
+        token = _token(tokens, index)
+        if token is None or token[1] != ",":
+            break
+        index += 1
+    return names
+
+
+def _skip_ctes(tokens, index):
+    """Skip a WITH list; return (index of the main statement keyword, CTE names)"""
+    names = set()
+    if _is_word(_token(tokens, index), "RECURSIVE"):
+        index += 1
+    while index < len(tokens):
+        name, index = _read_name(tokens, index)
+        if name is None:
+            break
+        names.add(name)
+        if _token(tokens, index) is not None and tokens[index][1] == "(":
+            index = _skip_parens(tokens, index)
+        if _is_word(_token(tokens, index), "AS"):
+            index += 1
+        if _token(tokens, index) is not None and tokens[index][1] == "(":
+            index = _skip_parens(tokens, index)
+        if _token(tokens, index) is None or tokens[index][1] != ",":
+            break
+        index += 1
+    return index, names
+
+
+def _classify_tokens(tokens):
+    start = 0
+    # "(SELECT ...) UNION (SELECT ...)"
+    while start < len(tokens) and tokens[start][1] == "(":
+        start += 1
+    first = _token(tokens, start)
+    if first is None:
+        return Statement("EMPTY")
+    if first[0] != "word":
+        return Statement("OTHER")
+
+    statement_type = first[2]
+    cte_names = set()
+    if statement_type == "WITH":
+        start, cte_names = _skip_ctes(tokens, start + 1)
+        while start < len(tokens) and tokens[start][1] == "(":
+            start += 1
+        main = _token(tokens, start)
+        statement_type = main[2] if main is not None and main[0] == "word" else "OTHER"
+    if statement_type == "DESC":
+        statement_type = "DESCRIBE"
+
+    if statement_type == "USE":
+        target = _token(tokens, start + 1)
+        if target is None or target[0] not in ("word", "quoted"):
+            return Statement("USE")
+        return Statement("USE", database=target[1] if target[0] == "word" else target[2])
+
+    tables = []
+    write_tables = []
+    has_where = False
+    volatile = False
+    locking = False
+    depth = 0
+    # Stack of the function names whose parentheses we are inside (None for other parentheses)
+    calls = []
+    # Depths at which a FROM (or UPDATE) table list is still open
+    table_lists = set()
+    # Inside UPDATE's own table list, where every table named can be written
+    update_targets = statement_type == "UPDATE"
+
+    # Write targets that aren't introduced by FROM/JOIN/INTO
+    if statement_type in ("INSERT", "REPLACE"):
+        index = start + 1
+        while _is_word(_token(tokens, index), *_TABLE_MODIFIERS):
+            index += 1
+        if not _is_word(_token(tokens, index), "INTO"):
+            write_tables += _table_refs(tokens, index, allow_list=False)
+    elif statement_type == "UPDATE":
+        write_tables += _table_refs(tokens, start + 1)
+        table_lists.add(0)
+    elif statement_type == "DELETE":
+        targets = _table_refs(tokens, start + 1)
+        if targets:
+            # Multi-table DELETE t1, t2 FROM ...
+            write_tables += targets
+        else:
+            index = start + 1
+            while _is_word(_token(tokens, index), *_TABLE_MODIFIERS):
+                index += 1
+            if _is_word(_token(tokens, index), "FROM"):
+                write_tables += _table_refs(tokens, index + 1)
+    elif statement_type == "RENAME":
+        # RENAME TABLE a TO b, c TO d: every name is a table
+        for token in tokens[start + 1:]:
+            if token[0] == "quoted" or (token[0] == "word" and token[2] not in _RESERVED | {"TABLES"}):
+                write_tables.append(token[2].lower())
+    elif statement_type == "TRUNCATE":
+        index = start + 1
+        if _is_word(_token(tokens, index), "TABLE"):
+            index += 1
+        write_tables += _table_refs(tokens, index, allow_list=False)
+
+    # From the top so tables read inside WITH ... AS (...) are included
+    for index in range(len(tokens)):
+        kind, text, upper = tokens[index][:3]
+        if kind == "punct":
+            if text == "(":
+                previous = tokens[index - 1] if index else None
+                calls.append(previous[2] if previous is not None and previous[0] == "word" else None)
+                depth += 1
+            elif text == ")":
+                if calls:
+                    calls.pop()
+                table_lists.discard(depth)
+                depth = max(0, depth - 1)
+            elif text == "," and depth in table_lists and index > start:
+                names = _table_refs(tokens, index + 1)
+                tables += names
+                if update_targets and depth == 0:
+                    write_tables += names
+            continue
+        if kind == "variable":
+            volatile = True
+            continue
+        if kind != "word":
+            continue
+
+        if upper in _END_OF_TABLE_LIST:
+            table_lists.discard(depth)
+            if depth == 0:
+                update_targets = False
+
+        if upper in VOLATILE_FUNCTIONS:
+            volatile = True
+        elif upper == "WHERE" and depth == 0 and index > start:
+            has_where = True
+        elif upper == "FOR" and _is_word(_token(tokens, index + 1), "UPDATE", "SHARE"):
+            locking = True
+        elif upper == "LOCK" and _is_word(_token(tokens, index + 1), "IN"):
+            locking = True
+        elif upper in ("FROM", "JOIN", "STRAIGHT_JOIN"):
+            if upper == "FROM" and calls and calls[-1] in _FROM_FUNCTIONS:
+                continue
+            names = _table_refs(tokens, index + 1, allow_list=upper == "FROM")
+            tables += names
+            table_lists.add(depth)
+            if update_targets and depth == 0:
+                # UPDATE a JOIN b ...: joined tables are targets too
+                write_tables += names
+        elif upper == "INTO":
+            following = _token(tokens, index + 1)
+            if _is_word(following, "OUTFILE", "DUMPFILE"):
+                volatile = True
+            elif _is_word(following, "TABLE"):
+                # LOAD DATA ... INTO TABLE t
+                write_tables += _table_refs(tokens, index + 2, allow_list=False)
+            elif following is not None and following[0] == "variable":
+                volatile = True
+            elif statement_type != "SELECT":
+                write_tables += _table_refs(tokens, index + 1, allow_list=False)
+        elif upper == "TABLE" and statement_type in ("CREATE", "ALTER", "DROP", "TRUNCATE", "TABLE"):
+            names = _table_refs(tokens, index + 1, allow_list=statement_type == "DROP")
+            (tables if statement_type == "TABLE" else write_tables).extend(names)
+        elif upper == "ON" and statement_type in ("CREATE", "DROP") and \
+                any(_is_word(token, "INDEX") for token in tokens[start:index]):
+            write_tables += _table_refs(tokens, index + 1, allow_list=False)
+
+    names = {name for name in tables + write_tables if name not in cte_names and name != "dual"}
+    if statement_type in _READ_ONLY_STATEMENTS:
+        write_tables = ()
+    return Statement(
+        statement_type,
+        tables=names,
+        write_tables={name for name in write_tables if name in names},
+        has_where=has_where,
+        volatile=volatile,
+        locking=locking,
+    )
+
+
+@functools.lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def classify(sql):
+    """Classify SQL text; results are memoized, so repeated queries cost a dict lookup"""
+    parts = [_classify_tokens(tokens) for tokens in _split_tokens(tokenize(sql))]
+    if not parts:
+        return Statement("EMPTY")
+    if len(parts) == 1:
+        return parts[0]
+
+    first = parts[0]
+    combined = Statement(
+        first.type,
+        tables=frozenset().union(*(part.tables for part in parts)),
+        write_tables=frozenset().union(*(part.write_tables for part in parts)),
+        has_where=first.has_where,
+        volatile=any(part.volatile for part in parts),
+        locking=any(part.locking for part in parts),
+        database=first.database,
+        statement_count=len(parts),
+    )
+    combined.is_write = any(part.is_write for part in parts)
+    combined.is_ddl = any(part.is_ddl for part in parts)
+    return combined
+
+
+def _string_value(text):
+    """Python value of a quoted SQL string literal"""
+    quote = text[0]
+    body = text[1:-1].replace(quote * 2, quote)
+    # \% and \_ keep their backslash (they only matter to LIKE)
+    return re.sub(r"\\(.)", lambda match: _STRING_ESCAPES.get(
+        match.group(1), "\\" + match.group(1) if match.group(1) in "%_" else match.group(1)
+    ), body, flags=re.DOTALL)
+
+
+@functools.lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def _parameterize(sql):
+    statement = classify(sql)
+    if statement.type not in PARAMETERIZABLE_STATEMENTS or statement.statement_count != 1:
+        return sql, ()
+    tokens = tokenize(sql)
+    # A bare % (modulo) would be taken for a placeholder by the connector
+    if any(token[0] == "punct" and token[1] == "%" for token in tokens):
+        return sql, ()
+
+    pieces = []
+    params = []
+    position = 0
+    calls = []
+    in_order_by = False
+    for index, (kind, text, upper, start, end) in enumerate(tokens):
+        previous = tokens[index - 1] if index else None
+        if kind == "punct":
+            if text == "(":
+                calls.append(previous[2] if previous is not None and previous[0] == "word" else None)
+            elif text == ")" and calls:
+                calls.pop()
+            continue
+        if kind == "word":
+            if upper == "BY" and _is_word(previous, "ORDER", "GROUP"):
+                in_order_by = True
+            elif upper in ("LIMIT", "HAVING", "WINDOW", "UNION", "FOR", "WITH", "SELECT"):
+                in_order_by = False
+            continue
+
+        if kind == "string":
+            if previous is not None and previous[0] == "word" and (
+                    previous[2] in _LITERAL_PREFIXES or previous[2].startswith("_")):
+                continue
+            value = _string_value(text)
+        elif kind == "number":
+            # ORDER BY 2 means "the second column", not the value 2
+            if in_order_by or (calls and calls[-1] in _TYPE_WORDS):
+                continue
+            value = int(text) if text.isdigit() else decimal.Decimal(text)
+        else:
+            continue
+        pieces.append(sql[position:start])
+        pieces.append("%s")
+        params.append(value)
+        position = end
+    pieces.append(sql[position:])
+    return "".join(pieces), tuple(params)
+
+
+def parameterize(sql):
+    """Replace the literals of a DML statement with %s placeholders
+
+    Returns (template, params). Statements that only differ in their
+    constants share one template, and so one prepared statement. Anything
+    that can't be safely rewritten comes back unchanged with no params.
+    """
+    template, params = _parameterize(sql)
+    return template, list(params)
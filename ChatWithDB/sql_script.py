@@ -0,0 +1,289 @@
+import os
+import re
+import time
+
+import mysql.connector
+
+from sql_classifier import classify, tokenize
+
+# mysql client command that changes the statement separator (for procedure and trigger bodies)
+_DELIMITER_LINE = re.compile(r"^[ \t]*DELIMITER[ \t]+(\S+)[ \t]*$", re.IGNORECASE | re.MULTILINE)
+# Statements that end the open transaction on their own
+_TRANSACTION_ENDS = ("COMMIT", "BEGIN", "START")
+
+
+def split_script(sql):
+    """Split a SQL script into its statements
+
+    Separators inside strings, comments and parentheses don't count.
+    DELIMITER lines switch the separator the way the mysql client does
+    (but not inside a string or comment), and /*! ... */ version comments
+    are kept as statements, since mysqldump wraps SET statements (like
+    FOREIGN_KEY_CHECKS=0) in them.
+    """
+    masked = _masked(sql)
+    statements = []
+    delimiter = ";"
+    position = 0
+    for match in _DELIMITER_LINE.finditer(masked):
+        statements.extend(_split_region(sql, masked, position, match.start(), delimiter))
+        delimiter = sql[match.start(1):match.end(1)]
+        position = match.end()
+    statements.extend(_split_region(sql, masked, position, len(sql), delimiter))
+    return statements
+
+
+def _masked(sql):
+    """`sql` with strings and quoted names masked and comments (except /*! ... */) blanked out
+
+    The text keeps its length and line breaks, so positions in it are
+    positions in `sql`; only real separators and DELIMITER lines are left.
+    """
+    masked = list(sql)
+    for kind, text, _, start, end in tokenize(sql, comments=True):
+        if kind in ("string", "quoted"):
+            masked[start:end] = "x" * (end - start)
+        elif kind == "comment" and not text.startswith("/*!"):
+            masked[start:end] = [" " if char != "\n" else char for char in sql[start:end]]
+    return "".join(masked)
+
+
+def _split_region(sql, masked, region_start, region_end, delimiter):
+    """Statements of sql[region_start:region_end], separated by `delimiter`"""
+    statements = []
+    start, depth = region_start, 0
+    # Delimiters like $$ or // can be glued to a word (END$$) and span several tokens
+    for match in re.compile(re.escape(delimiter) + r"|[()]").finditer(masked, region_start, region_end):
+        if match.group() == "(":
+            depth += 1
+        elif match.group() == ")":
+            depth = max(0, depth - 1)
+        elif delimiter != ";" or depth == 0:
+            statements.append((start, match.start()))
+            start = match.end()
+    statements.append((start, region_end))
+    # Trim surrounding whitespace and comments, and drop what is left empty
+    return [
+        sql[start + len(masked[start:end]) - len(masked[start:end].lstrip()):
+            start + len(masked[start:end].rstrip())]
+        for start, end in statements if masked[start:end].strip()
+    ]
+
+
+class StatementReport:
+    """What happened to one statement of a script"""
+
+    def __init__(self, index, sql):
+        self.index = index
+        self.sql = sql
+        self.type = classify(sql).type
+        # "pending", then "committed", "rolled back", "failed" or "skipped"; reads count as committed
+        self.status = "pending"
+        self.rows = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        statement = " ".join(self.sql.split())
+        return {
+            "statement": self.index + 1,
+            "sql": statement if len(statement) <= 100 else statement[:97] + "...",
+            "type": self.type,
+            "rows": self.rows,
+            "ms": round(self.seconds * 1000, 3),
+            "status": self.status,
+        }
+
+
+class ScriptReport:
+    """Progress and outcome of one script run"""
+
+    def __init__(self, statements):
+        self.statements = statements
+        self.round_trips = 0
+        self.commits = 0
+        self.error = None
+        self.failed = None
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def __str__(self):
+        done = sum(statement.status == "committed" for statement in self.statements)
+        text = (f"{done}/{len(self.statements)} statement(s) committed in {self.round_trips} round trip(s) "
+                f"and {self.commits} transaction(s), {self.seconds:.2f}s "
+                f"({self.statements_per_second:,.0f} statements/s)")
+        if self.failed is not None:
+            rolled_back = sum(statement.status == "rolled back" for statement in self.statements)
+            text += (f"; statement {self.failed.index + 1} failed: {self.error}"
+                     f" ({rolled_back} rolled back)")
+        return text
+
+    @property
+    def statements_per_second(self):
+        executed = sum(statement.status in ("committed", "rolled back") for statement in self.statements)
+        return executed / self.seconds if self.seconds else 0.0
+
+    def slowest(self, count=5):
+        return sorted(self.statements, key=lambda statement: statement.seconds, reverse=True)[:count]
+
+
+def plan_batches(statements, batch_size, batch_bytes, transaction_size):
+    """Group StatementReports into (batch, commit after it) round trips
+
+    A batch holds up to `batch_size` statements and about `batch_bytes`
+    of SQL, and never runs past the point where the open transaction
+    reaches `transaction_size` writes (0: one transaction for everything).
+    Statements whose text contains a semicolon (procedure bodies) go alone,
+    since joining them with semicolons would change their meaning.
+    """
+    batch, size, writes = [], 0, 0
+    for statement in statements:
+        alone = ";" in statement.sql
+        if batch and (alone or len(batch) >= batch_size or size + len(statement.sql) > batch_bytes):
+            yield batch, False
+            batch, size = [], 0
+        batch.append(statement)
+        size += len(statement.sql) + 1
+        if statement.type in _TRANSACTION_ENDS:
+            writes = 0
+        elif classify(statement.sql).is_write:
+            writes += 1
+        end_transaction = bool(transaction_size) and writes >= transaction_size
+        if alone or end_transaction:
+            yield batch, end_transaction
+            batch, size = [], 0
+            if end_transaction:
+                writes = 0
+    if batch:
+        yield batch, False
+
+
+def run_script(db, sql, transaction_size=None, batch_size=None, batch_bytes=None, timeout=None, progress=None):
+    """Run every statement of a script, several per round trip, committing every `transaction_size` writes
+
+    `sql` is script text or a list of statements. Statements are sent as
+    multi-statement batches on one connection. A failing statement stops
+    the script: the open transaction is rolled back and the statements
+    after it are skipped (DDL commits implicitly in MySQL, so writes before
+    a CREATE/ALTER/DROP stay committed). Per-statement times of a batch
+    are the gaps between the arrival of consecutive results.
+    """
+    transaction_size = int(
+        transaction_size if transaction_size is not None else os.getenv("SCRIPT_TRANSACTION_SIZE", 1000)
+    )
+    batch_size = max(1, int(batch_size or os.getenv("SCRIPT_BATCH_SIZE", 100)))
+    batch_bytes = int(batch_bytes or os.getenv("SCRIPT_BATCH_BYTES", 1024 * 1024))
+    statements = split_script(sql) if isinstance(sql, str) else list(sql)
+    report = ScriptReport([StatementReport(index, statement) for index, statement in enumerate(statements)])
+    run = _ScriptRun(report)
+    try:
+        with db.raw_cursor(dictionary=False) as (conn, cursor), db.time_limit(conn, timeout):
+            try:
+                for batch, commit in plan_batches(report.statements, batch_size, batch_bytes, transaction_size):
+                    if not run.execute(conn, cursor, batch):
+                        break
+                    if commit:
+                        run.commit(conn)
+                    report.seconds = time.perf_counter() - report.started
+                    if progress:
+                        progress(report)
+                else:
+                    run.commit(conn)
+            except BaseException:
+                # Ctrl+C or Database.cancel(): don't hand the connection back mid-transaction
+                run.roll_back(conn)
+                raise
+    finally:
+        for statement in report.statements:
+            if statement.status == "pending":
+                statement.status = "skipped"
+        report.seconds = time.perf_counter() - report.started
+        if run.ddl:
+            # USE can move the script to other databases; DDL may have changed any of them
+            for database_name in run.databases | {db.database}:
+                db.invalidate_schema(database_name)
+                db.invalidate_cached_results(database=database_name)
+        elif run.written_tables:
+            db.invalidate_cached_results(run.written_tables)
+    return report
+
+
+class _ScriptRun:
+    """Transaction bookkeeping of one run_script call"""
+
+    def __init__(self, report):
+        self.report = report
+        # Statements run since the last commit, explicit or implicit
+        self.uncommitted = []
+        # Schema-qualified (db.table), with the database current at each write
+        self.written_tables = set()
+        # Databases the script's statements ran in
+        self.databases = set()
+        self.ddl = False
+
+    def execute(self, conn, cursor, batch):
+        """Send one batch; False if a statement failed (the transaction is then rolled back)"""
+        position = 0
+        last = time.perf_counter()
+        try:
+            if len(batch) == 1:
+                cursor.execute(batch[0].sql)
+                results = [cursor]
+            else:
+                results = cursor.execute(";\n".join(statement.sql for statement in batch), multi=True)
+            self.report.round_trips += 1
+            for result in results:
+                statement = batch[position]
+                statement.rows = len(result.fetchall()) if result.with_rows else max(result.rowcount, 0)
+                now = time.perf_counter()
+                statement.seconds, last = now - last, now
+                position += 1
+                self._finished(conn, statement)
+        except mysql.connector.Error as err:
+            self.report.failed = batch[position]
+            self.report.failed.status = "failed"
+            self.report.failed.seconds = time.perf_counter() - last
+            self.report.error = str(err)
+            self.roll_back(conn)
+            return False
+        return True
+
+    def _finished(self, conn, statement):
+        classified = classify(statement.sql)
+        if conn.database:
+            self.databases.add(conn.database)
+        self.written_tables.update(
+            table if "." in table or not conn.database else f"{conn.database}.{table}"
+            for table in classified.write_tables
+        )
+        self.ddl = self.ddl or classified.is_ddl
+        if statement.type == "USE":
+            # Keeps the pool's idea of the connection's database right
+            conn.database = classified.database
+        if statement.type == "ROLLBACK":
+            self._settle("rolled back")
+            statement.status = "rolled back"
+        elif classified.is_ddl or statement.type in _TRANSACTION_ENDS:
+            # Ends the open transaction, committing everything before it
+            self.uncommitted.append(statement)
+            self._settle("committed")
+        else:
+            self.uncommitted.append(statement)
+
+    def _settle(self, status):
+        for statement in self.uncommitted:
+            statement.status = status
+        self.uncommitted = []
+
+    def commit(self, conn):
+        conn.commit()
+        if self.uncommitted:
+            self.report.commits += 1
+        self._settle("committed")
+
+    def roll_back(self, conn):
+        try:
+            conn.rollback()
+        except mysql.connector.Error:
+            # Rolled back by the server when the connection goes
+            conn.invalidate()
+        self._settle("rolled back")
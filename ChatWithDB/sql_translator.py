@@ -1,29 +1,312 @@
+import asyncio
 import os
+import random
 import re
-from groq import Groq
+import threading
+import time
+import instrumentation
+from fast_path import FastPath
+from schema_retrieval import SchemaIndex
+from sql_classifier import classify, complete_statement, tokenize
+from translation_cache import TranslationCache, normalize_question, schema_hash
+
+# Statement types rejected as soon as their first word arrives in a streamed answer
+_UNSAFE_TYPES = ("DROP", "TRUNCATE", "ALTER", "RENAME")
+# A blank line, then a line starting with a word no SQL clause starts with: the model is explaining
+_PROSE_AFTER_BLANK_LINE = re.compile(r"\n[ \t]*\n[ \t]*([A-Za-z]+)\b(?=\W)")
+_SQL_LINE_STARTS = frozenset({
+    "SELECT", "FROM", "WHERE", "AND", "OR", "NOT", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER",
+    "CROSS", "STRAIGHT_JOIN", "NATURAL", "ON", "USING", "GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET",
+    "UNION", "INTERSECT", "EXCEPT", "WITH", "AS", "CASE", "WHEN", "THEN", "ELSE", "END", "IN", "EXISTS",
+    "BETWEEN", "LIKE", "IS", "INSERT", "INTO", "VALUES", "VALUE", "UPDATE", "SET", "DELETE", "REPLACE",
+    "WINDOW", "PARTITION", "OVER", "FOR", "LOCK", "DISTINCT", "ALL", "ANY", "ASC", "DESC", "TABLE",
+})
+
+
+def _sql_from_stream(text, finished=False):
+    """(SQL, complete) from the text of a streamed answer so far
+
+    The statement is complete at a top-level semicolon, at the fence
+    closing a ```sql block, or where prose starts after a blank line, and
+    otherwise when the stream has `finished`.
+    """
+    body = text.lstrip()
+    fenced = body.startswith("```")
+    if fenced:
+        if "\n" not in body:
+            # Still reading the ```sql line
+            return None, finished
+        body = body.split("\n", 1)[1]
+        if "```" in body:
+            return body.split("```", 1)[0].strip(), True
+
+    statement = complete_statement(body)
+    if statement is not None:
+        return statement, True
+    for prose in _PROSE_AFTER_BLANK_LINE.finditer(body):
+        if prose.group(1).upper() not in _SQL_LINE_STARTS:
+            return body[:prose.start()].strip(), True
+    return body.strip(), finished
+
+
+class _StatementStream:
+    """Collects the chunks of a streamed answer until they hold one statement
+
+    feed() says when to stop reading, finish() returns the statement and
+    record() puts the timings on the trace, whichever way the stream ended.
+    """
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.started = time.perf_counter()
+        self.text = ""
+        self.sql = None
+        self.complete = False
+        # The statement's first word is DROP/TRUNCATE/ALTER/RENAME
+        self.rejected = False
+        self.chunks = 0
+        self.seconds = None
+
+    def feed(self, chunk):
+        """Add one streamed chunk; True once no more of the answer is needed"""
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if not delta:
+            return False
+        if not self.text:
+            self.trace.add("llm_first_token", time.perf_counter() - self.started)
+        self.text += delta
+        self.chunks += 1
+        self.sql, self.complete = _sql_from_stream(self.text)
+        # The first word decides the statement type once whitespace (or more) follows it
+        tokens = tokenize(self.sql) if self.sql else []
+        if len(tokens) > 1 or (tokens and self.text[-1].isspace()):
+            if tokens[0][2] in _UNSAFE_TYPES:
+                # Rejected by the safety check; no need to hear the rest
+                self.rejected = True
+                return True
+        return self.complete
+
+    def finish(self):
+        """The statement read so far, cut from the whole answer if the stream ran out first"""
+        if not self.complete and not self.rejected:
+            self.sql, _ = _sql_from_stream(self.text, finished=True)
+        self.seconds = time.perf_counter() - self.started
+        return self.sql
+
+    def record(self):
+        seconds = self.seconds if self.seconds is not None else time.perf_counter() - self.started
+        self.trace.add("time_to_sql", seconds)
+        self.trace.set(stopped_early=self.complete or self.rejected, chunks=self.chunks)
+
 
 class SQLTranslator:
-    def __init__(self):
+    def __init__(self, cache=None, parameterize=None, client=None, client_factory=None):
         self.table_schema = {
             "users": ["id", "name"],
             # Add other tables and their columns here as you create them
         }
         
-        # Initialize Groq client
-        self.groq_client = Groq(
-            api_key=os.environ.get("GROQ_API_KEY"),
+        # Groq client, created on the first LLM call (importing groq alone takes about half a
+        # second). Pass one in, or a function returning one, to share its HTTP connections
+        # between translators
+        self._groq_client = client
+        self._client_factory = client_factory
+        self._client_lock = threading.Lock()
+        # Created on the first async call. GROQ_BASE_URL points both clients at another
+        # endpoint, e.g. the local stub in llm_stub.py
+        self.async_groq_client = None
+        self._async_client_loop = None
+
+        # Concurrency and retry policy for translate_many
+        self.concurrency = int(os.getenv("TRANSLATE_CONCURRENCY", 8))
+        self.max_retries = int(os.getenv("TRANSLATE_MAX_RETRIES", 5))
+        self.retry_base_delay = float(os.getenv("TRANSLATE_RETRY_BASE_DELAY", 0.5))
+        self._rate_limited_until = 0.0
+
+        # Pass a cache in to keep it across translator resets
+        self.cache = cache if cache is not None else TranslationCache()
+
+        # Callers run generated SQL as a prepared template with its literals as params
+        self.parameterize = (
+            parameterize if parameterize is not None
+            else os.getenv("TRANSLATE_PARAMETERIZE", "").lower() in ("1", "true", "yes")
         )
+
+        # table -> {column: "referenced_table.column"}, and table -> column comments
+        self.references = {}
+        self.table_comments = {}
+        # lower-case table name -> name as MySQL spells it
+        self.table_names = {}
+
+        # Simple requests ("count orders", "show users where ...") are answered without the LLM
+        self.fast_path_enabled = os.getenv("TRANSLATE_FAST_PATH", "true").lower() in ("1", "true", "yes")
+        self._fast_path = None
+        # Which tier answered this thread's last request: "fast_path", "cache", "llm" or "error"
+        self._last = threading.local()
+
+        # Read the LLM's answer as a token stream and stop at the end of the first statement
+        self.stream = os.getenv("TRANSLATE_STREAM", "true").lower() in ("1", "true", "yes")
+
+        # Schemas with more tables than this only send the most relevant ones
+        self.schema_top_k = int(os.getenv("SCHEMA_CONTEXT_TOP_K", 8))
+        self.schema_token_budget = int(os.getenv("SCHEMA_CONTEXT_TOKEN_BUDGET", 2000))
+        self._schema_index = None
+        self._schema_hash = None
         
-    def translate(self, natural_language_query):
-        """Convert natural language query to SQL using Groq LLM"""
-        try:
-            # Create a prompt with context about the database schema
-            schema_context = self._get_schema_context()
-            
-            if not schema_context:
-                return "Error: No schema information available. Please ensure you have selected a database and it contains tables."
-            
-            prompt = f"""
+    def translate(self, natural_language_query, on_sql=None):
+        """Convert natural language query to SQL using Groq LLM
+
+        Simple requests are answered by the local fast path first; last_tier
+        tells which tier produced the result. When the answer is streamed,
+        `on_sql(sql)` is called as soon as a complete, safe statement has
+        arrived, so the caller can start on it (e.g. EXPLAIN) while the
+        stream is closed and the translation cached.
+        """
+        with instrumentation.trace("translate", question=natural_language_query) as trace:
+            try:
+                with trace.stage("fast_path"):
+                    fast = self._match_fast_path(natural_language_query)
+                if fast is not None:
+                    return self._traced_result(trace, fast.sql, "fast_path")
+
+                with trace.stage("prompt_build"):
+                    prompt, context_hash, early_result = self._prepare_request(natural_language_query)
+                if early_result is not None:
+                    return self._traced_result(trace, early_result, "cache")
+
+                with trace.stage("llm_call"):
+                    sql_query = self._generate(prompt, trace, on_sql)
+                return self._traced_result(
+                    trace, self._accept(natural_language_query, context_hash, sql_query), "llm"
+                )
+                
+            except Exception as e:
+                return self._traced_result(trace, f"Error: Failed to generate SQL query: {str(e)}", "error")
+
+    async def translate_async(self, natural_language_query):
+        """Async version of translate that backs off and retries when rate limited
+
+        Answers are streamed and cut off at the end of the first statement,
+        as in translate().
+        """
+        with instrumentation.trace("translate", question=natural_language_query) as trace:
+            try:
+                with trace.stage("fast_path"):
+                    fast = self._match_fast_path(natural_language_query)
+                if fast is not None:
+                    return self._traced_result(trace, fast.sql, "fast_path")
+
+                with trace.stage("prompt_build"):
+                    prompt, context_hash, early_result = self._prepare_request(natural_language_query)
+                if early_result is not None:
+                    return self._traced_result(trace, early_result, "cache")
+
+                with trace.stage("llm_call"):
+                    if self.stream:
+                        sql_query = await self._stream_sql_async(prompt, trace)
+                        result = self._accept(natural_language_query, context_hash, sql_query)
+                    else:
+                        chat_completion = await self._create_with_retry(self._completion_args(prompt))
+                        result = self._finish(natural_language_query, context_hash, chat_completion)
+                return self._traced_result(trace, result, "llm")
+
+            except Exception as e:
+                return self._traced_result(trace, f"Error: Failed to generate SQL query: {str(e)}", "error")
+
+    @property
+    def groq_client(self):
+        """Groq client, created (and groq imported) the first time the LLM is needed"""
+        if self._groq_client is None:
+            with self._client_lock:
+                if self._groq_client is None and self._client_factory is not None:
+                    self._groq_client = self._client_factory()
+                elif self._groq_client is None:
+                    from groq import Groq
+
+                    self._groq_client = Groq(
+                        api_key=os.environ.get("GROQ_API_KEY"),
+                    )
+        return self._groq_client
+
+    @property
+    def last_tier(self):
+        """Tier that answered the last translate() call made from this thread"""
+        return getattr(self._last, "tier", None)
+
+    def _traced_result(self, trace, result, tier):
+        """Note which tier answered (on the trace and in last_tier) and pass the result through"""
+        if result.startswith("Error:"):
+            tier = "error"
+            trace.set(error=result)
+        self._last.tier = tier
+        trace.set(tier=tier)
+        return result
+
+    def _match_fast_path(self, natural_language_query):
+        if not self.fast_path_enabled:
+            return None
+        if self._fast_path is None:
+            self._fast_path = FastPath(self.table_schema, self.table_names)
+        return self._fast_path.translate(natural_language_query)
+
+    async def translate_many_async(self, natural_language_queries, concurrency=None):
+        """Translate many requests concurrently; results keep the input order"""
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+        # Identical questions in one batch share a single LLM call
+        pending = {}
+
+        async def run(query):
+            async with semaphore:
+                return await self.translate_async(query)
+
+        tasks = []
+        for query in natural_language_queries:
+            key = normalize_question(query)
+            if key not in pending:
+                pending[key] = asyncio.ensure_future(run(query))
+            tasks.append(pending[key])
+        return list(await asyncio.gather(*tasks))
+
+    def translate_many(self, natural_language_queries, concurrency=None):
+        """Blocking wrapper around translate_many_async for scripts and batch jobs"""
+        return asyncio.run(self.translate_many_async(natural_language_queries, concurrency))
+
+    def _prepare_request(self, natural_language_query):
+        """Return (prompt, schema hash, early result); early result is set on cache hits and errors"""
+        # Create a prompt with context about the relevant part of the database schema
+        schema_context = self._get_schema_context(natural_language_query)
+        
+        if not schema_context:
+            return None, None, "Error: No schema information available. Please ensure you have selected a database and it contains tables."
+
+        # Repeated questions against the same schema skip the LLM
+        context_hash = self._get_schema_hash()
+        cached_query = self.cache.get(natural_language_query, context_hash)
+        if cached_query is not None:
+            return None, context_hash, cached_query
+        
+        prompt = self._build_prompt(schema_context, natural_language_query)
+        
+        # Get response from Groq
+        if not os.environ.get("GROQ_API_KEY"):
+            return None, context_hash, "Error: GROQ_API_KEY environment variable is not set. Please set it in your .env file."
+
+        return prompt, context_hash, None
+
+    def _build_prompt(self, schema_context, natural_language_query, previous_query=None, feedback=None):
+        """Prompt text; with a previous query and plan feedback it asks for a cheaper rewrite"""
+        revision = ""
+        if previous_query:
+            revision = f"""
+PREVIOUS QUERY:
+{previous_query}
+
+The database's query plan for the previous query is too expensive:
+{feedback}
+Write a query that answers the same request but reads far fewer rows: filter and join on indexed columns,
+never join tables without a join condition, and LIMIT the result.
+"""
+        return f"""
 You are a helpful and secure SQL assistant. Your task is to convert natural language into safe and correct MySQL queries that follow standard CRUD patterns.
 
 DATABASE SCHEMA:
@@ -39,75 +322,240 @@ RULES:
 - Use the exact table and column names as shown in the schema
 
 USER REQUEST: {natural_language_query}
-
+{revision}
 SQL QUERY:
 """
-            
-            # Get response from Groq
-            if not os.environ.get("GROQ_API_KEY"):
-                return "Error: GROQ_API_KEY environment variable is not set. Please set it in your .env file."
-                
-            chat_completion = self.groq_client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
-                temperature=0.1,  # Low temperature for more deterministic output
-                max_tokens=200,   # Limit response length
-            )
-            
-            sql_query = chat_completion.choices[0].message.content.strip()
-            
-            # Validate the SQL query for safety
-            if self._is_unsafe_query(sql_query):
-                return "Error: Generated query contains unsafe operations. Please rephrase your request."
-            
-            return sql_query
-            
+
+    def revise(self, natural_language_query, previous_query, feedback):
+        """Ask for a cheaper query given the cost problems EXPLAIN found in `previous_query`
+
+        The result is safety-checked but not cached; use remember() to keep it.
+        """
+        try:
+            schema_context = self._get_schema_context(natural_language_query)
+            if not schema_context:
+                return "Error: No schema information available. Please ensure you have selected a database and it contains tables."
+            prompt = self._build_prompt(schema_context, natural_language_query, previous_query, feedback)
+            return self._accept(natural_language_query, None, self._generate(prompt), cache=False)
+
         except Exception as e:
-            return f"Error: Failed to generate SQL query: {str(e)}"
+            return f"Error: Failed to revise SQL query: {str(e)}"
+
+    def remember(self, natural_language_query, sql_query):
+        """Cache `sql_query` as the translation of a request, replacing any earlier one"""
+        self.cache.put(natural_language_query, self._get_schema_hash(), sql_query)
+
+    def _completion_args(self, prompt):
+        """Keyword arguments for a chat completion request"""
+        return {
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            "model": "llama-3.3-70b-versatile",
+            "temperature": 0.1,  # Low temperature for more deterministic output
+            "max_tokens": 200,   # Limit response length
+        }
+
+    def _generate(self, prompt, trace=instrumentation.NO_TRACE, on_sql=None):
+        """SQL the model writes for `prompt`, streamed unless `stream` is off"""
+        if self.stream:
+            return self._stream_sql(prompt, trace, on_sql)
+        chat_completion = self.groq_client.chat.completions.create(**self._completion_args(prompt))
+        # Fences and any explanation after the statement are cut off the same way as when streaming
+        sql_query, _ = _sql_from_stream(chat_completion.choices[0].message.content, finished=True)
+        return sql_query
+
+    def _stream_sql(self, prompt, trace, on_sql):
+        """Read a streamed completion only until it holds one complete statement
+
+        A DROP/TRUNCATE/ALTER/RENAME is given up on at its first word. The
+        stream is closed as soon as the statement ends, so whatever the
+        model writes after it is never generated in full or downloaded.
+        """
+        reader = _StatementStream(trace)
+        stream = self.groq_client.chat.completions.create(stream=True, **self._completion_args(prompt))
+        try:
+            for chunk in stream:
+                if reader.feed(chunk):
+                    break
+            sql_query = reader.finish()
+            if on_sql is not None and sql_query and not reader.rejected and not self._is_unsafe_query(sql_query):
+                on_sql(sql_query)
+            return sql_query
+        finally:
+            reader.record()
+            # Drops the connection if the model is still writing
+            stream.close()
+
+    async def _stream_sql_async(self, prompt, trace):
+        """Async _stream_sql; only opening the stream is retried when rate limited"""
+        reader = _StatementStream(trace)
+        stream = await self._create_with_retry({**self._completion_args(prompt), "stream": True})
+        try:
+            async for chunk in stream:
+                if reader.feed(chunk):
+                    break
+            return reader.finish()
+        finally:
+            reader.record()
+            await stream.close()
+
+    def _finish(self, natural_language_query, context_hash, chat_completion, cache=True):
+        """Safety-check a completion and cache it"""
+        sql_query, _ = _sql_from_stream(chat_completion.choices[0].message.content, finished=True)
+        return self._accept(natural_language_query, context_hash, sql_query, cache)
+
+    def _accept(self, natural_language_query, context_hash, sql_query, cache=True):
+        """Safety-check generated SQL and cache it"""
+        # Validate the SQL query for safety
+        with instrumentation.stage("safety_check"):
+            unsafe = self._is_unsafe_query(sql_query)
+        if unsafe:
+            return "Error: Generated query contains unsafe operations. Please rephrase your request."
+
+        if cache:
+            self.cache.put(natural_language_query, context_hash, sql_query)
+        return sql_query
+
+    async def _create_with_retry(self, completion_args):
+        """Call the async client, waiting out rate limits with exponential backoff"""
+        from groq import APIConnectionError, AsyncGroq, InternalServerError, RateLimitError
+
+        # The async HTTP client is tied to the event loop it was first used on
+        loop = asyncio.get_running_loop()
+        if self._async_client_loop is not loop:
+            self.async_groq_client = AsyncGroq(
+                api_key=os.environ.get("GROQ_API_KEY"),
+                max_retries=0,  # Retries are handled here so all concurrent requests back off together
+            )
+            self._async_client_loop = loop
+
+        for attempt in range(self.max_retries + 1):
+            # A 429 on any request pauses every request sharing this translator
+            delay = self._rate_limited_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await self.async_groq_client.chat.completions.create(**completion_args)
+            except (RateLimitError, APIConnectionError, InternalServerError) as err:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(self.retry_base_delay * 2 ** attempt, 60.0) * random.uniform(0.8, 1.2)
+                if isinstance(err, RateLimitError):
+                    retry_after = err.response.headers.get("retry-after")
+                    if retry_after:
+                        try:
+                            delay = max(delay, float(retry_after))
+                        except ValueError:
+                            pass
+                    self._rate_limited_until = max(self._rate_limited_until, time.monotonic() + delay)
+                else:
+                    await asyncio.sleep(delay)
     
-    def _get_schema_context(self):
-        """Generate a string representation of the database schema"""
+    def _get_schema_context(self, question=None):
+        """Generate a string representation of the database schema
+
+        With a question and more than `schema_top_k` tables, only the tables
+        ranked most relevant (plus their foreign key neighbours) are included.
+        """
         if not self.table_schema:
             return ""
-            
+
+        tables = list(self.table_schema)
+        if question and len(tables) > self.schema_top_k:
+            tables = self._get_schema_index().select(
+                question, self.schema_top_k, self.schema_token_budget, self._render_table
+            )
+
         schema_str = "Current Database Schema:\n\n"
-        for table, columns in self.table_schema.items():
-            schema_str += f"Table: `{table}`\n"
-            schema_str += "Columns:\n"
-            for column in columns:
-                schema_str += f"  - {column}\n"
-            schema_str += "\n"
+        for table in tables:
+            schema_str += self._render_table(table)
         
         return schema_str
+
+    def _render_table(self, table):
+        """Schema context text for one table"""
+        references = self.references.get(table, {})
+        table_str = f"Table: `{table}`\n"
+        table_str += "Columns:\n"
+        for column in self.table_schema[table]:
+            if column in references:
+                table_str += f"  - {column} (references {references[column]})\n"
+            else:
+                table_str += f"  - {column}\n"
+        table_str += "\n"
+        return table_str
+
+    def _get_schema_index(self):
+        """Relevance index over the current schema, built once per schema change"""
+        if self._schema_index is None:
+            neighbours = {}
+            for table, references in self.references.items():
+                for target in references.values():
+                    referenced_table = target.split(".")[0]
+                    neighbours.setdefault(table, set()).add(referenced_table)
+                    neighbours.setdefault(referenced_table, set()).add(table)
+            self._schema_index = SchemaIndex(self.table_schema, neighbours, self.table_comments)
+        return self._schema_index
+
+    def _get_schema_hash(self):
+        """Hash of the full schema, used to key cached translations"""
+        if self._schema_hash is None:
+            self._schema_hash = schema_hash(self._get_schema_context())
+        return self._schema_hash
     
     def _is_unsafe_query(self, query):
         """Check if the query contains unsafe operations"""
-        query = query.strip().upper()
-        
-        # Check for unsafe operations
-        unsafe_operations = ["DROP", "TRUNCATE", "ALTER"]
-        for op in unsafe_operations:
-            if op in query:
-                return True
-        
-        # Check for UPDATE or DELETE without WHERE
-        if query.startswith("UPDATE") and "WHERE" not in query:
+        statement = classify(query)
+
+        # Only one statement, so nothing can be chained after a harmless one
+        if statement.statement_count != 1:
+            return True
+
+        # Check for unsafe operations (by statement type, so a column like dropoff_time is fine)
+        if statement.type in ("DROP", "TRUNCATE", "ALTER", "RENAME"):
             return True
         
-        if query.startswith("DELETE") and "WHERE" not in query:
+        # Check for UPDATE or DELETE without WHERE (including WITH ... UPDATE)
+        if statement.type in ("UPDATE", "DELETE") and not statement.has_where:
             return True
         
         return False
     
     def update_schema(self, table_name, columns):
         """Update the table schema with new tables or columns"""
+        if table_name in self.table_schema and self.table_schema[table_name] != columns:
+            # A redefined table makes translations against the old schema stale
+            self.cache.invalidate_schema(self._get_schema_hash())
         self.table_schema[table_name] = columns
+        self._schema_index = None
+        self._schema_hash = None
+        self._fast_path = None
+
+    def load_snapshot(self, snapshot):
+        """Load every table of a SchemaSnapshot, including foreign keys and comments"""
+        for table in snapshot.tables.values():
+            name = table.name.lower()
+            self.table_names[name] = table.name
+            self.update_schema(name, table.column_names)
+            self.references[name] = {
+                column: f"{referenced_table.lower()}.{referenced_column}"
+                for column, referenced_table, referenced_column in table.foreign_keys
+            }
+            self.table_comments[name] = " ".join(
+                column.comment for column in table.columns.values() if column.comment
+            )
+        self._schema_index = None
+        self._schema_hash = None
+        self._fast_path = None
         
     def get_table_schema(self):
         """Return the current table schema"""
-        return self.table_schema 
\ No newline at end of file
+        return self.table_schema
+
+    def get_cache_stats(self):
+        """Return translation cache hit/miss counters"""
+        return self.cache.get_stats() 
\ No newline at end of file
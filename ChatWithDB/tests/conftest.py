@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules import each other by bare name (from pool import ...), as when run from ChatWithDB/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The translator wants a key even when the LLM is the local stub
+os.environ.setdefault("GROQ_API_KEY", "test")
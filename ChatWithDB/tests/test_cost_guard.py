@@ -0,0 +1,79 @@
+import json
+from contextlib import contextmanager
+
+import pytest
+
+from cost_guard import CostGuard, explain_plan
+
+PLAN = {"query_block": {"cost_info": {"query_cost": "12.5"}, "table": {
+    "table_name": "users", "access_type": "ALL", "rows_examined_per_scan": 50000, "possible_keys": None,
+}}}
+
+
+class FakeCursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    def fetchone(self):
+        return (json.dumps(PLAN),)
+
+    def fetchall(self):
+        return []
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.executed = []
+
+    @contextmanager
+    def raw_cursor(self, dictionary=True):
+        yield None, FakeCursor(self.executed)
+
+
+def test_explain_plan_uses_the_public_cursor():
+    db = FakeDatabase()
+    assert explain_plan(db, "SELECT * FROM users;") == PLAN
+    assert db.executed == ["EXPLAIN FORMAT=JSON SELECT * FROM users"]
+    assert explain_plan(db, "SHOW TABLES") is None
+
+
+def test_full_scan_warns():
+    with CostGuard(mode="block") as guard:
+        estimate = guard.check(FakeDatabase(), "SELECT * FROM users")
+    assert estimate.verdict == "warn"
+    assert estimate.query_cost == 12.5
+
+
+def test_close_stops_the_explain_threads():
+    guard = CostGuard()
+    guard.close()
+    with pytest.raises(RuntimeError):
+        guard._explainer.submit(print)
+
+
+class RevisingTranslator:
+    def __init__(self):
+        self.revisions = 0
+
+    def translate(self, natural_language_query, on_sql=None):
+        return "SELECT * FROM users"
+
+    def revise(self, natural_language_query, sql_query, feedback):
+        self.revisions += 1
+        return "SELECT id FROM users"
+
+    def remember(self, natural_language_query, sql_query):
+        pass
+
+
+@pytest.mark.parametrize("block_rows, verdict, revisions", [(10000000, "warn", 0), (1000, "block", 1)])
+def test_only_blocked_plans_are_revised(block_rows, verdict, revisions):
+    translator = RevisingTranslator()
+    with CostGuard(block_rows=block_rows, mode="block") as guard:
+        sql_query, estimate = guard.translate(FakeDatabase(), translator, "all users")
+    assert translator.revisions == revisions
+    assert sql_query == "SELECT * FROM users"
+    assert estimate.verdict == verdict
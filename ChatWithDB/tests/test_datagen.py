@@ -0,0 +1,157 @@
+import random
+from contextlib import contextmanager
+
+import pytest
+
+from datagen import DataGenerator, _column_generator
+from schema import ColumnInfo, SchemaSnapshot, TableInfo
+
+
+def varchar(name, length, key=""):
+    return ColumnInfo(name, f"varchar({length})", "varchar", False, key, None, "", max_length=length)
+
+
+@pytest.mark.parametrize("column", [
+    varchar("code", 6, "UNI"),
+    varchar("title", 12, "PRI"),
+    varchar("email", 10, "UNI"),
+    varchar("email", 30, "UNI"),
+    varchar("contact_email", 4),
+])
+def test_unique_text_fits_and_stays_unique(column):
+    generate = _column_generator(column, random.Random(0), unique_offset=995)
+    values = [generate(i) for i in range(2000)]
+    assert max(len(value) for value in values) <= column.max_length
+    assert len(set(values)) == len(values)
+
+
+def test_long_columns_keep_the_domain():
+    generate = _column_generator(varchar("email", 255, "UNI"), random.Random(0), unique_offset=0)
+    assert generate(0).endswith("1@example.com")
+
+
+class FakeCursor:
+    """Answers the generator's COUNT/MAX query and parent key lookups"""
+
+    def __init__(self, parent_keys, existing):
+        self.parent_keys = parent_keys
+        self.existing = existing
+        self.executed = []
+        self.result = None
+
+    def execute(self, sql):
+        self.executed.append(sql)
+        if sql.startswith("SELECT COUNT(*)"):
+            self.result = [self.existing]
+        else:
+            self.result = [(key,) for key in self.parent_keys]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeDatabase:
+    def __init__(self, tables, parent_keys=(), existing=(0,)):
+        self.snapshot = SchemaSnapshot("shop", None, {table.name: table for table in tables})
+        self.parent_keys = list(parent_keys)
+        # (row count, largest number of each unique column) the COUNT/MAX query returns
+        self.existing = tuple(existing)
+        self.executed = []
+
+    def get_schema_snapshot(self):
+        return self.snapshot
+
+    @contextmanager
+    def raw_cursor(self, dictionary=True):
+        cursor = FakeCursor(self.parent_keys, self.existing)
+        yield None, cursor
+        self.executed.extend(cursor.executed)
+
+
+def table_with_reference(name, referenced, nullable):
+    table = TableInfo(name)
+    table.columns["id"] = ColumnInfo("id", "int", "int", False, "PRI", None, "auto_increment")
+    parent = ColumnInfo("parent_id", "int", "int", nullable, "MUL", None, "")
+    parent.references = (referenced, "id")
+    table.columns["parent_id"] = parent
+    table.indexes["PRIMARY"] = {"columns": ["id"]}
+    return table
+
+
+def test_empty_self_reference_gives_null():
+    nodes = table_with_reference("nodes", "Nodes", nullable=False)
+    generator = DataGenerator(FakeDatabase([nodes]), "nodes")
+    assert list(generator.rows(3)) == [(None,), (None,), (None,)]
+
+
+def test_empty_parent_of_nullable_column_gives_null():
+    items = table_with_reference("items", "categories", nullable=True)
+    generator = DataGenerator(FakeDatabase([items, TableInfo("categories")]), "items")
+    assert list(generator.rows(3)) == [(None,), (None,), (None,)]
+
+
+def test_empty_parent_of_required_column_is_an_error():
+    items = table_with_reference("items", "categories", nullable=False)
+    with pytest.raises(ValueError, match="has no rows"):
+        DataGenerator(FakeDatabase([items, TableInfo("categories")]), "items")
+
+
+def test_parent_keys_are_used_when_present():
+    items = table_with_reference("items", "categories", nullable=False)
+    generator = DataGenerator(FakeDatabase([items], parent_keys=[7, 8]), "items")
+    assert {row[0] for row in generator.rows(50)} <= {7, 8}
+
+
+def table_with_unique_columns():
+    table = TableInfo("accounts")
+    table.columns["id"] = ColumnInfo("id", "int", "int", False, "PRI", None, "auto_increment")
+    table.columns["number"] = ColumnInfo("number", "int unsigned", "int", False, "UNI", None, "")
+    table.columns["handle"] = varchar("handle", 20, "UNI")
+    table.columns["level"] = ColumnInfo("level", "tinyint", "tinyint", False, "UNI", None, "")
+    table.indexes["PRIMARY"] = {"columns": ["id"]}
+    return table
+
+
+def test_unique_columns_continue_after_their_own_maximum():
+    # 3 rows; number already reaches 500 and handle 40, both above the row count
+    db = FakeDatabase([table_with_unique_columns()], existing=(3, 500, 40, 7))
+    generator = DataGenerator(db, "accounts")
+    (query,) = db.executed
+    assert "MAX(`number`)" in query and "REGEXP_SUBSTR(`handle`" in query and "`id`" not in query
+    rows = list(generator.rows(2))
+    assert [row[0] for row in rows] == [501, 502]
+    assert [row[1].rsplit("-", 1)[1] for row in rows] == ["41", "42"]
+    assert [row[2] for row in rows] == [8, 9]
+
+
+def test_unique_tinyint_out_of_range_is_an_error():
+    db = FakeDatabase([table_with_unique_columns()], existing=(3, 500, 40, 120))
+    with pytest.raises(ValueError, match="accounts.level"):
+        list(DataGenerator(db, "accounts").rows(10))
+
+
+def table_with_unique_reference():
+    # 1:1 child: each user has at most one profile
+    table = TableInfo("profiles")
+    table.columns["id"] = ColumnInfo("id", "int", "int", False, "PRI", None, "auto_increment")
+    user = ColumnInfo("user_id", "int", "int", False, "UNI", None, "")
+    user.references = ("users", "id")
+    table.columns["user_id"] = user
+    table.indexes["PRIMARY"] = {"columns": ["id"]}
+    return table
+
+
+def test_unique_reference_uses_each_unused_parent_key_once():
+    db = FakeDatabase([table_with_unique_reference()], parent_keys=[3, 5, 8, 13])
+    generator = DataGenerator(db, "profiles", count=4)
+    assert "NOT EXISTS" in db.executed[-1] and "LIMIT 4" in db.executed[-1]
+    assert sorted(row[0] for row in generator.rows(4)) == [3, 5, 8, 13]
+
+
+def test_unique_reference_with_too_few_parent_keys_is_an_error():
+    db = FakeDatabase([table_with_unique_reference()], parent_keys=[3, 5])
+    with pytest.raises(ValueError, match="only 2 users keys are unused"):
+        list(DataGenerator(db, "profiles").rows(3))
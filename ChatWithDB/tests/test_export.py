@@ -0,0 +1,82 @@
+import csv
+import datetime
+import io
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.ipc
+from mysql.connector import FieldFlag, FieldType
+
+from export import BINARY_CHARSET, ExportWriter, export_query, result_columns
+from results import QueryResult
+from schema import ColumnInfo, SchemaSnapshot, TableInfo
+
+UTF8MB4 = 255
+
+
+def described(name, type_code, flags=0, charset=UTF8MB4):
+    return (name, type_code, None, None, None, None, 1, flags, charset)
+
+
+DESCRIPTION = [
+    described("id", FieldType.LONGLONG, FieldFlag.UNSIGNED),
+    described("price", FieldType.NEWDECIMAL),
+    described("total", FieldType.NEWDECIMAL),
+    described("note", FieldType.VAR_STRING),
+    described("avatar", FieldType.BLOB, charset=BINARY_CHARSET),
+    described("created", FieldType.DATETIME),
+]
+COLUMNS = [name for name, *_ in DESCRIPTION]
+
+
+def snapshot():
+    table = TableInfo("items")
+    for name, column_type, data_type in [
+        ("id", "bigint unsigned", "bigint"), ("price", "decimal(10,2)", "decimal"), ("note", "text", "text"),
+    ]:
+        table.columns[name] = ColumnInfo(name, column_type, data_type, True, "", None, "")
+    return SchemaSnapshot("shop", None, {"items": table})
+
+
+class FakeDatabase:
+    def __init__(self, batches):
+        self.batches = batches
+
+    def get_schema_snapshot(self):
+        return snapshot()
+
+    def iter_query(self, query, params=None, batch_size=None, timeout=None, max_rows=None):
+        yield from self.batches
+
+
+def test_arrow_schema_comes_from_description_and_snapshot():
+    # The first batch is all NULL; its values must not decide the types
+    batches = [
+        QueryResult(COLUMNS, [(None,) * 6], DESCRIPTION),
+        QueryResult(COLUMNS, [(2 ** 63, Decimal("9.99"), Decimal("1.5"), "x", b"\x00\xff",
+                               datetime.datetime(2024, 1, 2, 3, 4, 5))], DESCRIPTION),
+    ]
+    output = io.BytesIO()
+    export_query(FakeDatabase(batches), "SELECT * FROM items", output, "arrow")
+    table = pyarrow.ipc.open_stream(output.getvalue()).read_all()
+    assert table.schema.types == [
+        pa.uint64(), pa.decimal128(10, 2), pa.string(), pa.string(), pa.binary(), pa.timestamp("us"),
+    ]
+    assert table.column("total").to_pylist() == [None, "1.5"]
+    assert table.column("avatar").to_pylist() == [None, b"\x00\xff"]
+
+
+def test_result_columns_skip_other_databases():
+    db = FakeDatabase([])
+    assert set(result_columns(db, "SELECT * FROM items")) == {"id", "price", "note"}
+    assert result_columns(db, "SELECT * FROM other.items") == {}
+
+
+def test_csv_writes_bytes_as_hex():
+    for description in (DESCRIPTION[3:5], None):
+        output = io.BytesIO()
+        writer = ExportWriter(output, "csv")
+        writer.write(QueryResult(("note", "avatar"), [("a", b"\x00\xff"), ("b", None)], description))
+        writer.close()
+        rows = list(csv.reader(io.StringIO(output.getvalue().decode())))
+        assert rows == [["note", "avatar"], ["a", "00ff"], ["b", ""]]
@@ -0,0 +1,121 @@
+import gc
+import threading
+
+import pytest
+
+from fanout import FanOut, ShardResult, ShardTarget, parse_targets
+from main import Database
+from pool import ConnectionPool, PoolExhaustedError
+from results import QueryResult
+
+
+class Watchdog:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def make_fan_out():
+    return FanOut(Database.on_pool(ConnectionPool(host="primary", user="app", password="secret")), max_workers=4)
+
+
+def test_parse_targets():
+    assert [target.name for target in parse_targets("shard_1, db2:3307/shard_2\nshard_*")] == [
+        "shard_1", "db2:3307/shard_2", "shard_*"
+    ]
+
+
+def test_default_server_shares_the_callers_pool():
+    fan_out = make_fan_out()
+    primary = fan_out.db.pool
+    assert fan_out._pool(ShardTarget("shard_1")) is primary
+    assert fan_out._pool(ShardTarget("shard_2", "primary", 3306)) is primary
+    other = fan_out._pool(ShardTarget("shard_3", "replica"))
+    assert other is not primary
+    assert other.connect_args["host"] == "replica"
+    assert fan_out._pool(ShardTarget("shard_4", "replica")) is other
+    fan_out.close()
+    assert other._closed and not primary._closed
+
+
+def test_pools_close_when_the_fan_out_is_dropped():
+    fan_out = make_fan_out()
+    other = fan_out._pool(ShardTarget("shard", "replica"))
+    del fan_out
+    gc.collect()
+    assert other._closed
+
+
+def test_cancel_only_stops_the_owners_shards():
+    fan_out = make_fan_out()
+    with fan_out._shard(ShardTarget("shard_1"), owner="a") as first, \
+            fan_out._shard(ShardTarget("shard_2"), owner="b") as second:
+        assert first.database == "shard_1"
+        watchdogs = {"a": Watchdog(), "b": Watchdog()}
+        first._running.add(watchdogs["a"])
+        second._running.add(watchdogs["b"])
+        assert fan_out.cancel("a") == 1
+        assert watchdogs["a"].cancelled and not watchdogs["b"].cancelled
+        assert fan_out.cancel() == 2
+    assert fan_out._active == {}
+
+
+class ShardDatabase(Database):
+    """Answers each shard from memory: rows (id, name) sorted on id"""
+
+    rows = {
+        "shard_1": [(1, "a"), (4, "d")],
+        "shard_2": [(2, "b"), (5, "e")],
+        "shard_3": [(3, "c"), (6, "f")],
+    }
+
+    def fetch_all(self, query, params=None, use_cache=True, timeout=None, max_rows=None, prepared=None):
+        return QueryResult(("id", "name"), list(self.rows[self.database]))
+
+
+def test_fan_out_never_resizes_the_callers_pool():
+    fan_out = make_fan_out()
+    pool = fan_out.db.pool
+    pool.size = 2
+    targets = [ShardTarget(f"shard_{number}") for number in range(1, 4)]
+    assert fan_out._pool(targets[0]) is pool and pool.size == 2
+    # Three shards can't stream side by side on two connections
+    assert not fan_out.can_stream_sorted([ShardResult(target) for target in targets])
+    assert fan_out.can_stream_sorted([ShardResult(target) for target in targets[:2]])
+    with pytest.raises(ValueError):
+        next(fan_out.iter_sorted("SELECT 1", [ShardResult(target) for target in targets], "id"))
+    assert pool.size == 2
+
+
+def test_shards_wait_for_a_slot_on_the_pool():
+    fan_out = make_fan_out()
+    pool = fan_out.db.pool
+    pool.size, pool.timeout = 1, 0.05
+    with fan_out._shard(ShardTarget("shard_1")):
+        with pytest.raises(PoolExhaustedError):
+            with fan_out._shard(ShardTarget("shard_2")):
+                pass
+        entered = threading.Event()
+
+        def second_shard():
+            with fan_out._shard(ShardTarget("shard_2")):
+                entered.set()
+
+        pool.timeout = 5
+        waiter = threading.Thread(target=second_shard)
+        waiter.start()
+        assert not entered.wait(0.05)
+    # Leaving the first shard frees its slot
+    assert entered.wait(5)
+    waiter.join(5)
+
+
+def test_sorted_run_falls_back_to_sorting_in_memory():
+    fan_out = FanOut(ShardDatabase.on_pool(ConnectionPool(host="primary", user="app", password="secret", size=2)))
+    targets = [ShardTarget(f"shard_{number}") for number in range(1, 4)]
+    outcome = fan_out.run("SELECT id, name FROM t ORDER BY id", targets, order_by="id", descending=True)
+    assert [row[1] for row in outcome.result.rows] == [6, 5, 4, 3, 2, 1]
+    assert outcome.result.rows[0] == ("shard_3", 6, "f")
+    assert fan_out.db.pool.size == 2
@@ -0,0 +1,45 @@
+import pytest
+
+from benchmark import FAST_PATH_CORPUS, FAST_PATH_SCHEMA
+from fast_path import FastPath
+from sql_classifier import classify, tokenize
+
+
+@pytest.fixture
+def fast_path():
+    return FastPath(FAST_PATH_SCHEMA)
+
+
+@pytest.mark.parametrize("question, expected", FAST_PATH_CORPUS)
+def test_corpus(fast_path, question, expected):
+    match = fast_path.translate(question)
+    assert (match.sql if match else None) == expected
+
+
+@pytest.mark.parametrize("question", [question for question, expected in FAST_PATH_CORPUS if expected])
+def test_row_queries_name_columns_and_are_limited(fast_path, question):
+    sql = fast_path.translate(question).sql
+    words = [text.upper() for kind, text, *_ in tokenize(sql) if kind in ("word", "punct")]
+    assert classify(sql).type == "SELECT"
+    if "COUNT" not in words:
+        assert "*" not in words
+        assert "LIMIT" in words
+
+
+def test_select_all_expands_columns_and_limits(fast_path):
+    assert fast_path.translate("show all orders").sql == (
+        "SELECT `id`, `customer_id`, `status`, `amount`, `created_at` FROM `orders` LIMIT 100"
+    )
+
+
+def test_default_limit_is_configurable():
+    fast_path = FastPath({"users": ["id", "name"]}, default_limit=10)
+    assert fast_path.translate("show users where name is Ann").sql == (
+        "SELECT `id`, `name` FROM `users` WHERE `name` = 'Ann' LIMIT 10"
+    )
+    assert fast_path.translate("show the names of users").sql == "SELECT `name` FROM `users` LIMIT 10"
+
+
+def test_table_spelling_is_kept(fast_path):
+    fast_path = FastPath({"users": ["ID", "Name"]}, {"users": "Users"})
+    assert fast_path.translate("list users").sql == "SELECT `ID`, `Name` FROM `Users` LIMIT 100"
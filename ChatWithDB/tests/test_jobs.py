@@ -0,0 +1,104 @@
+import threading
+import time
+
+from jobs import JobExecutor
+from main import Database
+from pool import ConnectionPool
+from results import QueryResult
+
+
+class CountingPool(ConnectionPool):
+    """A pool that records checkouts instead of connecting"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+
+    def connection(self, database=None):
+        self.checkouts += 1
+        raise AssertionError("no connection expected")
+
+
+def test_on_pool_makes_no_round_trip(capsys):
+    pool = CountingPool(host="db.example", user="app", password="secret")
+    db = Database.on_pool(pool, "shop")
+    assert (db.database, db.pool, pool.checkouts) == ("shop", pool, 0)
+    assert capsys.readouterr().out == ""
+
+
+def test_job_database_is_a_quiet_handle(capsys):
+    session = Database.on_pool(CountingPool(host="db.example", user="app", password="secret"), "shop")
+    session.query_timeout, session.max_rows = 30.0, 500
+    executor = JobExecutor(max_workers=2)
+    try:
+        first = executor._job_database(session, session.database)
+        second = executor._job_database(session, session.database)
+        assert first is not second
+        assert first.pool is second.pool is executor.pool
+        assert executor.pool.connect_args["host"] == "db.example"
+        assert (first.database, first.query_timeout, first.max_rows) == ("shop", 30.0, 500)
+        assert capsys.readouterr().out == ""
+    finally:
+        executor.close()
+
+
+class RecordingDatabase(Database):
+    """Records which database each statement ran on instead of connecting"""
+
+    ran = []
+    gate = None
+
+    def execute_query(self, query, params=None, use_cache=True, timeout=None, max_rows=None, prepared=None):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.ran.append((query, self.database))
+        return "Query executed successfully"
+
+
+def test_queued_job_keeps_the_database_it_was_submitted_on():
+    session = RecordingDatabase.on_pool(CountingPool(host="db.example", user="app", password="secret"), "shop")
+    RecordingDatabase.ran, RecordingDatabase.gate = [], threading.Event()
+    executor = JobExecutor(max_workers=1, per_user=1)
+    try:
+        first = executor.submit_query("me", session, "CREATE TABLE a (id INT)")
+        second = executor.submit_query("me", session, "CREATE TABLE b (id INT)")
+        # The session moves on while the second job is still queued
+        session.database = "other"
+        RecordingDatabase.gate.set()
+        for job in (first, second):
+            while not job.finished:
+                time.sleep(0.01)
+        assert RecordingDatabase.ran == [("CREATE TABLE a (id INT)", "shop"), ("CREATE TABLE b (id INT)", "shop")]
+    finally:
+        RecordingDatabase.gate = None
+        executor.close()
+
+
+def test_job_rows_are_capped_and_the_dataframe_is_built_once():
+    class RowDatabase(Database):
+        def iter_query(self, query, params=None, batch_size=None, use_cache=True, timeout=None, max_rows=None,
+                       prepared=None):
+            for start in range(0, max_rows, 2):
+                batch = QueryResult(("id",), [(start,), (start + 1,)])
+                batch.truncated = start + 2 >= max_rows
+                yield batch
+
+    session = RowDatabase.on_pool(CountingPool(host="db.example", user="app", password="secret"), "shop")
+    session.max_rows = 0
+    executor = JobExecutor(max_workers=1, max_rows=6)
+    try:
+        job = executor.submit_query("me", session, "SELECT id FROM t")
+        while not job.finished:
+            time.sleep(0.01)
+        assert (job.rows, job.max_rows, job.truncated) == (6, 6, True)
+        dataframe = job.dataframe()
+        assert list(dataframe["id"]) == [0, 1, 2, 3, 4, 5]
+        assert job.dataframe() is dataframe
+        # The session's own, lower row cap wins
+        session.max_rows = 4
+        job = executor.submit_query("me", session, "SELECT id FROM t")
+        while not job.finished:
+            time.sleep(0.01)
+        assert (job.rows, job.max_rows) == (4, 4)
+    finally:
+        executor.close()
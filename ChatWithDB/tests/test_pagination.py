@@ -0,0 +1,119 @@
+import pytest
+
+from pagination import Paginator
+from results import QueryResult
+from schema import ColumnInfo, SchemaSnapshot, TableInfo
+
+
+class FakeDatabase:
+    """Records the SQL each page runs and answers with `rows`"""
+
+    def __init__(self, rows=(), columns=("id", "name")):
+        self.rows = list(rows)
+        self.columns = columns
+        self.statements = []
+        table = TableInfo("users")
+        table.columns["id"] = ColumnInfo("id", "int", "int", False, "PRI", None, "")
+        table.columns["name"] = ColumnInfo("name", "varchar(20)", "varchar", True, "", None, "")
+        table.indexes["PRIMARY"] = {"columns": ["id"]}
+        self.snapshot = SchemaSnapshot("shop", None, {"users": table})
+
+    def get_schema_snapshot(self):
+        return self.snapshot
+
+    def fetch_all(self, query, params=None, use_cache=True, timeout=None, max_rows=None):
+        self.statements.append((query, params))
+        return QueryResult(self.columns, self.rows)
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT name FROM users -- every user",
+    "SELECT name FROM users # every user\n;",
+    "SELECT name /* the names */ FROM users;",
+])
+def test_trailing_comments_cannot_hide_the_limit(query):
+    db = FakeDatabase()
+    Paginator(db, query, page_size=10).page(1)
+    sql, _ = db.statements[-1]
+    assert "--" not in sql and "#" not in sql and "/*" not in sql
+    assert sql.rstrip().endswith("LIMIT 11 OFFSET 10")
+
+
+def test_optimizer_hints_are_kept():
+    db = FakeDatabase()
+    Paginator(db, "SELECT /*+ MAX_EXECUTION_TIME(100) */ name FROM users", page_size=10).page(0)
+    assert db.statements[-1][0].startswith("SELECT /*+ MAX_EXECUTION_TIME(100) */ name FROM users")
+
+
+def test_keyset_key_is_a_parameter():
+    db = FakeDatabase(rows=[(1, "a"), (2, "b"), (3, "it's")])
+    paginator = Paginator(db, "SELECT id, name FROM users WHERE name LIKE '%sam%'", page_size=2)
+    assert paginator.mode == "keyset"
+    paginator.page(0)
+    assert db.statements[-1] == (
+        "SELECT id, name FROM users WHERE (name LIKE %s) ORDER BY users.`id` LIMIT 3", ["%sam%"]
+    )
+    paginator.page(1)
+    assert db.statements[-1] == (
+        "SELECT id, name FROM users WHERE (name LIKE %s) AND users.`id` > %s ORDER BY users.`id` LIMIT 3",
+        ["%sam%", 2],
+    )
+
+
+def test_modulo_rules_out_keyset_paging():
+    db = FakeDatabase()
+    paginator = Paginator(db, "SELECT id, name FROM users WHERE id % 2 = 0", page_size=2)
+    assert paginator.mode == "offset"
+    paginator.page(1)
+    assert db.statements[-1] == ("SELECT id, name FROM users WHERE id % 2 = 0 LIMIT 3 OFFSET 2", None)
+
+
+def test_join_count_drops_the_select_list():
+    db = FakeDatabase(rows=[(42,)], columns=("COUNT(*)",))
+    paginator = Paginator(db, "SELECT * FROM users u JOIN orders o ON o.user_id = u.id ORDER BY total LIMIT 500")
+    assert paginator.total_count() == 42
+    assert db.statements[-1][0] == (
+        "SELECT COUNT(*) FROM (SELECT 1 FROM users u JOIN orders o ON o.user_id = u.id LIMIT 500) AS _count"
+    )
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT DISTINCT * FROM users u JOIN orders o ON o.user_id = u.id",
+    "SELECT COUNT(*) FROM users",
+    "SELECT name, COUNT(*) AS n FROM users GROUP BY name HAVING n > 1",
+    "SELECT id FROM users UNION SELECT user_id FROM orders",
+])
+def test_count_keeps_select_lists_that_shape_the_rows(query):
+    db = FakeDatabase(rows=[(3,)], columns=("COUNT(*)",))
+    Paginator(db, query).total_count()
+    assert db.statements[-1][0] == f"SELECT COUNT(*) FROM ({query}) AS _count"
+
+
+def test_duplicate_columns_hide_the_total():
+    import mysql.connector
+
+    class DuplicateColumns(FakeDatabase):
+        def fetch_all(self, query, params=None, **kwargs):
+            raise mysql.connector.ProgrammingError(msg="Duplicate column name 'id'", errno=1060)
+
+    paginator = Paginator(DuplicateColumns(), "SELECT DISTINCT * FROM users u JOIN orders o ON o.user_id = u.id")
+    assert paginator.total_count() is None
+    assert paginator.page_count() is None
+    assert not paginator.countable
+
+
+@pytest.mark.parametrize("query, page, expected", [
+    ("SELECT * FROM users u JOIN orders o ON o.user_id = u.id ORDER BY u.name LIMIT 25", 1,
+     "SELECT * FROM users u JOIN orders o ON o.user_id = u.id ORDER BY u.name LIMIT 11 OFFSET 10"),
+    ("SELECT name FROM users ORDER BY name LIMIT 25", 2, "SELECT name FROM users ORDER BY name LIMIT 5 OFFSET 20"),
+    ("SELECT name FROM users LIMIT 5, 25", 3, "SELECT name FROM users LIMIT 0 OFFSET 35"),
+    ("SELECT name FROM users LIMIT 25 OFFSET 5", 0, "SELECT name FROM users LIMIT 11 OFFSET 5"),
+    ("SELECT name FROM users WHERE id IN (SELECT user_id FROM orders) LIMIT 40", 0,
+     "SELECT name FROM users WHERE id IN (SELECT user_id FROM orders) LIMIT 11 OFFSET 0"),
+    ("SELECT name FROM users LIMIT @n", 0,
+     "SELECT * FROM (SELECT name FROM users LIMIT @n) AS _page LIMIT 11 OFFSET 0"),
+])
+def test_pages_stay_inside_the_querys_own_limit(query, page, expected):
+    db = FakeDatabase()
+    Paginator(db, query, page_size=10).page(page)
+    assert db.statements[-1][0] == expected
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import mysql.connector
+import pytest
+
+from pool import ConnectionPool, PoolExhaustedError
+
+
+class FakeRaw:
+    in_transaction = False
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(mysql.connector, "connect", lambda **kwargs: FakeRaw())
+    return ConnectionPool(size=1, timeout=5)
+
+
+def test_discarded_connection_frees_a_slot_for_a_waiting_caller(pool):
+    checked_out = threading.Event()
+    got = {}
+
+    def second_caller():
+        checked_out.wait()
+        started = time.monotonic()
+        with pool.connection() as conn:
+            got["conn"], got["seconds"] = conn, time.monotonic() - started
+
+    waiter = threading.Thread(target=second_caller)
+    waiter.start()
+    with pool.connection() as first:
+        checked_out.set()
+        # Let the second caller block on the full pool
+        time.sleep(0.1)
+        first.invalidate()
+    waiter.join(5)
+
+    assert got["conn"] is not first and first.raw.closed
+    assert got["seconds"] < 1
+    stats = pool.get_stats()
+    assert (stats["created"], stats["discarded"], stats["waits"], stats["open"]) == (2, 1, 1, 1)
+
+
+def test_released_connection_is_reused_and_a_full_pool_times_out(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as conn:
+        assert conn is first
+        pool.timeout = 0.05
+        with pytest.raises(PoolExhaustedError):
+            pool._checkout()
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import mysql.connector
+
+import query_limits
+from query_limits import QueryWatchdog
+
+
+class FakeConnection:
+    def __init__(self, executed):
+        self.executed = executed
+        self.closed = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+    def close(self):
+        self.closed = True
+
+
+def test_kill_connects_with_a_short_timeout(monkeypatch):
+    executed, seen = [], {}
+
+    def connect(**kwargs):
+        seen.update(kwargs)
+        return FakeConnection(executed)
+
+    monkeypatch.setattr(mysql.connector, "connect", connect)
+    watchdog = QueryWatchdog({"host": "db", "connection_timeout": 60}, 42)
+    watchdog.cancel()
+    assert executed == ["KILL QUERY 42"]
+    assert seen == {"host": "db", "connection_timeout": query_limits.KILL_CONNECT_TIMEOUT}
+    assert watchdog.reason == "cancelled"
+
+
+def test_stop_does_not_wait_for_a_slow_connect(monkeypatch):
+    executed, connecting, release = [], threading.Event(), threading.Event()
+    connections = []
+
+    def connect(**kwargs):
+        connecting.set()
+        release.wait(5)
+        connections.append(FakeConnection(executed))
+        return connections[-1]
+
+    monkeypatch.setattr(mysql.connector, "connect", connect)
+    watchdog = QueryWatchdog({}, 42)
+    killer = threading.Thread(target=watchdog.cancel)
+    killer.start()
+    assert connecting.wait(5)
+
+    started = time.monotonic()
+    watchdog.stop()
+    assert time.monotonic() - started < 1
+
+    release.set()
+    killer.join(5)
+    # The statement finished first, so nothing may be killed on its connection
+    assert executed == []
+    assert connections[0].closed
@@ -0,0 +1,63 @@
+import pytest
+
+from result_cache import ResultCache
+from results import QueryResult
+from sql_classifier import classify, complete_statement, split_statements, strip_comments
+
+
+@pytest.mark.parametrize("sql, tables", [
+    ("SELECT * FROM a JOIN b ON a.id = b.id, c", {"a", "b", "c"}),
+    ("SELECT * FROM a LEFT JOIN b USING (id), c AS cc, d WHERE x = 1", {"a", "b", "c", "d"}),
+    ("SELECT * FROM a x, b y JOIN c ON c.id = y.id, d", {"a", "b", "c", "d"}),
+    ("SELECT EXTRACT(YEAR FROM d), x FROM t, u WHERE a IN (1, 2)", {"t", "u"}),
+    ("SELECT a, (SELECT 1 FROM q), b FROM t", {"q", "t"}),
+    ("SELECT * FROM shop.users u JOIN `crm`.`leads` l ON l.user_id = u.id", {"shop.users", "crm.leads"}),
+    ("WITH recent AS (SELECT * FROM orders) SELECT * FROM recent JOIN users ON 1, items", {"orders", "users", "items"}),
+])
+def test_read_tables(sql, tables):
+    statement = classify(sql)
+    assert statement.tables == tables
+    assert statement.write_tables == frozenset()
+
+
+@pytest.mark.parametrize("sql, tables, write_tables", [
+    ("UPDATE t SET a = 1 WHERE id IN (SELECT id FROM s)", {"t", "s"}, {"t"}),
+    ("WITH x AS (SELECT * FROM src) UPDATE t JOIN x ON t.id = x.id SET t.a = x.a", {"t", "src"}, {"t"}),
+    ("UPDATE a JOIN b ON a.id = b.id, c SET a.x = c.x", {"a", "b", "c"}, {"a", "b", "c"}),
+    ("UPDATE shop.t SET a = 1", {"shop.t"}, {"shop.t"}),
+    ("DELETE t1, t2 FROM t1 JOIN t2 ON t1.id = t2.id, t3 WHERE t3.x = 1", {"t1", "t2", "t3"}, {"t1", "t2"}),
+    ("INSERT INTO t (a, b) SELECT a, b FROM s JOIN u ON s.id = u.id, v ON DUPLICATE KEY UPDATE a = 1, b = 2",
+     {"t", "s", "u", "v"}, {"t"}),
+])
+def test_write_tables(sql, tables, write_tables):
+    statement = classify(sql)
+    assert (statement.tables, statement.write_tables) == (tables, write_tables)
+    assert statement.is_write
+
+
+def test_statement_types():
+    assert classify("  select 1").type == "SELECT"
+    assert classify("desc users").type == "DESCRIBE"
+    assert classify("(SELECT 1) UNION (SELECT 2)").returns_rows
+    assert classify("CREATE TABLE t (id INT)").is_ddl
+    assert classify("USE `shop`").database == "shop"
+    assert classify("SELECT NOW()").volatile and not classify("SELECT 1").volatile
+
+
+def test_split_and_complete_statements():
+    assert split_statements("SELECT ';'; -- x;\nSELECT 2;") == ["SELECT ';'", "SELECT 2"]
+    assert complete_statement("SELECT 'a;") is None
+    assert complete_statement("SELECT 1; and then") == "SELECT 1;"
+    assert strip_comments("SELECT 1 -- one") == "SELECT 1  "
+
+
+def test_result_cache_matches_qualified_and_plain_names():
+    cache = ResultCache(max_bytes=1 << 20)
+    result = QueryResult(("id",), [(1,)])
+    cache.put(("shop", "SELECT * FROM users", None), result, classify("SELECT * FROM users").tables)
+    cache.put(("crm", "SELECT * FROM shop.users", None), result, classify("SELECT * FROM shop.users").tables)
+    cache.put(("crm", "SELECT * FROM leads", None), result, classify("SELECT * FROM leads").tables)
+    cache.invalidate_tables("crm", classify("UPDATE shop.users SET a = 1").write_tables)
+    assert cache.get(("shop", "SELECT * FROM users", None)) is None
+    assert cache.get(("crm", "SELECT * FROM shop.users", None)) is None
+    assert cache.get(("crm", "SELECT * FROM leads", None)) is result
@@ -0,0 +1,94 @@
+from contextlib import contextmanager
+
+import pytest
+
+from sql_script import run_script, split_script
+
+PROCEDURE = """CREATE PROCEDURE touch(IN p INT)
+BEGIN
+  UPDATE t SET a = 'x;y' WHERE id = p;
+  SELECT 1;
+END"""
+
+
+@pytest.mark.parametrize("script, statements", [
+    ("SELECT 1; SELECT 2;", ["SELECT 1", "SELECT 2"]),
+    ("INSERT INTO t VALUES ('a;b'); -- done;\nSELECT `x;y` FROM t",
+     ["INSERT INTO t VALUES ('a;b')", "SELECT `x;y` FROM t"]),
+    ("/*!40101 SET NAMES utf8 */;\n/* note; */ SELECT 1;", ["/*!40101 SET NAMES utf8 */", "SELECT 1"]),
+    ("CREATE TRIGGER tr BEFORE INSERT ON t FOR EACH ROW SET NEW.a = (SELECT 1; );", None),
+    (f"DELIMITER $$\n{PROCEDURE}$$\nDELIMITER ;\nCALL touch(1);", [PROCEDURE, "CALL touch(1)"]),
+    (f"delimiter //\n{PROCEDURE} //\ndelimiter ;\nSELECT 'end'", [PROCEDURE, "SELECT 'end'"]),
+    ("SELECT 1;\n\n", ["SELECT 1"]),
+])
+def test_split_script(script, statements):
+    if statements is None:
+        # A separator inside parentheses doesn't end the statement
+        assert len(split_script(script)) == 1
+    else:
+        assert split_script(script) == statements
+
+
+def test_delimiter_lines_in_strings_and_comments_are_data():
+    script = (
+        "INSERT INTO notes VALUES ('line one\nDELIMITER $$\nline three');\n"
+        "/* to load procedures:\nDELIMITER //\n*/\n"
+        "SELECT 2;"
+    )
+    assert split_script(script) == [
+        "INSERT INTO notes VALUES ('line one\nDELIMITER $$\nline three')",
+        "SELECT 2",
+    ]
+
+
+class FakeCursor:
+    with_rows = False
+    rowcount = 1
+
+    def execute(self, sql, multi=False):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class ScriptDatabase:
+    def __init__(self, database):
+        self.database = database
+        self.invalidated = []
+        self.schemas_invalidated = set()
+
+    @contextmanager
+    def raw_cursor(self, dictionary=True):
+        yield FakeConnection(self.database), FakeCursor()
+
+    @contextmanager
+    def time_limit(self, conn, timeout):
+        yield
+
+    def invalidate_cached_results(self, tables=None, database=None):
+        self.invalidated.append((database, tables and set(tables)))
+
+    def invalidate_schema(self, database_name=None):
+        self.schemas_invalidated.add(database_name)
+
+
+def test_script_writes_are_named_from_the_database_they_ran_in():
+    db = ScriptDatabase("app")
+    run_script(db, "INSERT INTO users VALUES (1); USE shop; INSERT INTO orders VALUES (1)", batch_size=1)
+    assert db.invalidated == [(None, {"app.users", "shop.orders"})]
+
+
+def test_script_ddl_after_use_invalidates_every_database_it_ran_in():
+    db = ScriptDatabase("app")
+    run_script(db, "USE shop; CREATE TABLE t (id INT)", batch_size=1)
+    assert db.schemas_invalidated == {"app", "shop"}
+    assert sorted(db.invalidated) == [("app", None), ("shop", None)]
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+import instrumentation
+from llm_stub import start_stub, stub_sql
+from sql_translator import SQLTranslator
+
+# What a chatty model writes after the statement; the translator should stop reading before it
+EXPLANATION = "\n\nThis query returns the id of every user, at most one hundred of them, " * 4
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = start_stub(trailing=EXPLANATION)
+    monkeypatch.setenv("GROQ_BASE_URL", server.url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def traces(monkeypatch):
+    monkeypatch.setattr(instrumentation.recorder, "enabled", True)
+    instrumentation.recorder.clear()
+    yield instrumentation.recorder
+    instrumentation.recorder.clear()
+
+
+@pytest.fixture
+def translator(monkeypatch):
+    monkeypatch.setenv("TRANSLATE_STREAM", "true")
+    translator = SQLTranslator()
+    translator.fast_path_enabled = False
+    return translator
+
+
+def test_unsafe_stream_still_records_time_to_sql(stub, traces, translator):
+    stub.responder = lambda prompt: "DROP TABLE users"
+    assert translator.translate("remove the users table").startswith("Error: Generated query contains unsafe")
+    (trace,) = traces.recent("translate")
+    assert "time_to_sql" in trace["stages_ms"]
+    assert trace["stopped_early"] is True
+    assert trace["chunks"] == 2
+
+
+def test_translate_async_streams_and_stops_early(stub, traces, translator):
+    expected = stub_sql(translator._build_prompt(translator._get_schema_context("user ids"), "user ids"))
+    assert translator.translate_many(["user ids"]) == [expected]
+    (trace,) = traces.recent("translate")
+    assert trace["tier"] == "llm"
+    assert trace["stopped_early"] is True
+    assert "time_to_sql" in trace["stages_ms"]
+    # Stopped at the blank line before the explanation instead of reading every word of it
+    assert trace["chunks"] < len(EXPLANATION.split())
+
+
+def answer_with_question(prompt):
+    """The stub's SQL, tagged with the question so each answer can be matched to its request"""
+    question = prompt.split("USER REQUEST: ", 1)[1].split("\n", 1)[0]
+    return f"SELECT '{question}' AS question"
+
+
+def test_translate_many_keeps_input_order(stub, translator):
+    questions = [f"question {number}" for number in range(8)]
+
+    def slow_first(prompt):
+        # Earlier questions answer last, so completion order is the reverse of input order
+        number = int(prompt.split("USER REQUEST: question ", 1)[1].split("\n", 1)[0])
+        time.sleep((len(questions) - number) * 0.01)
+        return answer_with_question(prompt)
+
+    stub.responder = slow_first
+    results = translator.translate_many(questions + ["Question 3"], concurrency=8)
+    expected = [f"SELECT '{question}' AS question" for question in questions]
+    assert results == expected + [expected[3]]
+    # The repeated question shared the first one's call
+    assert stub.request_count == len(questions)
+
+
+def test_rate_limited_requests_back_off_and_retry(stub, translator):
+    stub.responder = answer_with_question
+    stub.rate_limit_every = 2
+    stub.retry_after = 0.05
+    translator.retry_base_delay = 0.01
+    questions = [f"question {number}" for number in range(4)]
+    started = time.monotonic()
+    assert translator.translate_many(questions) == [f"SELECT '{question}' AS question" for question in questions]
+    assert stub.request_count > len(questions)
+    # Every 429 paused the translator for at least its retry-after
+    assert time.monotonic() - started >= stub.retry_after
+    assert translator._rate_limited_until > 0
+
+
+def test_retries_give_up_after_max_retries(stub, translator):
+    stub.rate_limit_every = 1
+    stub.retry_after = 0.01
+    translator.max_retries = 2
+    translator.retry_base_delay = 0.01
+    (result,) = translator.translate_many(["user ids"])
+    assert result.startswith("Error: Failed to generate SQL query")
+    assert stub.request_count == 3
+
+
+def test_stream_closes_once_the_statement_is_complete(stub, traces, translator):
+    stub.token_latency = 0.005
+    sql = translator.translate("user ids")
+    assert sql.startswith("SELECT ") and "This query" not in sql
+    (trace,) = traces.recent("translate")
+    assert trace["stopped_early"] is True
+    # The server notices the closed connection when it writes the next chunk
+    deadline = time.monotonic() + 2
+    while not stub.streams_closed_early and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stub.streams_closed_early == 1
+    assert stub.chunks_sent < len(sql.split()) + len(EXPLANATION.split())
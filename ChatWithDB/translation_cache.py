@@ -0,0 +1,145 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_question(question):
+    """Lower-case a question and drop whitespace/punctuation noise so repeats match"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?.!;")
+
+
+def schema_hash(schema_context):
+    """Short stable hash of the schema text a translation was made against"""
+    return hashlib.sha256(schema_context.encode("utf-8")).hexdigest()[:16]
+
+
+class TranslationCache:
+    """LRU/TTL cache of natural language -> SQL translations
+
+    Entries are keyed on the normalized question plus the schema hash, so a
+    schema change never serves stale SQL. When `path` (or the
+    TRANSLATION_CACHE_PATH environment variable) is set, entries are also
+    written to a SQLite file and survive restarts.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, path=None):
+        self.max_entries = int(max_entries or os.getenv("TRANSLATION_CACHE_SIZE", 1000))
+        self.ttl = float(ttl or os.getenv("TRANSLATION_CACHE_TTL", 24 * 60 * 60))
+        self.path = path or os.getenv("TRANSLATION_CACHE_PATH")
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._disk = None
+        if self.path:
+            self._disk = sqlite3.connect(self.path, check_same_thread=False)
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    key TEXT PRIMARY KEY,
+                    schema_hash TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._disk.execute(
+                "CREATE INDEX IF NOT EXISTS translations_schema ON translations (schema_hash)"
+            )
+            self._disk.commit()
+
+    @staticmethod
+    def make_key(question, schema_hash):
+        normalized = normalize_question(question)
+        return hashlib.sha256(f"{schema_hash}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, question, schema_hash):
+        """Return the cached SQL for a question, or None on a miss"""
+        key = self.make_key(question, schema_hash)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] >= self.ttl:
+                del self._entries[key]
+                entry = None
+
+            if entry is None and self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT sql, schema_hash, created_at FROM translations WHERE key = ? AND created_at > ?",
+                    (key, now - self.ttl),
+                ).fetchone()
+                if row is not None:
+                    entry = row
+                    self._remember(key, entry)
+                    self._disk.execute("UPDATE translations SET last_used = ? WHERE key = ?", (now, key))
+                    self._disk.commit()
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, question, schema_hash, sql):
+        """Store a translation"""
+        key = self.make_key(question, schema_hash)
+        now = time.time()
+        with self._lock:
+            self._remember(key, (sql, schema_hash, now))
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, schema_hash, normalize_question(question), sql, now, now),
+                )
+                # Keep the file bounded: expired rows go, then the least recently used
+                self._disk.execute("DELETE FROM translations WHERE created_at <= ?", (now - self.ttl,))
+                self._disk.execute("""
+                    DELETE FROM translations WHERE key IN (
+                        SELECT key FROM translations ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+                self._disk.commit()
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_schema(self, schema_hash):
+        """Drop every translation made against the given schema"""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] == schema_hash]:
+                del self._entries[key]
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM translations WHERE schema_hash = ?", (schema_hash,))
+                self._disk.commit()
+
+    def clear(self):
+        """Remove every entry from memory and disk"""
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM translations")
+                self._disk.commit()
+
+    def get_stats(self):
+        """Return hit/miss counters and the current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": self._disk is not None,
+            }